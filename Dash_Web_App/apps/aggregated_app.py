@@ -8,21 +8,12 @@ import numpy as np
 
 #import supporting python scripts
 from app import app
+from page_layouts import nav_header, nav_footer
+from data_loader import load_dataset
+from figure_cache import cached_figure
+from plot_stats import series_trace, zoomable_figure
+from time_query import time_window
 
-#import data files
-summary_df = pd.read_csv("cleaned_data/summary_cleaned.csv", sep=',', index_col=0)
-daily_df = pd.read_csv("cleaned_data/daily_aggregated.csv", sep=',', index_col=0)
-
-#cast to datetime object
-summary_df['day_time'] = pd.to_datetime(summary_df['day_time'], unit='ms')
-summary_df['run_time'] = pd.to_datetime(summary_df['run_time'], unit='ms').dt.time
-summary_df['longest_idle_time'] = pd.to_datetime(summary_df['longest_idle_time'], unit='ms').dt.time
-summary_df['longest_active_time'] = pd.to_datetime(summary_df['longest_active_time'], unit='ms').dt.time
-summary_df['walk_time'] = pd.to_datetime(summary_df['walk_time'], unit='ms').dt.time
-summary_df['others_time'] = pd.to_datetime(summary_df['others_time'], unit='ms').dt.time
-summary_df['active_time'] = pd.to_datetime(summary_df['active_time'], unit='ms').dt.time
-#cast to datetime object
-daily_df['date'] = pd.to_datetime(daily_df['date'])
 
 
 summary_plot_types = {
@@ -34,18 +25,7 @@ daily_plot_types = {
 }
 
 aggregated_page = html.Div([
-	html.Header([
-		' | ',
-		dcc.Link('Home', href='/'), ' | ',
-		dcc.Link('Summary', href='/summary'), ' | ',
-		dcc.Link('Sleep', href='/sleep'), ' | ',
-		dcc.Link('Step Count', href='/step') , ' | ',
-		dcc.Link('Floors Climbed', href='/floors'), ' | ',
-		dcc.Link('Heart Rate', href='/heart'), ' | ',
-		dcc.Link('Exercise', href='/exercise'), ' | ',
-		dcc.Link('Daily Aggregated', href='/daily_aggregated'), ' | ',
-		dcc.Link('Data Sets', href='/data'), ' | '
-	], id='top', style={'textAlign':'center'}),
+	nav_header(),
 	html.Br(),
 	html.Div([
 		html.H1('Daily Aggregated Analysis'),
@@ -125,18 +105,7 @@ aggregated_page = html.Div([
 	], id='aggregated_analysis'),
 	html.Br(),
 	html.H6(['Go to ', html.A('top', href='#top')], style={'textAlign':'center'}),
-	html.Footer([
-		' | ',
-		dcc.Link('Home', href='/'), ' | ',
-		dcc.Link('Summary', href='/summary'), ' | ',
-		dcc.Link('Sleep', href='/sleep'), ' | ',
-		dcc.Link('Step Count', href='/step') , ' | ',
-		dcc.Link('Floors Climbed', href='/floors'), ' | ',
-		dcc.Link('Heart Rate', href='/heart'), ' | ',
-		dcc.Link('Exercise', href='/exercise'), ' | ',
-		dcc.Link('Daily Aggregated', href='/daily_aggregated'), ' | ',
-		dcc.Link('Data Sets', href='/data'), ' | '
-	], style={'textAlign':'center'})
+	nav_footer()
 ]) 
 
 
@@ -150,12 +119,18 @@ def set_summary_plot_data(selected_plot):
 #update the displayed graph depending on dropdown value
 @app.callback(
     Output('summary_graphic', 'figure'),
-    [Input('summary_plot_data', 'value')])
-def update_summary_plot(plot):
+    [Input('summary_plot_data', 'value'),
+    Input('summary_graphic', 'relayoutData')])
+@zoomable_figure(summary_plot_types['Scatter'])
+@cached_figure('summary')
+def update_summary_plot(plot, window=None):
+	#data set of the logged in user, in the visible time window
+	summary_df = time_window(load_dataset('summary', derived=True), 'day_time', window, 'summary')
 	#scatter plot
 	if plot == 'Step Count vs Date':
 		return {
-			'data': [go.Scatter(
+			'data': [series_trace(
+				window = window,
 				x = summary_df['day_time'],
 				y = summary_df['step_count'],
 				name = plot,
@@ -170,7 +145,8 @@ def update_summary_plot(plot):
 		}
 	elif plot == 'Distance vs Date':
 		return {
-			'data': [go.Scatter(
+			'data': [series_trace(
+				window = window,
 				x = summary_df['day_time'],
 				y = summary_df['distance'],
 				name = 'distance during exercise',
@@ -185,7 +161,8 @@ def update_summary_plot(plot):
 		}
 	elif plot == 'Calorie vs Date':
 		return {
-			'data': [go.Scatter(
+			'data': [series_trace(
+				window = window,
 				x = summary_df['day_time'],
 				y = summary_df['calorie'],
 				name = 'calories burned',
@@ -209,12 +186,18 @@ def set_daily_plot_data(selected_plot):
 #update the displayed graph depending on dropdown value
 @app.callback(
     Output('daily_graphic', 'figure'),
-    [Input('daily_plot_data', 'value')])
-def update_daily_plot(plot):
+    [Input('daily_plot_data', 'value'),
+    Input('daily_graphic', 'relayoutData')])
+@zoomable_figure(daily_plot_types['Scatter'])
+@cached_figure('daily_aggregated')
+def update_daily_plot(plot, window=None):
+	#data set of the logged in user, in the visible time window
+	daily_df = time_window(load_dataset('daily_aggregated'), 'date', window, 'daily_aggregated')
 	#scatter plot
 	if plot == 'Step Count vs Date':
 		return {
-			'data': [go.Scatter(
+			'data': [series_trace(
+				window = window,
 				x = daily_df['date'],
 				y = daily_df['total_step_count'],
 				name = plot,
@@ -229,13 +212,15 @@ def update_daily_plot(plot):
 		}
 	elif plot == 'Distance vs Date':
 		return {
-			'data': [go.Scatter(
+			'data': [series_trace(
+				window = window,
 				x = daily_df['date'],
 				y = daily_df['total_exercises_distance'],
 				name = 'distance during exercise',
 				mode = 'markers',
 			),
-			go.Scatter(
+			series_trace(
+				window = window,
 				x = daily_df['date'],
 				y = daily_df['total_step_distance'],
 				name = 'distance from step count',
@@ -250,13 +235,15 @@ def update_daily_plot(plot):
 		}
 	elif plot == 'Calorie vs Date':
 		return {
-			'data': [go.Scatter(
+			'data': [series_trace(
+				window = window,
 				x = daily_df['date'],
 				y = daily_df['total_exercises_calorie'],
 				name = 'calories burned during exercise',
 				mode = 'markers',
 			),
-			go.Scatter(
+			series_trace(
+				window = window,
 				x = daily_df['date'],
 				y = daily_df['total_step_calorie'],
 				name = 'calories burned from step count',
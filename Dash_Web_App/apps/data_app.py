@@ -9,29 +9,19 @@ import numpy as np
 
 #import supporting python scripts
 from app import app
+from page_layouts import nav_header, nav_footer
+from data_loader import load_dataset, dataset_columns
+from table_query import table_page
 
-#import data files
-#daily_df = pd.read_csv("cleaned_data/daily_aggregated.csv", sep=',', index_col=0)
-exercise_df = pd.read_csv("cleaned_data/exercise_cleaned.csv", sep=',', index_col=0)
-floors_df = pd.read_csv("cleaned_data/floors_climbed_cleaned.csv", sep=',', index_col=0)
-heart_rate_df = pd.read_csv("cleaned_data/heart_rate_cleaned.csv", sep=',', index_col=0)
-sleep_df = pd.read_csv("cleaned_data/sleep_cleaned.csv", sep=',', index_col=0)
-step_count_df = pd.read_csv("cleaned_data/step_count_cleaned.csv", sep=',', index_col=0)
-summary_df = pd.read_csv("cleaned_data/summary_cleaned.csv", sep=',', index_col=0)
+#table rows as records (float32 measures are shown with the digits they were stored with)
+def table_records(df):
+	df = df.copy(deep=False)
+	for col in df.columns[df.dtypes == np.float32]:
+		df[col] = df[col].astype(str).astype(float)
+	return df.to_dict('records')
 
 data_page = html.Div([
-	html.Header([
-		' | ',
-		dcc.Link('Home', href='/'), ' | ',
-		dcc.Link('Summary', href='/summary'), ' | ',
-		dcc.Link('Sleep', href='/sleep'), ' | ',
-		dcc.Link('Step Count', href='/step') , ' | ',
-		dcc.Link('Floors Climbed', href='/floors'), ' | ',
-		dcc.Link('Heart Rate', href='/heart'), ' | ',
-		dcc.Link('Exercise', href='/exercise'), ' | ',
-		dcc.Link('Daily Aggregated', href='/daily_aggregated'), ' | ',
-		dcc.Link('Data Sets', href='/data'), ' | '
-	], id='top', style={'textAlign':'center'}),
+	nav_header(),
     html.Br(),
 	dcc.Tabs(children=[
 			dcc.Tab(label='Sleep Data', value='sleep_set'),
@@ -44,171 +34,68 @@ data_page = html.Div([
 	),
 	html.Div(id='tabs_content'),
 	html.Br(),
-	html.Footer([
-		' | ',
-		dcc.Link('Home', href='/'), ' | ',
-		dcc.Link('Summary', href='/summary'), ' | ',
-		dcc.Link('Sleep', href='/sleep'), ' | ',
-		dcc.Link('Step Count', href='/step') , ' | ',
-		dcc.Link('Floors Climbed', href='/floors'), ' | ',
-		dcc.Link('Heart Rate', href='/heart'), ' | ',
-		dcc.Link('Exercise', href='/exercise'), ' | ',
-		dcc.Link('Daily Aggregated', href='/daily_aggregated'), ' | ',
-		dcc.Link('Data Sets', href='/data'), ' | '
-	], style={'textAlign':'center'})
+	nav_footer()
 ])
 
+#title, data set and div id of the table of each tab
+DATA_TABS = {
+	'sleep_set': ('Sleep Data', 'sleep', 'sleep'),
+	'step_set': ('Step Data', 'step_count', 'step'),
+	'floors_set': ('Floors Climbed Data', 'floors', 'floors'),
+	'heart_set': ('Heart Rate Data', 'heart_rate', 'heart'),
+	'exercise_set': ('Exercise Data', 'exercise', 'exercise'),
+	'summary_set': ('Summary Data', 'summary', 'summary'),
+}
+
+#rows sent to the browser per page; paging, sorting and filtering are done on the server (see update_table)
+TABLE_PAGE_SIZE = 50
+
 @app.callback(
 	Output('tabs_content', 'children'),
 	[Input('data_tabs', 'value')])
 def render_table(tab):
-	if tab == 'sleep_set':
-		return html.Div([
-			html.H1('Sleep Data'),
-			dash_table.DataTable(
-				id='table', 
-				columns=[{'name':i, 'id':i} for i in sleep_df.columns],
-				data=sleep_df.to_dict('records'),
-				n_fixed_rows=1,
-				sorting=True,
-				pagination_mode="fe",
-				pagination_settings={
-					"current_page": 0,
-					"page_size": 50,
-				},
-				style_table={'overflowX': 'scroll'},
-				style_cell={
-					'minWidth': '180px', 'width': '180px', 'maxWidth': '180px',
-					'whiteSpace': 'normal'
-				},
-				css=[{
-					'selector': '.dash-cell div.dash-cell-value',
-					'rule': 'display: inline; white-space: inherit; overflow: inherit; text-overflow: inherit;'
-				}],
-			)
-		], id='sleep'),
-	elif tab == 'step_set':
-		return html.Div([
-			html.H1('Step Data'),
-			dash_table.DataTable(
-				id='table', 
-				columns=[{'name':i, 'id':i} for i in step_count_df.columns],
-				data=step_count_df.to_dict('records'),
-				n_fixed_rows=1,
-				sorting=True,
-				pagination_mode="fe",
-				pagination_settings={
-					"current_page": 0,
-					"page_size": 50,
-				},
-				style_table={'overflowX': 'scroll'},
-				style_cell={
-					'minWidth': '180px', 'width': '180px', 'maxWidth': '180px',
-					'whiteSpace': 'normal'
-				},
-				css=[{
-					'selector': '.dash-cell div.dash-cell-value',
-					'rule': 'display: inline; white-space: inherit; overflow: inherit; text-overflow: inherit;'
-				}],
-			)
-		], id='step'),
-	elif tab == 'floors_set':
-		return html.Div([
-			html.H1('Floors Climbed Data'),
-			dash_table.DataTable(
-				id='table', 
-				columns=[{'name':i, 'id':i} for i in floors_df.columns],
-				data=floors_df.to_dict('records'),
-				n_fixed_rows=1,
-				sorting=True,
-				pagination_mode="fe",
-				pagination_settings={
-					"current_page": 0,
-					"page_size": 50,
-				},
-				style_table={'overflowX': 'scroll'},
-				style_cell={
-					'minWidth': '180px', 'width': '180px', 'maxWidth': '180px',
-					'whiteSpace': 'normal'
-				},
-				css=[{
-					'selector': '.dash-cell div.dash-cell-value',
-					'rule': 'display: inline; white-space: inherit; overflow: inherit; text-overflow: inherit;'
-				}],
-			)
-		], id='floors'),
-	elif tab == 'heart_set':
-		return html.Div([
-			html.H1('Heart Rate Data'),
-			dash_table.DataTable(
-				id='table', 
-				columns=[{'name':i, 'id':i} for i in heart_rate_df.columns],
-				data=heart_rate_df.to_dict('records'),
-				n_fixed_rows=1,
-				sorting=True,
-				pagination_mode="fe",
-				pagination_settings={
-					"current_page": 0,
-					"page_size": 50,
-				},
-				style_table={'overflowX': 'scroll'},
-				style_cell={
-					'minWidth': '180px', 'width': '180px', 'maxWidth': '180px',
-					'whiteSpace': 'normal'
-				},
-				css=[{
-					'selector': '.dash-cell div.dash-cell-value',
-					'rule': 'display: inline; white-space: inherit; overflow: inherit; text-overflow: inherit;'
-				}],
-			)
-		], id='heart'),
-	elif tab == 'exercise_set':
-		return html.Div([
-			html.H1('Exercise Data'),
-			dash_table.DataTable(
-				id='table', 
-				columns=[{'name':i, 'id':i} for i in exercise_df.columns],
-				data=exercise_df.to_dict('records'),
-				n_fixed_rows=1,
-				sorting=True,
-				pagination_mode="fe",
-				pagination_settings={
-					"current_page": 0,
-					"page_size": 50,
-				},
-				style_table={'overflowX': 'scroll'},
-				style_cell={
-					'minWidth': '180px', 'width': '180px', 'maxWidth': '180px',
-					'whiteSpace': 'normal'
-				},
-				css=[{
-					'selector': '.dash-cell div.dash-cell-value',
-					'rule': 'display: inline; white-space: inherit; overflow: inherit; text-overflow: inherit;'
-				}],
-			)
-		], id='exercise'),
-	elif tab == 'summary_set':
-		return html.Div([
-			html.H1('Summary Data'),
-			dash_table.DataTable(
-				id='table', 
-				columns=[{'name':i, 'id':i} for i in summary_df.columns],
-				data=summary_df.to_dict('records'),
-				n_fixed_rows=1,
-				sorting=True,
-				pagination_mode="fe",
-				pagination_settings={
-					"current_page": 0,
-					"page_size": 50,
-				},
-				style_table={'overflowX': 'scroll'},
-				style_cell={
-					'minWidth': '180px', 'width': '180px', 'maxWidth': '180px',
-					'whiteSpace': 'normal'
-				},
-				css=[{
-					'selector': '.dash-cell div.dash-cell-value',
-					'rule': 'display: inline; white-space: inherit; overflow: inherit; text-overflow: inherit;'
-				}],
-			)
-		], id='summary'),
+	if tab not in DATA_TABS:
+		return None
+	title, dataset, div_id = DATA_TABS[tab]
+	#data set of the logged in user
+	df = load_dataset(dataset)
+	pagination_settings = {
+		"current_page": 0,
+		"page_size": TABLE_PAGE_SIZE,
+	}
+	return html.Div([
+		html.H1(title),
+		dash_table.DataTable(
+			id='table', 
+			columns=[{'name':i, 'id':i} for i in dataset_columns(df)],
+			data=table_records(table_page(df, pagination_settings)),
+			n_fixed_rows=1,
+			sorting='be',
+			sorting_type='multi',
+			sorting_settings=[],
+			filtering='be',
+			filtering_settings='',
+			pagination_mode='be',
+			pagination_settings=pagination_settings,
+			style_table={'overflowX': 'scroll'},
+			style_cell={
+				'minWidth': '180px', 'width': '180px', 'maxWidth': '180px',
+				'whiteSpace': 'normal'
+			},
+			css=[{
+				'selector': '.dash-cell div.dash-cell-value',
+				'rule': 'display: inline; white-space: inherit; overflow: inherit; text-overflow: inherit;'
+			}],
+		)
+	], id=div_id)
+
+#send the current page of the table of the selected tab
+@app.callback(
+	Output('table', 'data'),
+	[Input('table', 'pagination_settings'),
+	Input('table', 'sorting_settings'),
+	Input('table', 'filtering_settings')],
+	[State('data_tabs', 'value')])
+def update_table(pagination_settings, sorting_settings, filtering_settings, tab):
+	title, dataset, div_id = DATA_TABS[tab]
+	return table_records(table_page(load_dataset(dataset), pagination_settings, sorting_settings, filtering_settings, dataset))
@@ -8,18 +8,11 @@ import numpy as np
 
 #import supporting python scripts
 from app import app
-
-#import data files
-exercise_df = pd.read_csv("cleaned_data/exercise_cleaned.csv", sep=',', index_col=0)
-
-#cast to datetime object
-exercise_df['local_start_time'] = pd.to_datetime(exercise_df['local_start_time'])
-exercise_df['local_end_time'] = pd.to_datetime(exercise_df['local_end_time'])
-
-#add time zone float to heart_df
-def to_float(x):
-    return float(x[1])/100
-exercise_df['hr_offset'] = exercise_df['time_offset'].str.split('UTC').apply(to_float)
+from page_layouts import nav_header, nav_footer
+from data_loader import load_dataset
+from figure_cache import cached_figure
+from plot_stats import plot_mode, time_zones, group_keys, split_groups, histogram_traces, box_traces, scatter_traces, zoomable_figure, WEEKDAYS
+from time_query import time_window, time_traces
 
 exercise_plot_types = {
 	'Histogram': ['Exercise Type'],
@@ -27,19 +20,11 @@ exercise_plot_types = {
 	'Boxplot': ['Duration vs Type', 'Time vs Weekday'],
 }
 
+#plot mode of the histograms and boxplots ('raw' or 'aggregated')
+exercise_plot_mode = plot_mode('exercise')
+
 exercise_page = html.Div([
-	html.Header([
-		' | ',
-		dcc.Link('Home', href='/'), ' | ',
-		dcc.Link('Summary', href='/summary'), ' | ',
-		dcc.Link('Sleep', href='/sleep'), ' | ',
-		dcc.Link('Step Count', href='/step') , ' | ',
-		dcc.Link('Floors Climbed', href='/floors'), ' | ',
-		dcc.Link('Heart Rate', href='/heart'), ' | ',
-		dcc.Link('Exercise', href='/exercise'), ' | ',
-		dcc.Link('Daily Aggregated', href='/daily_aggregated'), ' | ',
-		dcc.Link('Data Sets', href='/data'), ' | '
-	], id='top', style={'textAlign':'center'}),
+	nav_header(),
 	html.Br(),
 	html.Div([
 		html.H1('Exercise Analysis'),
@@ -104,18 +89,7 @@ exercise_page = html.Div([
 	], id='exercise_analysis'),
 	html.Br(),
 	html.H6(['Go to ', html.A('top', href='#top')], style={'textAlign':'center'}),
-	html.Footer([
-		' | ',
-		dcc.Link('Home', href='/'), ' | ',
-		dcc.Link('Summary', href='/summary'), ' | ',
-		dcc.Link('Sleep', href='/sleep'), ' | ',
-		dcc.Link('Step Count', href='/step') , ' | ',
-		dcc.Link('Floors Climbed', href='/floors'), ' | ',
-		dcc.Link('Heart Rate', href='/heart'), ' | ',
-		dcc.Link('Exercise', href='/exercise'), ' | ',
-		dcc.Link('Daily Aggregated', href='/daily_aggregated'), ' | ',
-		dcc.Link('Data Sets', href='/data'), ' | '
-	], style={'textAlign':'center'})
+	nav_footer()
 ]) 
 
 #update the dropdown options depending on the selected graph type
@@ -128,32 +102,18 @@ def set_exercise_plot_data(selected_plot):
 #update the displayed graph depending on dropdown value
 @app.callback(
     Output('exercise_graphic', 'figure'),
-    [Input('exercise_plot_data', 'value')])
-def update_exercise_plot(plot):
+    [Input('exercise_plot_data', 'value'),
+    Input('exercise_graphic', 'relayoutData')])
+@zoomable_figure(exercise_plot_types['Scatter'])
+@cached_figure('exercise', variant=exercise_plot_mode)
+def update_exercise_plot(plot, window=None):
+	#data set of the logged in user
+	exercise_df = load_dataset('exercise', derived=True)
 	#histograms
 	if plot == 'Exercise Type':
 		return {
-			'data': [go.Histogram(
-					x = exercise_df[exercise_df['time_offset'] == 'UTC-0800']['exercise_type'],
-					name = 'UTC-0800',
-				),
-				go.Histogram(
-					x = exercise_df[exercise_df['time_offset'] == 'UTC-0700']['exercise_type'],
-					name = 'UTC-0700',
-				),
-				go.Histogram(
-					x = exercise_df[exercise_df['time_offset'] == 'UTC-0500']['exercise_type'],
-					name = 'UTC-0500',
-				),
-				go.Histogram(
-					x = exercise_df[exercise_df['time_offset'] == 'UTC-0400']['exercise_type'],
-					name = 'UTC-0400',
-				),
-				go.Histogram(
-					x = exercise_df[exercise_df['time_offset'] == 'UTC+0200']['exercise_type'],
-					name = 'UTC+0200',
-				),
-			],
+			'data': histogram_traces(split_groups(exercise_df['exercise_type'], exercise_df['time_offset'],
+				time_zones(exercise_df)), exercise_plot_mode),
 			'layout': go.Layout(
 				title = 'Exercise Type Distribution',
 				xaxis = {'title': 'Exercise Type'},
@@ -165,51 +125,10 @@ def update_exercise_plot(plot):
 	
 	#scatter plot
 	if plot == 'Time Offset vs Time':
-		chron_sort_df = exercise_df.sort_values(by='local_start_time', axis=0, ascending=True)
+		chron_sort_df = time_window(exercise_df, 'local_start_time', window, 'exercise')
 		return {
-			'data': [go.Scatter(
-					x = chron_sort_df[chron_sort_df['exercise_type'] == 'custom']['local_start_time'],
-					y = chron_sort_df[chron_sort_df['exercise_type'] == 'custom']['hr_offset'],
-					name = 'custom',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = chron_sort_df[chron_sort_df['exercise_type'] == 'walking']['local_start_time'],
-					y = chron_sort_df[chron_sort_df['exercise_type'] == 'walking']['hr_offset'],
-					name = 'walking',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = chron_sort_df[chron_sort_df['exercise_type'] == 'running']['local_start_time'],
-					y = chron_sort_df[chron_sort_df['exercise_type'] == 'running']['hr_offset'],
-					name = 'running',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = chron_sort_df[chron_sort_df['exercise_type'] == 'hiking']['local_start_time'],
-					y = chron_sort_df[chron_sort_df['exercise_type'] == 'hiking']['hr_offset'],
-					name = 'hiking',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = chron_sort_df[chron_sort_df['exercise_type'] == 'swimming']['local_start_time'],
-					y = chron_sort_df[chron_sort_df['exercise_type'] == 'swimming']['hr_offset'],
-					name = 'swimming',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = chron_sort_df[chron_sort_df['exercise_type'] == 'cycling']['local_start_time'],
-					y = chron_sort_df[chron_sort_df['exercise_type'] == 'cycling']['hr_offset'],
-					name = 'cycling',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = chron_sort_df[chron_sort_df['exercise_type'] == 'elliptical']['local_start_time'],
-					y = chron_sort_df[chron_sort_df['exercise_type'] == 'elliptical']['hr_offset'],
-					name = 'elliptical',
-					mode = 'markers',
-				),
-			],
+			'data': scatter_traces(split_groups(chron_sort_df, 'exercise_type', group_keys(exercise_df, 'exercise_type')),
+				'local_start_time', 'hr_offset', window=window, mode='markers'),
 			'layout': go.Layout(
 				title = 'Time Zone over Time',
 				xaxis = {'title': 'Time (year)'},
@@ -219,49 +138,8 @@ def update_exercise_plot(plot):
 		}
 	elif plot == 'Mean Heart Rate vs Time':
 		return {
-			'data': [go.Scatter(
-					x = exercise_df[exercise_df['exercise_type'] == 'custom']['local_start_time'],
-					y = exercise_df[exercise_df['exercise_type'] == 'custom']['mean_heart_rate'],
-					name = 'custom',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = exercise_df[exercise_df['exercise_type'] == 'walking']['local_start_time'],
-					y = exercise_df[exercise_df['exercise_type'] == 'walking']['mean_heart_rate'],
-					name = 'walking',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = exercise_df[exercise_df['exercise_type'] == 'running']['local_start_time'],
-					y = exercise_df[exercise_df['exercise_type'] == 'running']['mean_heart_rate'],
-					name = 'running',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = exercise_df[exercise_df['exercise_type'] == 'hiking']['local_start_time'],
-					y = exercise_df[exercise_df['exercise_type'] == 'hiking']['mean_heart_rate'],
-					name = 'hiking',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = exercise_df[exercise_df['exercise_type'] == 'swimming']['local_start_time'],
-					y = exercise_df[exercise_df['exercise_type'] == 'swimming']['mean_heart_rate'],
-					name = 'swimming',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = exercise_df[exercise_df['exercise_type'] == 'cycling']['local_start_time'],
-					y = exercise_df[exercise_df['exercise_type'] == 'cycling']['mean_heart_rate'],
-					name = 'cycling',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = exercise_df[exercise_df['exercise_type'] == 'elliptical']['local_start_time'],
-					y = exercise_df[exercise_df['exercise_type'] == 'elliptical']['mean_heart_rate'],
-					name = 'elliptical',
-					mode = 'markers',
-				),
-			],
+			'data': time_traces(exercise_df, 'exercise', 'local_start_time', 'mean_heart_rate', window,
+				by='exercise_type', keys=group_keys(exercise_df, 'exercise_type'), mode='markers'),
 			'layout': go.Layout(
 				title = 'Mean Heart Rate per Exercise Type over Time',
 				xaxis = {'title': 'Time (year)'},
@@ -273,49 +151,7 @@ def update_exercise_plot(plot):
 	#boxplots
 	if plot == 'Duration vs Type':
 		return {
-			'data': [go.Box(
-					y = exercise_df[exercise_df['exercise_type'] == 'custom']['duration'],
-					name = 'custom',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = exercise_df[exercise_df['exercise_type'] == 'walking']['duration'],
-					name = 'walking',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = exercise_df[exercise_df['exercise_type'] == 'running']['duration'],
-					name = 'running',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = exercise_df[exercise_df['exercise_type'] == 'hiking']['duration'],
-					name = 'hiking',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = exercise_df[exercise_df['exercise_type'] == 'swimming']['duration'],
-					name = 'swimming',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = exercise_df[exercise_df['exercise_type'] == 'cycling']['duration'],
-					name = 'cycling',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = exercise_df[exercise_df['exercise_type'] == 'elliptical']['duration'],
-					name = 'elliptical',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-			],
+			'data': box_traces(split_groups(exercise_df['duration'], exercise_df['exercise_type']), exercise_plot_mode, boxpoints='outliers', boxmean='sd'),
 			'layout': go.Layout(
 				title = 'Duration per Exercise',
 				xaxis = {'title': 'Exercise Type'},
@@ -325,49 +161,8 @@ def update_exercise_plot(plot):
 		}
 	elif plot == 'Time vs Weekday':
 		return {
-			'data': [go.Box(
-					y = exercise_df[exercise_df['local_start_time'].dt.dayofweek == 0]['local_start_time'].dt.hour,
-					name = 'Monday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = exercise_df[exercise_df['local_start_time'].dt.dayofweek == 1]['local_start_time'].dt.hour,
-					name = 'Tuesday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = exercise_df[exercise_df['local_start_time'].dt.dayofweek == 2]['local_start_time'].dt.hour,
-					name = 'Wednesday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = exercise_df[exercise_df['local_start_time'].dt.dayofweek == 3]['local_start_time'].dt.hour,
-					name = 'Thursday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = exercise_df[exercise_df['local_start_time'].dt.dayofweek == 4]['local_start_time'].dt.hour,
-					name = 'Friday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = exercise_df[exercise_df['local_start_time'].dt.dayofweek == 5]['local_start_time'].dt.hour,
-					name = 'Saturday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = exercise_df[exercise_df['local_start_time'].dt.dayofweek == 6]['local_start_time'].dt.hour,
-					name = 'Sunday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-			],
+			'data': box_traces(split_groups(exercise_df['local_start_time'].dt.hour, exercise_df['local_start_time'].dt.dayofweek,
+				range(7), WEEKDAYS), exercise_plot_mode, boxpoints='outliers', boxmean='sd'),
 			'layout': go.Layout(
 				title = 'Time of Day of Exercises per Weekday',
 				xaxis = {'title': 'Weekday'},
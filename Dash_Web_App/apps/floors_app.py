@@ -8,13 +8,11 @@ import numpy as np
 
 #import supporting python scripts
 from app import app
-
-#import data files
-floors_df = pd.read_csv("cleaned_data/floors_climbed_cleaned.csv", sep=',', index_col=0)
-
-#cast to datetime object
-floors_df['local_start_time'] = pd.to_datetime(floors_df['local_start_time'])
-floors_df['local_end_time'] = pd.to_datetime(floors_df['local_end_time'])
+from page_layouts import nav_header, nav_footer
+from data_loader import load_dataset
+from figure_cache import cached_figure
+from plot_stats import plot_mode, time_zones, split_groups, histogram_traces, box_traces, zoomable_figure, WEEKDAYS
+from time_query import time_traces
 
 floors_plot_types = {
 	'Histogram': ['Floors Climbed'],
@@ -22,19 +20,11 @@ floors_plot_types = {
 	'Boxplot': ['Floors vs Weekday'],
 }
 
+#plot mode of the histograms and boxplots ('raw' or 'aggregated')
+floors_plot_mode = plot_mode('floors')
+
 floors_page = html.Div([
-	html.Header([
-		' | ',
-		dcc.Link('Home', href='/'), ' | ',
-		dcc.Link('Summary', href='/summary'), ' | ',
-		dcc.Link('Sleep', href='/sleep'), ' | ',
-		dcc.Link('Step Count', href='/step') , ' | ',
-		dcc.Link('Floors Climbed', href='/floors'), ' | ',
-		dcc.Link('Heart Rate', href='/heart'), ' | ',
-		dcc.Link('Exercise', href='/exercise'), ' | ',
-		dcc.Link('Daily Aggregated', href='/daily_aggregated'), ' | ',
-		dcc.Link('Data Sets', href='/data'), ' | '
-	], id='top', style={'textAlign':'center'}),
+	nav_header(),
 	html.Br(),
 	html.Div([
 		html.H1('Floors Climbed Analysis'),
@@ -92,18 +82,7 @@ floors_page = html.Div([
 	], id='floors_analysis'),
 	html.Br(),
 	html.H6(['Go to ', html.A('top', href='#top')], style={'textAlign':'center'}),
-	html.Footer([
-		' | ',
-		dcc.Link('Home', href='/'), ' | ',
-		dcc.Link('Summary', href='/summary'), ' | ',
-		dcc.Link('Sleep', href='/sleep'), ' | ',
-		dcc.Link('Step Count', href='/step') , ' | ',
-		dcc.Link('Floors Climbed', href='/floors'), ' | ',
-		dcc.Link('Heart Rate', href='/heart'), ' | ',
-		dcc.Link('Exercise', href='/exercise'), ' | ',
-		dcc.Link('Daily Aggregated', href='/daily_aggregated'), ' | ',
-		dcc.Link('Data Sets', href='/data'), ' | '
-	], style={'textAlign':'center'})
+	nav_footer()
 ]) 
 
 
@@ -117,28 +96,18 @@ def set_floors_plot_data(selected_plot):
 #update the displayed graph depending on dropdown value
 @app.callback(
     Output('floors_graphic', 'figure'),
-    [Input('floors_plot_data', 'value')])
-def update_floors_plot(plot):
+    [Input('floors_plot_data', 'value'),
+    Input('floors_graphic', 'relayoutData')])
+@zoomable_figure(floors_plot_types['Scatter'])
+@cached_figure('floors', variant=floors_plot_mode)
+def update_floors_plot(plot, window=None):
+	#data set of the logged in user
+	floors_df = load_dataset('floors')
 	#histograms
 	if plot == 'Floors Climbed':
 		return {
-			'data': [go.Histogram(
-					x = floors_df[floors_df['time_offset'] == 'UTC-0800']['floor'],
-					name = 'UTC-0800',
-				),
-				go.Histogram(
-					x = floors_df[floors_df['time_offset'] == 'UTC-0500']['floor'],
-					name = 'UTC-0500',
-				),
-				go.Histogram(
-					x = floors_df[floors_df['time_offset'] == 'UTC-0400']['floor'],
-					name = 'UTC-0400',
-				),
-				go.Histogram(
-					x = floors_df[floors_df['time_offset'] == 'UTC+0200']['floor'],
-					name = 'UTC+0200',
-				),
-			],
+			'data': histogram_traces(split_groups(floors_df['floor'], floors_df['time_offset'],
+				time_zones(floors_df)), floors_plot_mode),
 			'layout': go.Layout(
 				title = 'Floors Climbed Distribution',
 				xaxis = {'title': 'Floors Climbed'},
@@ -151,31 +120,8 @@ def update_floors_plot(plot):
 	#scatter plots
 	if plot == 'Floors vs Time':
 		return {
-			'data': [go.Scatter(
-					x = floors_df[floors_df['time_offset'] == 'UTC-0800']['local_start_time'],
-					y = floors_df[floors_df['time_offset'] == 'UTC-0800']['floor'],
-					name = 'UTC-0800',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = floors_df[floors_df['time_offset'] == 'UTC-0500']['local_start_time'],
-					y = floors_df[floors_df['time_offset'] == 'UTC-0500']['floor'],
-					name = 'UTC-0500',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = floors_df[floors_df['time_offset'] == 'UTC-0400']['local_start_time'],
-					y = floors_df[floors_df['time_offset'] == 'UTC-0400']['floor'],
-					name = 'UTC-0400',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = floors_df[floors_df['time_offset'] == 'UTC+0200']['local_start_time'],
-					y = floors_df[floors_df['time_offset'] == 'UTC+0200']['floor'],
-					name = 'UTC+0200',
-					mode = 'markers',
-				),
-			],
+			'data': time_traces(floors_df, 'floors', 'local_start_time', 'floor', window,
+				by='time_offset', keys=time_zones(floors_df), mode='markers'),
 			'layout': go.Layout(
 				title = 'Floors Climbed over Time',
 				xaxis = {'title': 'Time (year)'},
@@ -189,49 +135,8 @@ def update_floors_plot(plot):
 	#boxplots
 	if plot == 'Floors vs Weekday':
 		return {
-			'data': [go.Box(
-					y = floors_df[floors_df['local_start_time'].dt.dayofweek == 0]['floor'],
-					name = 'Monday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = floors_df[floors_df['local_start_time'].dt.dayofweek == 1]['floor'],
-					name = 'Tuesday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = floors_df[floors_df['local_start_time'].dt.dayofweek == 2]['floor'],
-					name = 'Wednesday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = floors_df[floors_df['local_start_time'].dt.dayofweek == 3]['floor'],
-					name = 'Thursday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = floors_df[floors_df['local_start_time'].dt.dayofweek == 4]['floor'],
-					name = 'Friday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = floors_df[floors_df['local_start_time'].dt.dayofweek == 5]['floor'],
-					name = 'Saturday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = floors_df[floors_df['local_start_time'].dt.dayofweek == 6]['floor'],
-					name = 'Sunday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-			],
+			'data': box_traces(split_groups(floors_df['floor'], floors_df['local_start_time'].dt.dayofweek,
+				range(7), WEEKDAYS), floors_plot_mode, boxpoints='outliers', boxmean='sd'),
 			'layout': go.Layout(
 				title = 'Floors Climbed per Weekday',
 				xaxis = {'title': 'Weekday'},
@@ -8,18 +8,11 @@ import numpy as np
 
 #import supporting python scripts
 from app import app
-
-#import data files
-heart_rate_df = pd.read_csv("cleaned_data/heart_rate_cleaned.csv", sep=',', index_col=0)
-
-#cast to datetime object
-heart_rate_df['local_start_time'] = pd.to_datetime(heart_rate_df['local_start_time'])
-heart_rate_df['local_end_time'] = pd.to_datetime(heart_rate_df['local_end_time'])
-
-#add time zone float to heart_df
-def to_float(x):
-    return float(x[1])/100
-heart_rate_df['hr_offset'] = heart_rate_df['time_offset'].str.split('UTC').apply(to_float)
+from page_layouts import nav_header, nav_footer
+from data_loader import load_dataset
+from figure_cache import cached_figure
+from plot_stats import plot_mode, time_zones, split_groups, histogram_traces, box_traces, series_trace, zoomable_figure, WEEKDAYS
+from time_query import time_window
 
 heart_plot_types = {
 	'Histogram': ['Heart Rate'],
@@ -27,19 +20,11 @@ heart_plot_types = {
 	'Boxplot': ['Hear Rate vs Weekday', 'Heart Rate vs Time of Day'],
 }
 
+#plot mode of the histograms and boxplots ('raw' or 'aggregated')
+heart_plot_mode = plot_mode('heart')
+
 heart_page = html.Div([
-	html.Header([
-		' | ',
-		dcc.Link('Home', href='/'), ' | ',
-		dcc.Link('Summary', href='/summary'), ' | ',
-		dcc.Link('Sleep', href='/sleep'), ' | ',
-		dcc.Link('Step Count', href='/step') , ' | ',
-		dcc.Link('Floors Climbed', href='/floors'), ' | ',
-		dcc.Link('Heart Rate', href='/heart'), ' | ',
-		dcc.Link('Exercise', href='/exercise'), ' | ',
-		dcc.Link('Daily Aggregated', href='/daily_aggregated'), ' | ',
-		dcc.Link('Data Sets', href='/data'), ' | '
-	], id='top', style={'textAlign':'center'}),
+	nav_header(),
 	html.Br(),
 	html.Div([
 		html.H1('Heart Rate Analysis'),
@@ -102,18 +87,7 @@ heart_page = html.Div([
 	], id='heart_analysis'),
 	html.Br(),
 	html.H6(['Go to ', html.A('top', href='#top')], style={'textAlign':'center'}),
-	html.Footer([
-		' | ',
-		dcc.Link('Home', href='/'), ' | ',
-		dcc.Link('Summary', href='/summary'), ' | ',
-		dcc.Link('Sleep', href='/sleep'), ' | ',
-		dcc.Link('Step Count', href='/step') , ' | ',
-		dcc.Link('Floors Climbed', href='/floors'), ' | ',
-		dcc.Link('Heart Rate', href='/heart'), ' | ',
-		dcc.Link('Exercise', href='/exercise'), ' | ',
-		dcc.Link('Daily Aggregated', href='/daily_aggregated'), ' | ',
-		dcc.Link('Data Sets', href='/data'), ' | '
-	], style={'textAlign':'center'})
+	nav_footer()
 ]) 
 
 #update the dropdown options depending on the selected graph type
@@ -126,36 +100,18 @@ def set_heart_plot_data(selected_plot):
 #update the displayed graph depending on dropdown value
 @app.callback(
     Output('heart_graphic', 'figure'),
-    [Input('heart_plot_data', 'value')])
-def update_heart_plot(plot):
+    [Input('heart_plot_data', 'value'),
+    Input('heart_graphic', 'relayoutData')])
+@zoomable_figure(heart_plot_types['Line'])
+@cached_figure('heart_rate', variant=heart_plot_mode)
+def update_heart_plot(plot, window=None):
+	#data set of the logged in user
+	heart_rate_df = load_dataset('heart_rate', derived=True)
 	#histograms
 	if plot == 'Heart Rate':
 		return {
-			'data': [go.Histogram(
-					x = heart_rate_df[heart_rate_df['time_offset'] == 'UTC-0800']['heart_rate'],
-					name = 'UTC-0800',
-				),
-				go.Histogram(
-					x = heart_rate_df[heart_rate_df['time_offset'] == 'UTC-0700']['heart_rate'],
-					name = 'UTC-0700',
-				),
-				go.Histogram(
-					x = heart_rate_df[heart_rate_df['time_offset'] == 'UTC-0500']['heart_rate'],
-					name = 'UTC-0500',
-				),
-				go.Histogram(
-					x = heart_rate_df[heart_rate_df['time_offset'] == 'UTC-0400']['heart_rate'],
-					name = 'UTC-0400',
-				),
-				go.Histogram(
-					x = heart_rate_df[heart_rate_df['time_offset'] == 'UTC+0200']['heart_rate'],
-					name = 'UTC+0200',
-				),
-				go.Histogram(
-					x = heart_rate_df[heart_rate_df['time_offset'] == 'UTC+0430']['heart_rate'],
-					name = 'UTC+0430',
-				),
-			],
+			'data': histogram_traces(split_groups(heart_rate_df['heart_rate'], heart_rate_df['time_offset'],
+				time_zones(heart_rate_df)), heart_plot_mode),
 			'layout': go.Layout(
 				title = 'Heart Rate Distribution',
 				xaxis = {'title': 'Heart Rate (bpm)'},
@@ -167,9 +123,10 @@ def update_heart_plot(plot):
 	
 	#line plot
 	if plot == 'Time Offset vs Time':
-		chron_sort_df = heart_rate_df.sort_values(by='local_start_time', axis=0, ascending=True)
+		chron_sort_df = time_window(heart_rate_df, 'local_start_time', window, 'heart_rate')
 		return {
-			'data': [go.Scatter(
+			'data': [series_trace(
+				window = window,
 				x = chron_sort_df['local_start_time'],
 				y = chron_sort_df['hr_offset'],
 				name = plot,
@@ -186,49 +143,8 @@ def update_heart_plot(plot):
 	#boxplots
 	if plot == 'Hear Rate vs Weekday':
 		return {
-			'data': [go.Box(
-					y = heart_rate_df[heart_rate_df['local_start_time'].dt.dayofweek == 0]['heart_rate'],
-					name = 'Monday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = heart_rate_df[heart_rate_df['local_start_time'].dt.dayofweek == 1]['heart_rate'],
-					name = 'Tuesday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = heart_rate_df[heart_rate_df['local_start_time'].dt.dayofweek == 2]['heart_rate'],
-					name = 'Wednesday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = heart_rate_df[heart_rate_df['local_start_time'].dt.dayofweek == 3]['heart_rate'],
-					name = 'Thursday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = heart_rate_df[heart_rate_df['local_start_time'].dt.dayofweek == 4]['heart_rate'],
-					name = 'Friday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = heart_rate_df[heart_rate_df['local_start_time'].dt.dayofweek == 5]['heart_rate'],
-					name = 'Saturday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = heart_rate_df[heart_rate_df['local_start_time'].dt.dayofweek == 6]['heart_rate'],
-					name = 'Sunday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-			],
+			'data': box_traces(split_groups(heart_rate_df['heart_rate'], heart_rate_df['local_start_time'].dt.dayofweek,
+				range(7), WEEKDAYS), heart_plot_mode, boxpoints='outliers', boxmean='sd'),
 			'layout': go.Layout(
 				title = 'Heart Rate per Weekday',
 				xaxis = {'title': 'Weekday'},
@@ -238,14 +154,8 @@ def update_heart_plot(plot):
 		}
 	elif plot == 'Heart Rate vs Time of Day':
 		return {
-			'data': [{
-					'y': heart_rate_df[heart_rate_df['local_start_time'].dt.hour == i]['heart_rate'],
-					'name': str(i),
-					'type': 'box',
-					'boxpoints': 'outliers',
-					'boxmean': 'sd',
-				} for i in range(23)
-			],
+			'data': box_traces(split_groups(heart_rate_df['heart_rate'], heart_rate_df['local_start_time'].dt.hour,
+				range(24)), heart_plot_mode, boxpoints='outliers', boxmean='sd'),
 			'layout': go.Layout(
 				title = 'Heart Rate per Time of Day',
 				xaxis = {'title': 'Time of Day (hr)'},
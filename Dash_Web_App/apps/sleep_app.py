@@ -8,22 +8,11 @@ import numpy as np
 
 #import supporting python scripts
 from app import app
-
-#import data files
-sleep_df = pd.read_csv("cleaned_data/sleep_cleaned.csv", sep=',', index_col=0)
-
-#cast to datetime object
-sleep_df['local_start_time'] = pd.to_datetime(sleep_df['local_start_time'])
-sleep_df['local_end_time'] = pd.to_datetime(sleep_df['local_end_time'])
-#add new values
-sleep_df['duration_hr'] = (sleep_df['local_end_time'] - sleep_df['local_start_time'])/np.timedelta64(1, 'h')
-sleep_df['bedtime_hr'] = sleep_df['local_start_time'].dt.hour
-sleep_df['date'] = sleep_df['local_start_time'].dt.date
-
-#add time zone float to heart_df
-def to_float(x):
-    return float(x[1])/100
-sleep_df['hr_offset'] = sleep_df['time_offset'].str.split('UTC').apply(to_float)
+from page_layouts import nav_header, nav_footer
+from data_loader import load_dataset
+from figure_cache import cached_figure
+from plot_stats import plot_mode, time_zones, split_groups, histogram_traces, box_traces, scatter_traces, series_trace, zoomable_figure, WEEKDAYS
+from time_query import time_window, time_traces
 
 sleep_plot_types = {
 	'Histogram': ['Duration', 'Efficiency', 'Bedtime'],
@@ -32,19 +21,11 @@ sleep_plot_types = {
 	'Boxplot': ['Duration vs Weekday'],
 }
 
+#plot mode of the histograms and boxplots ('raw' or 'aggregated')
+sleep_plot_mode = plot_mode('sleep')
+
 sleep_page = html.Div([
-	html.Header([
-		' | ',
-		dcc.Link('Home', href='/'), ' | ',
-		dcc.Link('Summary', href='/summary'), ' | ',
-		dcc.Link('Sleep', href='/sleep'), ' | ',
-		dcc.Link('Step Count', href='/step') , ' | ',
-		dcc.Link('Floors Climbed', href='/floors'), ' | ',
-		dcc.Link('Heart Rate', href='/heart'), ' | ',
-		dcc.Link('Exercise', href='/exercise'), ' | ',
-		dcc.Link('Daily Aggregated', href='/daily_aggregated'), ' | ',
-		dcc.Link('Data Sets', href='/data'), ' | '
-	], id='top', style={'textAlign':'center'}),
+	nav_header(),
 	html.Br(),
 	html.Div([
 		html.H1('Sleep Analysis'),
@@ -120,18 +101,7 @@ sleep_page = html.Div([
 	], id='sleep_analysis'),
 	html.Br(),
 	html.H6(['Go to ', html.A('top', href='#top')], style={'textAlign':'center'}),
-	html.Footer([
-		' | ',
-		dcc.Link('Home', href='/'), ' | ',
-		dcc.Link('Summary', href='/summary'), ' | ',
-		dcc.Link('Sleep', href='/sleep'), ' | ',
-		dcc.Link('Step Count', href='/step') , ' | ',
-		dcc.Link('Floors Climbed', href='/floors'), ' | ',
-		dcc.Link('Heart Rate', href='/heart'), ' | ',
-		dcc.Link('Exercise', href='/exercise'), ' | ',
-		dcc.Link('Daily Aggregated', href='/daily_aggregated'), ' | ',
-		dcc.Link('Data Sets', href='/data'), ' | '
-	], style={'textAlign':'center'})
+	nav_footer()
 ])
 
 #update the dropdown options depending on the selected graph type
@@ -144,28 +114,19 @@ def set_sleep_plot_data(selected_plot):
 #update the displayed graph depending on dropdown value
 @app.callback(
     Output('sleep_graphic', 'figure'),
-    [Input('sleep_plot_data', 'value')])
-def update_sleep_plot(plot):
+    [Input('sleep_plot_data', 'value'),
+    Input('sleep_graphic', 'relayoutData')])
+@zoomable_figure(sleep_plot_types['Scatter'] + sleep_plot_types['Line'])
+@cached_figure('sleep', variant=sleep_plot_mode)
+def update_sleep_plot(plot, window=None):
+	#data set of the logged in user
+	sleep_df = load_dataset('sleep', derived=True)
 	#histograms
 	if plot == 'Duration':
+		efficient_df = sleep_df[sleep_df['efficiency'] != 0]
 		return {
-			'data': [go.Histogram(
-					x = sleep_df[(sleep_df['efficiency'] != 0) & (sleep_df['time_offset'] == 'UTC-0800')]['duration_hr'],
-					name = 'UTC-0800',
-				),
-				go.Histogram(
-					x = sleep_df[(sleep_df['efficiency'] != 0) & (sleep_df['time_offset'] == 'UTC-0500')]['duration_hr'],
-					name = 'UTC-0500',
-				),
-				go.Histogram(
-					x = sleep_df[(sleep_df['efficiency'] != 0) & (sleep_df['time_offset'] == 'UTC-0400')]['duration_hr'],
-					name = 'UTC-0400',
-				),
-				go.Histogram(
-					x = sleep_df[(sleep_df['efficiency'] != 0) & (sleep_df['time_offset'] == 'UTC+0200')]['duration_hr'],
-					name = 'UTC+0200',
-				),
-			],
+			'data': histogram_traces(split_groups(efficient_df['duration_hr'], efficient_df['time_offset'],
+				time_zones(sleep_df)), sleep_plot_mode),
 			'layout': go.Layout(
 				title = 'Sleep Duration Distribution',
 				xaxis = {'title': 'Duration (hrs)'},
@@ -175,24 +136,10 @@ def update_sleep_plot(plot):
 			)
 		}
 	elif plot == 'Efficiency':
+		efficient_df = sleep_df[sleep_df['efficiency'] != 0]
 		return {
-			'data': [go.Histogram(
-					x = sleep_df[(sleep_df['efficiency'] != 0) & (sleep_df['time_offset'] == 'UTC-0800')]['efficiency'],
-					name = 'UTC-0800',
-				),
-				go.Histogram(
-					x = sleep_df[(sleep_df['efficiency'] != 0) & (sleep_df['time_offset'] == 'UTC-0500')]['efficiency'],
-					name = 'UTC-0500',
-				),
-				go.Histogram(
-					x = sleep_df[(sleep_df['efficiency'] != 0) & (sleep_df['time_offset'] == 'UTC-0400')]['efficiency'],
-					name = 'UTC-0400',
-				),
-				go.Histogram(
-					 x= sleep_df[(sleep_df['efficiency'] != 0) & (sleep_df['time_offset'] == 'UTC+0200')]['efficiency'],
-					 name = 'UTC+0200',
-				),
-			],
+			'data': histogram_traces(split_groups(efficient_df['efficiency'], efficient_df['time_offset'],
+				time_zones(sleep_df)), sleep_plot_mode),
 			'layout': go.Layout(
 				title = 'Sleep Efficiency Distribution',
 				xaxis = {'title': 'Efficiency (%)'},
@@ -203,27 +150,8 @@ def update_sleep_plot(plot):
 		}
 	elif plot == 'Bedtime':
 		return {
-			'data': [go.Histogram(
-					x = sleep_df[sleep_df['time_offset'] == 'UTC-0800']['bedtime_hr'],
-					name = 'UTC-0800',
-					nbinsx = 24,
-				),
-				go.Histogram(
-					x = sleep_df[sleep_df['time_offset'] == 'UTC-0500']['bedtime_hr'],
-					name = 'UTC-0500',
-					nbinsx = 24,
-				),
-				go.Histogram(
-					x = sleep_df[sleep_df['time_offset'] == 'UTC-0400']['bedtime_hr'],
-					name = 'UTC-0400',
-					nbinsx = 24,
-				),
-				go.Histogram(
-					x = sleep_df[sleep_df['time_offset'] == 'UTC+0200']['bedtime_hr'],
-					name = 'UTC+0200',
-					nbinsx = 24,
-				),
-			],
+			'data': histogram_traces(split_groups(sleep_df['bedtime_hr'], sleep_df['time_offset'],
+				time_zones(sleep_df)), sleep_plot_mode, bins=np.arange(25), nbinsx=24),
 			'layout': go.Layout(
 				title = 'Bedtime Hour Distribution',
 				xaxis = {'title': 'Bedtime Hour'},
@@ -236,31 +164,8 @@ def update_sleep_plot(plot):
 	#scatter plots
 	if plot == 'Duration vs Time':
 		return {
-			'data': [go.Scatter(
-					x = sleep_df[sleep_df['time_offset'] == 'UTC-0800']['local_start_time'],
-					y = sleep_df[sleep_df['time_offset'] == 'UTC-0800']['duration_hr'],
-					name = 'UTC-0800',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = sleep_df[sleep_df['time_offset'] == 'UTC-0500']['local_start_time'],
-					y = sleep_df[sleep_df['time_offset'] == 'UTC-0500']['duration_hr'],
-					name = 'UTC-0500',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = sleep_df[sleep_df['time_offset'] == 'UTC-0400']['local_start_time'],
-					y = sleep_df[sleep_df['time_offset'] == 'UTC-0400']['duration_hr'],
-					name = 'UTC-0400',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = sleep_df[sleep_df['time_offset'] == 'UTC+0200']['local_start_time'],
-					y = sleep_df[sleep_df['time_offset'] == 'UTC+0200']['duration_hr'],
-					name = 'UTC+0200',
-					mode = 'markers',
-				),
-			],
+			'data': time_traces(sleep_df, 'sleep', 'local_start_time', 'duration_hr', window,
+				by='time_offset', keys=time_zones(sleep_df), mode='markers'),
 			'layout': go.Layout(
 				title = 'Sleep Duration over Time',
 				xaxis = {'title': 'Time (year)'},
@@ -270,31 +175,8 @@ def update_sleep_plot(plot):
 		}
 	elif plot == 'Quality vs Duration':
 		return {
-			'data': [go.Scatter(
-					x = sleep_df[sleep_df['time_offset'] == 'UTC-0800']['duration_hr'],
-					y = sleep_df[sleep_df['time_offset'] == 'UTC-0800']['quality']-5e4,
-					name = 'UTC-0800',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = sleep_df[sleep_df['time_offset'] == 'UTC-0500']['duration_hr'],
-					y = sleep_df[sleep_df['time_offset'] == 'UTC-0500']['quality']-5e4,
-					name = 'UTC-0500',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = sleep_df[sleep_df['time_offset'] == 'UTC-0400']['duration_hr'],
-					y = sleep_df[sleep_df['time_offset'] == 'UTC-0400']['quality']-5e4,
-					name = 'UTC-0400',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = sleep_df[sleep_df['time_offset'] == 'UTC+0200']['duration_hr'],
-					y = sleep_df[sleep_df['time_offset'] == 'UTC+0200']['quality']-5e4,
-					name = 'UTC+0200',
-					mode = 'markers',
-				),
-			],
+			'data': scatter_traces(split_groups(sleep_df, 'time_offset', time_zones(sleep_df)),
+				'duration_hr', lambda df: df['quality']-5e4, mode='markers', window=window),
 			'layout': go.Layout(
 				title = 'Sleep Quality vs Duration',
 				xaxis = {'title': 'Duration (hrs)'},
@@ -303,32 +185,10 @@ def update_sleep_plot(plot):
 			)
 		}
 	elif plot == 'Efficiency vs Duration':
+		efficient_df = sleep_df[sleep_df['efficiency'] != 0]
 		return {
-			'data': [go.Scatter(
-					x = sleep_df[(sleep_df['efficiency'] != 0) & (sleep_df['time_offset'] == 'UTC-0800')]['duration_hr'],
-					y = sleep_df[(sleep_df['efficiency'] != 0) & (sleep_df['time_offset'] == 'UTC-0800')]['efficiency'],
-					name = 'UTC-0800',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = sleep_df[(sleep_df['efficiency'] != 0) & (sleep_df['time_offset'] == 'UTC-0500')]['duration_hr'],
-					y = sleep_df[(sleep_df['efficiency'] != 0) & (sleep_df['time_offset'] == 'UTC-0500')]['efficiency'],
-					name = 'UTC-0500',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = sleep_df[(sleep_df['efficiency'] != 0) & (sleep_df['time_offset'] == 'UTC-0400')]['duration_hr'],
-					y = sleep_df[(sleep_df['efficiency'] != 0) & (sleep_df['time_offset'] == 'UTC-0400')]['efficiency'],
-					name = 'UTC-0400',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = sleep_df[(sleep_df['efficiency'] != 0) & (sleep_df['time_offset'] == 'UTC+0200')]['duration_hr'],
-					y = sleep_df[(sleep_df['efficiency'] != 0) & (sleep_df['time_offset'] == 'UTC+0200')]['efficiency'],
-					name = 'UTC+0200',
-					mode = 'markers',
-				),
-			],
+			'data': scatter_traces(split_groups(efficient_df, 'time_offset', time_zones(sleep_df)),
+				'duration_hr', 'efficiency', mode='markers', window=window),
 			'layout': go.Layout(
 				title = 'Sleep Efficiency vs Duration',
 				xaxis = {'title': 'Duration (hrs)'},
@@ -337,32 +197,11 @@ def update_sleep_plot(plot):
 			)
 		}
 	elif plot == 'Efficiency vs Time':
+		window_df = time_window(sleep_df, 'local_start_time', window, 'sleep')
+		efficient_df = window_df[window_df['efficiency'] != 0]
 		return {
-			'data': [go.Scatter(
-					x = sleep_df[(sleep_df['efficiency'] != 0) & (sleep_df['time_offset'] == 'UTC-0800')]['local_start_time'],
-					y = sleep_df[(sleep_df['efficiency'] != 0) & (sleep_df['time_offset'] == 'UTC-0800')]['efficiency'],
-					name = 'UTC-0800',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = sleep_df[(sleep_df['efficiency'] != 0) & (sleep_df['time_offset'] == 'UTC-0500')]['local_start_time'],
-					y = sleep_df[(sleep_df['efficiency'] != 0) & (sleep_df['time_offset'] == 'UTC-0500')]['efficiency'],
-					name = 'UTC-0500',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = sleep_df[(sleep_df['efficiency'] != 0) & (sleep_df['time_offset'] == 'UTC-0400')]['local_start_time'],
-					y = sleep_df[(sleep_df['efficiency'] != 0) & (sleep_df['time_offset'] == 'UTC-0400')]['efficiency'],
-					name = 'UTC-0400',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = sleep_df[(sleep_df['efficiency'] != 0) & (sleep_df['time_offset'] == 'UTC+0200')]['local_start_time'],
-					y = sleep_df[(sleep_df['efficiency'] != 0) & (sleep_df['time_offset'] == 'UTC+0200')]['efficiency'],
-					name = 'UTC+0200',
-					mode = 'markers',
-				),
-			],
+			'data': scatter_traces(split_groups(efficient_df, 'time_offset', time_zones(sleep_df)),
+				'local_start_time', 'efficiency', window=window, mode='markers'),
 			'layout': go.Layout(
 				title = 'Sleep Efficiency over Time',
 				xaxis = {'title': 'Time (year)'},
@@ -374,49 +213,8 @@ def update_sleep_plot(plot):
 	#boxplot
 	if plot == 'Duration vs Weekday':
 		return {
-			'data': [go.Box(
-					y = sleep_df[sleep_df['local_start_time'].dt.dayofweek == 0]['duration_hr'],
-					name = 'Monday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = sleep_df[sleep_df['local_start_time'].dt.dayofweek == 1]['duration_hr'],
-					name = 'Tuesday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = sleep_df[sleep_df['local_start_time'].dt.dayofweek == 2]['duration_hr'],
-					name = 'Wednesday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = sleep_df[sleep_df['local_start_time'].dt.dayofweek == 3]['duration_hr'],
-					name = 'Thursday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = sleep_df[sleep_df['local_start_time'].dt.dayofweek == 4]['duration_hr'],
-					name = 'Friday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = sleep_df[sleep_df['local_start_time'].dt.dayofweek == 5]['duration_hr'],
-					name = 'Saturday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = sleep_df[sleep_df['local_start_time'].dt.dayofweek == 6]['duration_hr'],
-					name = 'Sunday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-			],
+			'data': box_traces(split_groups(sleep_df['duration_hr'], sleep_df['local_start_time'].dt.dayofweek,
+				range(7), WEEKDAYS), sleep_plot_mode, boxpoints='outliers', boxmean='sd'),
 			'layout': go.Layout(
 				title = 'Sleep Duration per Weekday',
 				xaxis = {'title': 'Weekday'},
@@ -426,9 +224,10 @@ def update_sleep_plot(plot):
 		}
 		
 	#line plot
-	chron_sort_df = sleep_df.sort_values(by='local_start_time', axis=0, ascending=True)
+	chron_sort_df = time_window(sleep_df, 'local_start_time', window, 'sleep')
 	return {
-		'data': [go.Scatter(
+		'data': [series_trace(
+			window = window,
 			x = chron_sort_df['local_start_time'],
 			y = chron_sort_df['hr_offset'],
 			name = plot,
@@ -8,13 +8,11 @@ import numpy as np
 
 #import supporting python scripts
 from app import app
-
-#import data files
-step_count_df = pd.read_csv("cleaned_data/step_count_cleaned.csv", sep=',', index_col=0)
-
-#cast to datetime object
-step_count_df['local_start_time'] = pd.to_datetime(step_count_df['local_start_time'])
-step_count_df['local_end_time'] = pd.to_datetime(step_count_df['local_end_time'])
+from page_layouts import nav_header, nav_footer
+from data_loader import load_dataset
+from figure_cache import cached_figure
+from plot_stats import plot_mode, time_zones, split_groups, histogram_traces, box_traces, scatter_traces, zoomable_figure, WEEKDAYS
+from time_query import time_traces
 
 step_plot_types = {
 	'Histogram': ['Step Count', 'Time of Day'],
@@ -22,19 +20,17 @@ step_plot_types = {
 	'Boxplot': ['Distance vs Weekday'],
 }
 
+#plot mode of the histograms and boxplots ('raw' or 'aggregated')
+step_plot_mode = plot_mode('step')
+
+#speed classes of the step entries (lower bound included)
+speed_names = ['slow walk (< 1.3 m/s)', 'walk (1.3 - 2.0 m/s)', 'jog (2.0 - 2.5 m/s)', 'run (2.5 - 3.5 m/s)', 'fast run (> 3.5 m/s)']
+
+def speed_classes(df):
+	return pd.cut(df['speed'], [-np.inf, 1.3, 2.0, 2.5, 3.5, np.inf], labels=speed_names, right=False)
+
 step_page = html.Div([
-	html.Header([
-		' | ',
-		dcc.Link('Home', href='/'), ' | ',
-		dcc.Link('Summary', href='/summary'), ' | ',
-		dcc.Link('Sleep', href='/sleep'), ' | ',
-		dcc.Link('Step Count', href='/step') , ' | ',
-		dcc.Link('Floors Climbed', href='/floors'), ' | ',
-		dcc.Link('Heart Rate', href='/heart'), ' | ',
-		dcc.Link('Exercise', href='/exercise'), ' | ',
-		dcc.Link('Daily Aggregated', href='/daily_aggregated'), ' | ',
-		dcc.Link('Data Sets', href='/data'), ' | '
-	], id='top', style={'textAlign':'center'}),
+	nav_header(),
 	html.Br(),
 	html.Div([
 		html.H1('Step Count Analysis'),
@@ -100,18 +96,7 @@ step_page = html.Div([
 	], id='step_analysis'),
 	html.Br(),
 	html.H6(['Go to ', html.A('top', href='#top')], style={'textAlign':'center'}),
-	html.Footer([
-		' | ',
-		dcc.Link('Home', href='/'), ' | ',
-		dcc.Link('Summary', href='/summary'), ' | ',
-		dcc.Link('Sleep', href='/sleep'), ' | ',
-		dcc.Link('Step Count', href='/step') , ' | ',
-		dcc.Link('Floors Climbed', href='/floors'), ' | ',
-		dcc.Link('Heart Rate', href='/heart'), ' | ',
-		dcc.Link('Exercise', href='/exercise'), ' | ',
-		dcc.Link('Daily Aggregated', href='/daily_aggregated'), ' | ',
-		dcc.Link('Data Sets', href='/data'), ' | '
-	], style={'textAlign':'center'})
+	nav_footer()
 ])
 
 
@@ -125,28 +110,18 @@ def set_step_plot_data(selected_plot):
 #update the displayed graph depending on dropdown value
 @app.callback(
     Output('step_graphic', 'figure'),
-    [Input('step_plot_data', 'value')])
-def update_step_plot(plot):
+    [Input('step_plot_data', 'value'),
+    Input('step_graphic', 'relayoutData')])
+@zoomable_figure(step_plot_types['Scatter'])
+@cached_figure('step_count', variant=step_plot_mode)
+def update_step_plot(plot, window=None):
+	#data set of the logged in user
+	step_count_df = load_dataset('step_count')
 	#histograms
 	if plot == 'Step Count':
 		return {
-			'data': [go.Histogram(
-					x = step_count_df[step_count_df['time_offset'] == 'UTC-0800']['count'],
-					name = 'UTC-0800',
-				),
-				go.Histogram(
-					x = step_count_df[step_count_df['time_offset'] == 'UTC-0500']['count'],
-					name = 'UTC-0500',
-				),
-				go.Histogram(
-					x = step_count_df[step_count_df['time_offset'] == 'UTC-0400']['count'],
-					name = 'UTC-0400',
-				),
-				go.Histogram(
-					x = step_count_df[step_count_df['time_offset'] == 'UTC+0200']['count'],
-					name = 'UTC+0200',
-				),
-			],
+			'data': histogram_traces(split_groups(step_count_df['count'], step_count_df['time_offset'],
+				time_zones(step_count_df)), step_plot_mode),
 			'layout': go.Layout(
 				title = 'Step Count Distribution',
 				xaxis = {'title': 'Steps'},
@@ -157,57 +132,9 @@ def update_step_plot(plot):
 		}
 	elif plot == 'Time of Day':
 		return {
-			'data': [go.Histogram(
-					x = step_count_df[step_count_df['speed'] < 1.3]['local_start_time'].dt.hour,
-					name = 'slow walk (< 1.3 m/s)',
-					nbinsx = 24,
-					xbins=dict(
-						start = '00:00:00',
-						end = '23:59:59',
-						size = 'M2'),
-					autobinx = False
-				),
-				go.Histogram(
-					x = step_count_df[(step_count_df['speed'] > 1.3) & (step_count_df['speed'] < 2.0)]['local_start_time'].dt.hour,
-					name = 'walk (1.3 - 2.0 m/s)',
-					nbinsx = 24,
-					xbins=dict(
-						start = '00:00:00',
-						end = '23:59:59',
-						size = 'M2'),
-					autobinx = False
-				),
-				go.Histogram(
-					x = step_count_df[(step_count_df['speed'] > 2.0) & (step_count_df['speed'] < 2.5)]['local_start_time'].dt.hour,
-					name = 'jog (2.0 - 2.5 m/s)',
-					nbinsx = 24,
-					xbins=dict(
-						start = '00:00:00',
-						end = '23:59:59',
-						size = 'M2'),
-					autobinx = False
-				),
-				go.Histogram(
-					x = step_count_df[(step_count_df['speed'] > 2.5) & (step_count_df['speed'] < 3.5)]['local_start_time'].dt.hour,
-					name = 'run (2.5 - 3.5 m/s)',
-					nbinsx = 24,
-					xbins=dict(
-						start = '00:00:00',
-						end = '23:59:59',
-						size = 'M2'),
-					autobinx = False
-				),
-				go.Histogram(
-					x = step_count_df[step_count_df['speed'] > 3.5]['local_start_time'].dt.hour,
-					name = 'fast run (> 3.5 m/s)',
-					nbinsx = 24,
-					xbins=dict(
-						start = '00:00:00',
-						end = '23:59:59',
-						size = 'M2'),
-					autobinx = False
-				),
-			],
+			'data': histogram_traces(split_groups(step_count_df['local_start_time'].dt.hour, speed_classes(step_count_df), speed_names),
+				step_plot_mode, bins=np.arange(25),
+				nbinsx=24, xbins=dict(start='00:00:00', end='23:59:59', size='M2'), autobinx=False),
 			'layout': go.Layout(
 				title = 'Time of Day Distribution',
 				xaxis = {'title': 'Time (hr)'},
@@ -220,13 +147,8 @@ def update_step_plot(plot):
 	#scatter plots
 	if plot == 'Count vs Time':
 		return {
-			'data': [go.Scatter(
-					x = step_count_df['local_start_time'],
-					y = step_count_df['count'],
-					name = 'UTC-0500',
-					mode = 'markers',
-				),
-			],
+			'data': time_traces(step_count_df, 'step_count', 'local_start_time', 'count', window,
+				name='UTC-0500', mode='markers'),
 			'layout': go.Layout(
 				title = 'Step Count over Time',
 				xaxis = {'title': 'Time (year)'},
@@ -236,37 +158,8 @@ def update_step_plot(plot):
 		}
 	elif plot == 'Count vs Distance':
 		return {
-			'data': [go.Scatter(
-					x = step_count_df[step_count_df['speed'] < 1.3]['distance'],
-					y = step_count_df[step_count_df['speed'] < 1.3]['count'],
-					name = 'slow walk (< 1.3 m/s)',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = step_count_df[(step_count_df['speed'] > 1.3) & (step_count_df['speed'] < 2.0)]['distance'],
-					y = step_count_df[(step_count_df['speed'] > 1.3) & (step_count_df['speed'] < 2.0)]['count'],
-					name = 'walk (1.3 - 2.0 m/s)',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = step_count_df[(step_count_df['speed'] > 2.0) & (step_count_df['speed'] < 2.5)]['distance'],
-					y = step_count_df[(step_count_df['speed'] > 2.0) & (step_count_df['speed'] < 2.5)]['count'],
-					name = 'jog (2.0 - 2.5 m/s)',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = step_count_df[(step_count_df['speed'] > 2.5) & (step_count_df['speed'] < 3.5)]['distance'],
-					y = step_count_df[(step_count_df['speed'] > 2.5) & (step_count_df['speed'] < 3.5)]['count'],
-					name = 'run (2.5 - 3.5 m/s)',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = step_count_df[step_count_df['speed'] > 3.5]['distance'],
-					y = step_count_df[step_count_df['speed'] > 3.5]['count'],
-					name = 'fast run (> 3.5 m/s)',
-					mode = 'markers',
-				),
-			],
+			'data': scatter_traces(split_groups(step_count_df, speed_classes(step_count_df), speed_names),
+				'distance', 'count', mode='markers', window=window),
 			'layout': go.Layout(
 				title = 'Step Count vs Distance',
 				xaxis = {'title': 'Distance (m)'},
@@ -276,37 +169,8 @@ def update_step_plot(plot):
 		}
 	elif plot == 'Calorie vs Distance':
 		return {
-			'data': [go.Scatter(
-					x = step_count_df[step_count_df['speed'] < 1.3]['distance'],
-					y = step_count_df[step_count_df['speed'] < 1.3]['calorie'],
-					name = 'slow walk (< 1.3 m/s)',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = step_count_df[(step_count_df['speed'] > 1.3) & (step_count_df['speed'] < 2.0)]['distance'],
-					y = step_count_df[(step_count_df['speed'] > 1.3) & (step_count_df['speed'] < 2.0)]['calorie'],
-					name = 'walk (1.3 - 2.0 m/s)',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = step_count_df[(step_count_df['speed'] > 2.0) & (step_count_df['speed'] < 2.5)]['distance'],
-					y = step_count_df[(step_count_df['speed'] > 2.0) & (step_count_df['speed'] < 2.5)]['calorie'],
-					name = 'jog (2.0 - 2.5 m/s)',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = step_count_df[(step_count_df['speed'] > 2.5) & (step_count_df['speed'] < 3.5)]['distance'],
-					y = step_count_df[(step_count_df['speed'] > 2.5) & (step_count_df['speed'] < 3.5)]['calorie'],
-					name = 'run (2.5 - 3.5 m/s)',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = step_count_df[step_count_df['speed'] > 3.5]['distance'],
-					y = step_count_df[step_count_df['speed'] > 3.5]['calorie'],
-					name = 'fast run (> 3.5 m/s)',
-					mode = 'markers',
-				),
-			],
+			'data': scatter_traces(split_groups(step_count_df, speed_classes(step_count_df), speed_names),
+				'distance', 'calorie', mode='markers', window=window),
 			'layout': go.Layout(
 				title = 'Calories Burned vs Distance',
 				xaxis = {'title': 'Distance (m)'},
@@ -318,49 +182,8 @@ def update_step_plot(plot):
 	#boxplots
 	if plot == 'Distance vs Weekday':
 		return {
-			'data': [go.Box(
-					y = step_count_df[step_count_df['local_start_time'].dt.dayofweek == 0]['distance'],
-					name = 'Monday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = step_count_df[step_count_df['local_start_time'].dt.dayofweek == 1]['distance'],
-					name = 'Tuesday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = step_count_df[step_count_df['local_start_time'].dt.dayofweek == 2]['distance'],
-					name = 'Wednesday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = step_count_df[step_count_df['local_start_time'].dt.dayofweek == 3]['distance'],
-					name = 'Thursday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = step_count_df[step_count_df['local_start_time'].dt.dayofweek == 4]['distance'],
-					name = 'Friday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = step_count_df[step_count_df['local_start_time'].dt.dayofweek == 5]['distance'],
-					name = 'Saturday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-				go.Box(
-					y = step_count_df[step_count_df['local_start_time'].dt.dayofweek == 6]['distance'],
-					name = 'Sunday',
-					boxpoints = 'outliers',
-					boxmean = 'sd'
-				),
-			],
+			'data': box_traces(split_groups(step_count_df['distance'], step_count_df['local_start_time'].dt.dayofweek,
+				range(7), WEEKDAYS), step_plot_mode, boxpoints='outliers', boxmean='sd'),
 			'layout': go.Layout(
 				title = 'Distance per Weekday',
 				xaxis = {'title': 'Weekday'},
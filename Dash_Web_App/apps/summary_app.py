@@ -8,45 +8,11 @@ import numpy as np
 
 #import supporting python scripts
 from app import app
-
-#import data files
-daily_df = pd.read_csv("cleaned_data/daily_aggregated.csv", sep=',', index_col=0)
-exercise_df = pd.read_csv("cleaned_data/exercise_cleaned.csv", sep=',', index_col=0)
-floors_df = pd.read_csv("cleaned_data/floors_climbed_cleaned.csv", sep=',', index_col=0)
-heart_rate_df = pd.read_csv("cleaned_data/heart_rate_cleaned.csv", sep=',', index_col=0)
-sleep_df = pd.read_csv("cleaned_data/sleep_cleaned.csv", sep=',', index_col=0)
-step_count_df = pd.read_csv("cleaned_data/step_count_cleaned.csv", sep=',', index_col=0)
-summary_df = pd.read_csv("cleaned_data/summary_cleaned.csv", sep=',', index_col=0)
-
-#cast to datetime object
-sleep_df['local_start_time'] = pd.to_datetime(sleep_df['local_start_time'])
-sleep_df['local_end_time'] = pd.to_datetime(sleep_df['local_end_time'])
-step_count_df['local_start_time'] = pd.to_datetime(step_count_df['local_start_time'])
-step_count_df['local_end_time'] = pd.to_datetime(step_count_df['local_end_time'])
-heart_rate_df['local_start_time'] = pd.to_datetime(heart_rate_df['local_start_time'])
-heart_rate_df['local_end_time'] = pd.to_datetime(heart_rate_df['local_end_time'])
-floors_df['local_start_time'] = pd.to_datetime(floors_df['local_start_time'])
-floors_df['local_end_time'] = pd.to_datetime(floors_df['local_end_time'])
-exercise_df['local_start_time'] = pd.to_datetime(exercise_df['local_start_time'])
-exercise_df['local_end_time'] = pd.to_datetime(exercise_df['local_end_time'])
-summary_df['day_time'] = pd.to_datetime(summary_df['day_time'], unit='ms')
-summary_df['run_time'] = pd.to_datetime(summary_df['run_time'], unit='ms').dt.time
-summary_df['longest_idle_time'] = pd.to_datetime(summary_df['longest_idle_time'], unit='ms').dt.time
-summary_df['longest_active_time'] = pd.to_datetime(summary_df['longest_active_time'], unit='ms').dt.time
-summary_df['walk_time'] = pd.to_datetime(summary_df['walk_time'], unit='ms').dt.time
-summary_df['others_time'] = pd.to_datetime(summary_df['others_time'], unit='ms').dt.time
-summary_df['active_time'] = pd.to_datetime(summary_df['active_time'], unit='ms').dt.time
-daily_df['date'] = pd.to_datetime(daily_df['date'])
-
-#add new values to sleep_df
-sleep_df['duration_hr'] = (sleep_df['local_end_time'] - sleep_df['local_start_time'])/np.timedelta64(1, 'h')
-sleep_df['bedtime_hr'] = sleep_df['local_start_time'].dt.hour
-sleep_df['date'] = sleep_df['local_start_time'].dt.date
-
-#add time zone float to heart_df
-def to_float(x):
-    return float(x[1])/100
-heart_rate_df['hr_offset'] = heart_rate_df['time_offset'].str.split('UTC').apply(to_float)
+from page_layouts import nav_header, nav_footer
+from data_loader import load_dataset
+from figure_cache import cached_figure
+from plot_stats import plot_mode, time_zones, split_groups, histogram_traces, series_trace, zoomable_figure
+from time_query import time_window, time_traces
 
 summary_app_plot_types = {
 	'Histogram': ['Heart Rate', 'Exercise Type'],
@@ -54,19 +20,11 @@ summary_app_plot_types = {
 	'Line': ['Time Offset vs Time'],
 }
 
+#plot mode of the histograms and boxplots ('raw' or 'aggregated')
+summary_plot_mode = plot_mode('summary')
+
 summary_page = html.Div([
-	html.Header([
-		' | ',
-		dcc.Link('Home', href='/'), ' | ',
-		dcc.Link('Summary', href='/summary'), ' | ',
-		dcc.Link('Sleep', href='/sleep'), ' | ',
-		dcc.Link('Step Count', href='/step') , ' | ',
-		dcc.Link('Floors Climbed', href='/floors'), ' | ',
-		dcc.Link('Heart Rate', href='/heart'), ' | ',
-		dcc.Link('Exercise', href='/exercise'), ' | ',
-		dcc.Link('Daily Aggregated', href='/daily_aggregated'), ' | ',
-		dcc.Link('Data Sets', href='/data'), ' | '
-	], id='top', style={'textAlign':'center'}),
+	nav_header(),
 	html.Br(),
 	html.Div([
 		html.H1('Health App Data Analysis'),
@@ -121,18 +79,7 @@ summary_page = html.Div([
 	], id='summary_app_analysis'),
 	html.Br(),
 	html.H6(['Go to ', html.A('top', href='#top')], style={'textAlign':'center'}),
-	html.Footer([
-		' | ',
-		dcc.Link('Home', href='/'), ' | ',
-		dcc.Link('Summary', href='/summary'), ' | ',
-		dcc.Link('Sleep', href='/sleep'), ' | ',
-		dcc.Link('Step Count', href='/step') , ' | ',
-		dcc.Link('Floors Climbed', href='/floors'), ' | ',
-		dcc.Link('Heart Rate', href='/heart'), ' | ',
-		dcc.Link('Exercise', href='/exercise'), ' | ',
-		dcc.Link('Daily Aggregated', href='/daily_aggregated'), ' | ',
-		dcc.Link('Data Sets', href='/data'), ' | '
-	], style={'textAlign':'center'})
+	nav_footer()
 ]) 
 
 #update the dropdown options depending on the selected graph type
@@ -145,36 +92,20 @@ def set_summary_app_plot_data(selected_plot):
 #update the displayed graph depending on dropdown value
 @app.callback(
     Output('summary_app_graphic', 'figure'),
-    [Input('summary_app_plot_data', 'value')])
-def update_summary_app_plot(plot):
+    [Input('summary_app_plot_data', 'value'),
+    Input('summary_app_graphic', 'relayoutData')])
+@zoomable_figure(summary_app_plot_types['Scatter'] + summary_app_plot_types['Line'])
+@cached_figure('heart_rate', 'exercise', 'sleep', variant=summary_plot_mode)
+def update_summary_app_plot(plot, window=None):
+	#data sets of the logged in user
+	heart_rate_df = load_dataset('heart_rate', derived=True)
+	exercise_df = load_dataset('exercise', derived=True)
+	sleep_df = load_dataset('sleep', derived=True)
 	#histograms
 	if plot == 'Heart Rate':
 		return {
-			'data': [go.Histogram(
-					x = heart_rate_df[heart_rate_df['time_offset'] == 'UTC-0800']['heart_rate'],
-					name = 'UTC-0800',
-				),
-				go.Histogram(
-					x = heart_rate_df[heart_rate_df['time_offset'] == 'UTC-0700']['heart_rate'],
-					name = 'UTC-0700',
-				),
-				go.Histogram(
-					x = heart_rate_df[heart_rate_df['time_offset'] == 'UTC-0500']['heart_rate'],
-					name = 'UTC-0500',
-				),
-				go.Histogram(
-					x = heart_rate_df[heart_rate_df['time_offset'] == 'UTC-0400']['heart_rate'],
-					name = 'UTC-0400',
-				),
-				go.Histogram(
-					x = heart_rate_df[heart_rate_df['time_offset'] == 'UTC+0200']['heart_rate'],
-					name = 'UTC+0200',
-				),
-				go.Histogram(
-					x = heart_rate_df[heart_rate_df['time_offset'] == 'UTC+0430']['heart_rate'],
-					name = 'UTC+0430',
-				),
-			],
+			'data': histogram_traces(split_groups(heart_rate_df['heart_rate'], heart_rate_df['time_offset'],
+				time_zones(heart_rate_df)), summary_plot_mode),
 			'layout': go.Layout(
 				title = 'Heart Rate Distribution',
 				xaxis = {'title': 'Heart Rate (bpm)'},
@@ -185,27 +116,8 @@ def update_summary_app_plot(plot):
 		}
 	elif plot == 'Exercise Type':
 		return {
-			'data': [go.Histogram(
-					x = exercise_df[exercise_df['time_offset'] == 'UTC-0800']['exercise_type'],
-					name = 'UTC-0800',
-				),
-				go.Histogram(
-					x = exercise_df[exercise_df['time_offset'] == 'UTC-0700']['exercise_type'],
-					name = 'UTC-0700',
-				),
-				go.Histogram(
-					x = exercise_df[exercise_df['time_offset'] == 'UTC-0500']['exercise_type'],
-					name = 'UTC-0500',
-				),
-				go.Histogram(
-					x = exercise_df[exercise_df['time_offset'] == 'UTC-0400']['exercise_type'],
-					name = 'UTC-0400',
-				),
-				go.Histogram(
-					x = exercise_df[exercise_df['time_offset'] == 'UTC+0200']['exercise_type'],
-					name = 'UTC+0200',
-				),
-			],
+			'data': histogram_traces(split_groups(exercise_df['exercise_type'], exercise_df['time_offset'],
+				time_zones(exercise_df)), summary_plot_mode),
 			'layout': go.Layout(
 				title = 'Exercise Type Distribution',
 				xaxis = {'title': 'Exercise Type'},
@@ -217,9 +129,10 @@ def update_summary_app_plot(plot):
 		
 	#line plot
 	if plot == 'Time Offset vs Time':
-		chron_sort_df = heart_rate_df.sort_values(by='local_start_time', axis=0, ascending=True)
+		chron_sort_df = time_window(heart_rate_df, 'local_start_time', window, 'heart_rate')
 		return {
-			'data': [go.Scatter(
+			'data': [series_trace(
+				window = window,
 				x = chron_sort_df['local_start_time'],
 				y = chron_sort_df['hr_offset'],
 				name = plot,
@@ -236,31 +149,8 @@ def update_summary_app_plot(plot):
 	#scatter plots
 	if plot == 'Duration vs Time':
 		return {
-			'data': [go.Scatter(
-					x = sleep_df[sleep_df['time_offset'] == 'UTC-0800']['local_start_time'],
-					y = sleep_df[sleep_df['time_offset'] == 'UTC-0800']['duration_hr'],
-					name = 'UTC-0800',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = sleep_df[sleep_df['time_offset'] == 'UTC-0500']['local_start_time'],
-					y = sleep_df[sleep_df['time_offset'] == 'UTC-0500']['duration_hr'],
-					name = 'UTC-0500',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = sleep_df[sleep_df['time_offset'] == 'UTC-0400']['local_start_time'],
-					y = sleep_df[sleep_df['time_offset'] == 'UTC-0400']['duration_hr'],
-					name = 'UTC-0400',
-					mode = 'markers',
-				),
-				go.Scatter(
-					x = sleep_df[sleep_df['time_offset'] == 'UTC+0200']['local_start_time'],
-					y = sleep_df[sleep_df['time_offset'] == 'UTC+0200']['duration_hr'],
-					name = 'UTC+0200',
-					mode = 'markers',
-				),
-			],
+			'data': time_traces(sleep_df, 'sleep', 'local_start_time', 'duration_hr', window,
+				by='time_offset', keys=time_zones(sleep_df), mode='markers'),
 			'layout': go.Layout(
 				title = 'Sleep Duration over Time',
 				xaxis = {'title': 'Time (year)'},
@@ -0,0 +1,296 @@
+#import libraries
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import resource
+import tempfile
+import importlib
+import subprocess
+import pandas as pd
+import numpy as np
+import plotly
+
+#import supporting python scripts
+from profiling import timed, start_recording, stop_recording, startup_profile
+from data_cleaning_script import ORIGINAL_DATA_DIR, EXPORT_FILES, export_column
+
+#scales of the synthetic exports (copies of the bundled export) and where they and their cleaned data are written
+SCALES = [10, 100, 1000]
+BENCHMARK_DIR = 'benchmark_data'
+BENCHMARK_OUTPUT = 'benchmark_results.json'
+
+#time columns of the exports shifted in each copy (given as date-time text, or ms since the epoch for sleep and summary)
+EXPORT_TIME_COLUMNS = ['start_time', 'end_time', 'update_time', 'create_time', 'day_time', 'original_bed_time', 'original_wake_up_time']
+
+#figure callbacks of the pages: (module, callback, plot types of its dropdown)
+FIGURE_CALLBACKS = [
+	('apps.summary_app', 'update_summary_app_plot', 'summary_app_plot_types'),
+	('apps.sleep_app', 'update_sleep_plot', 'sleep_plot_types'),
+	('apps.step_app', 'update_step_plot', 'step_plot_types'),
+	('apps.floors_app', 'update_floors_plot', 'floors_plot_types'),
+	('apps.heart_app', 'update_heart_plot', 'heart_plot_types'),
+	('apps.exercise_app', 'update_exercise_plot', 'exercise_plot_types'),
+	('apps.aggregated_app', 'update_summary_plot', 'summary_plot_types'),
+	('apps.aggregated_app', 'update_daily_plot', 'daily_plot_types'),
+]
+
+#visible range of the zoomed figures of the plots over time (weeks of the bundled data, which every scale keeps)
+ZOOM_WINDOW = ('2018-12-01', '2018-12-08')
+
+
+#######SYNTHETIC EXPORTS
+#directories of the exports and cleaned data of a scale
+def scale_directories(scale, directory=BENCHMARK_DIR):
+	scale_dir = os.path.join(directory, 'x%d' % scale)
+	return os.path.join(scale_dir, 'original_data'), os.path.join(scale_dir, 'cleaned_data')
+
+def read_bundled_export(name):
+	return pd.read_csv(os.path.join(ORIGINAL_DATA_DIR, EXPORT_FILES[name] + '.csv'), sep=',', index_col=0)
+
+#time by which each copy is moved back from the previous one: the copies overlap, so a scale has scale times as many
+#rows per day over about the same span (copies moved back by the whole span would fall before the years kept by the
+#cleaning, or out of the range of the timestamps, long before the largest scales), with the times of day of the bundled
+#rows (overlapping sleep entries of the copies are combined by the cleaning, as with any other sleep interruption)
+COPY_SHIFT = pd.Timedelta(days=1)
+
+#the rows of an export moved back by shift, with their own datauuids
+def shifted_export(df, name, shift, copy):
+	df = df.copy()
+	for col in df.columns:
+		if col.replace(export_column(name, ''), '') not in EXPORT_TIME_COLUMNS:
+			continue
+		if pd.api.types.is_numeric_dtype(df[col]):
+			df[col] = df[col] - shift//pd.Timedelta(milliseconds=1)
+		else:
+			times = pd.to_datetime(df[col]) - shift
+			text = np.datetime_as_string(times.values.astype('datetime64[ms]'), unit='ms')
+			df[col] = np.where(times.isnull(), None, np.char.replace(text, 'T', ' '))
+	uuid = export_column(name, 'datauuid')
+	df[uuid] = df[uuid] + '-%d' % copy
+	return df
+
+#write the exports of a scale: scale copies of each bundled export, each one day earlier than the previous one (written copy by copy,
+#so only the bundled export is held in memory)
+def generate_exports(scale, directory):
+	os.makedirs(directory, exist_ok=True)
+	exports = {name: read_bundled_export(name) for name in EXPORT_FILES}
+	for name, df in exports.items():
+		path = os.path.join(directory, EXPORT_FILES[name] + '.csv')
+		tmp_path = '%s.%d.tmp' % (path, os.getpid())
+		for copy in range(scale):
+			shifted = shifted_export(df, name, COPY_SHIFT*copy, copy) if copy else df
+			shifted.index = np.arange(copy*len(df), (copy + 1)*len(df))
+			shifted.to_csv(tmp_path, sep=',', index=True, header=(copy == 0), mode='w' if copy == 0 else 'a')
+		os.replace(tmp_path, path)
+
+#number of rows and size of each export of a directory
+def export_sizes(directory):
+	sizes = {}
+	for name, file_name in EXPORT_FILES.items():
+		path = os.path.join(directory, file_name + '.csv')
+		with open(path, 'rb') as f:
+			rows = sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(2**20), b'')) - 1
+		sizes[name] = {'rows': rows, 'bytes': os.path.getsize(path)}
+	return sizes
+
+
+#######BENCHMARK OF ONE SCALE (run in its own process, with ORIGINAL_DATA_DIR and CLEANED_DATA_DIR set to the scale)
+#clean the exports stage by stage, as run_full (or run_streaming with a chunksize) does
+def benchmark_cleaning(chunksize=None):
+	import data_cleaning_script as cleaning
+	from data_loader import CLEANED_DATA_DIR
+	os.makedirs(CLEANED_DATA_DIR, exist_ok=True)
+	results = {}
+	for name in EXPORT_FILES:
+		with timed('clean ' + name):
+			if chunksize:
+				results[name] = cleaning.stream_stage(name, chunksize)
+			else:
+				results[name] = cleaning.clean_stage(name)
+	with timed('aggregate daily'):
+		if chunksize:
+			daily_agg_df = cleaning.daily_from_partials({name: partial for name, (mark, partial) in results.items() if partial is not None})
+		else:
+			daily_agg_df = cleaning.aggregate_daily({name: df for name, (mark, df) in results.items()})
+	with timed('write daily_aggregated'):
+		cleaning.write_cleaned(daily_agg_df, 'daily_aggregated')
+
+#load every data set as the warm up does (the first load of this process, from the columnar store if there is one)
+def benchmark_loading():
+	from data_loader import CLEANED_DATA_DIR, DATASET_FILES, DERIVED_COLUMNS, load_dataset
+	for name in DATASET_FILES:
+		with timed('load ' + name):
+			load_dataset(name, derived=name in DERIVED_COLUMNS, directory=CLEANED_DATA_DIR)
+
+def _serialize(value, sizes, step):
+	with timed('serialize ' + step):
+		text = json.dumps(value, cls=plotly.utils.PlotlyJSONEncoder)
+	sizes[step] = len(text)
+
+#function of a callback, without the response serialization added by app.callback (timed separately)
+def _callback_function(callback):
+	return callback.__wrapped__
+
+#build and serialize the figure of every plot of the pages (and the zoomed figure of the plots over time) and
+#the tables of the data page, repeat times each; the figure cache is off (FIGURE_CACHE_BACKEND=none)
+def benchmark_callbacks(repeat):
+	sizes = {}
+	for module, callback, plot_types in FIGURE_CALLBACKS:
+		module = importlib.import_module(module)
+		func = _callback_function(getattr(module, callback))
+		for plot_type, plots in getattr(module, plot_types).items():
+			for plot in plots:
+				step = '%s %s' % (callback, plot)
+				for i in range(repeat):
+					with timed('build ' + step):
+						figure = func(plot)
+					_serialize(figure, sizes, step)
+				if not plot.endswith((' vs Time', ' vs Date')):
+					continue
+				#(given the visible range directly, without the relayoutData handling of zoomable_figure)
+				step = '%s %s (zoomed)' % (callback, plot)
+				for i in range(repeat):
+					with timed('build ' + step):
+						figure = func.__wrapped__(plot, ZOOM_WINDOW)
+					_serialize(figure, sizes, step)
+	data_app = importlib.import_module('apps.data_app')
+	render_table = _callback_function(data_app.render_table)
+	update_table = _callback_function(data_app.update_table)
+	for tab in data_app.DATA_TABS:
+		step = 'render_table %s' % tab
+		for i in range(repeat):
+			with timed('build ' + step):
+				table = render_table(tab)
+			_serialize(table, sizes, step)
+		#(a page in the middle of the table sorted by time, or by its first column)
+		columns = [column['id'] for column in table.children[1].columns]
+		sorting_settings = [{'column_id': 'local_start_time' if 'local_start_time' in columns else columns[0], 'direction': 'desc'}]
+		step = 'update_table %s' % tab
+		for i in range(repeat):
+			with timed('build ' + step):
+				page = update_table({'current_page': 10, 'page_size': data_app.TABLE_PAGE_SIZE}, sorting_settings, '', tab)
+			_serialize(page, sizes, step)
+	return sizes
+
+#run the benchmarks of one scale and write the recorded steps (with the nested steps of the data loader) as json
+def run_scale(output, repeat, chunksize=None):
+	start_recording()
+	benchmark_cleaning(chunksize)
+	benchmark_loading()
+	sizes = benchmark_callbacks(repeat)
+	stop_recording()
+	profile = startup_profile()
+	profile['response_bytes'] = sizes
+	profile['peak_rss_bytes'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*1024
+	with open(output, 'w') as f:
+		json.dump(profile, f)
+
+
+#######RESULTS
+#one result per benchmarked step (the steps run repeat times are summarized by their fastest and median run)
+def summarize(scale, profile):
+	runs = {}
+	for record in profile['steps']:
+		if record['depth'] == 0:
+			runs.setdefault(record['step'], []).append(record)
+	results = []
+	for step, records in runs.items():
+		group, name = step.split(' ', 1)
+		seconds = [record['seconds'] for record in records]
+		result = {'scale': scale, 'group': group, 'name': name, 'runs': len(seconds), 'seconds': min(seconds),
+			'median_seconds': float(np.median(seconds)), 'rss_bytes': records[0]['rss_bytes']}
+		if group == 'serialize':
+			result['bytes'] = profile['response_bytes'][name]
+		results.append(result)
+	return results
+
+def git_commit():
+	try:
+		return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+#generate the exports of each scale (unless they exist already) and benchmark each scale in its own process; the
+#results of every step are written to output as json
+def run_benchmarks(scales=SCALES, directory=BENCHMARK_DIR, output=BENCHMARK_OUTPUT, repeat=3, chunksize=None, regenerate=False):
+	report = {
+		'commit': git_commit(),
+		'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+		'python': platform.python_version(),
+		'pandas': pd.__version__,
+		'numpy': np.__version__,
+		'repeat': repeat,
+		'chunksize': chunksize,
+		'scales': {},
+		'results': [],
+	}
+	for scale in scales:
+		original_dir, cleaned_dir = scale_directories(scale, directory)
+		if regenerate or not os.path.exists(original_dir):
+			shutil.rmtree(original_dir, ignore_errors=True)
+			start = time.perf_counter()
+			generate_exports(scale, original_dir)
+			report['results'].append({'scale': scale, 'group': 'generate', 'name': 'exports', 'runs': 1,
+				'seconds': time.perf_counter() - start})
+		shutil.rmtree(cleaned_dir, ignore_errors=True)
+		env = dict(os.environ, ORIGINAL_DATA_DIR=original_dir, CLEANED_DATA_DIR=cleaned_dir, FIGURE_CACHE_BACKEND='none',
+			SHARED_DATASETS='', STARTUP_PROFILE='')
+		with tempfile.NamedTemporaryFile(suffix='.json') as f:
+			command = [sys.executable, os.path.abspath(__file__), '--run-scale', '--output', f.name, '--repeat', str(repeat)]
+			if chunksize:
+				command += ['--chunksize', str(chunksize)]
+			print('benchmarking %dx' % scale, file=sys.stderr, flush=True)
+			subprocess.run(command, env=env, check=True)
+			profile = json.load(f)
+		report['scales'][str(scale)] = {'exports': export_sizes(original_dir), 'peak_rss_bytes': profile['peak_rss_bytes'],
+			'total_seconds': profile['total_seconds'], 'steps': profile['steps']}
+		report['results'] += summarize(scale, profile)
+		with open(output, 'w') as f:
+			json.dump(report, f, indent=1)
+	return report
+
+#time of each step of two reports side by side (new/old above 1 is slower)
+def compare(old_path, new_path):
+	with open(old_path) as f:
+		old = {(r['scale'], r['group'], r['name']): r for r in json.load(f)['results']}
+	with open(new_path) as f:
+		new = json.load(f)['results']
+	lines = ['%6s %-10s %-60s %10s %10s %7s' % ('scale', 'group', 'step', 'old s', 'new s', 'ratio')]
+	for result in new:
+		key = (result['scale'], result['group'], result['name'])
+		if key not in old:
+			continue
+		ratio = result['seconds']/old[key]['seconds'] if old[key]['seconds'] else float('nan')
+		lines.append('%6s %-10s %-60s %10.4f %10.4f %7.2f' % (key[0], key[1], key[2][:60], old[key]['seconds'], result['seconds'], ratio))
+	return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Benchmark the cleaning script, the data set loading and the callbacks on '
+		'synthetic exports at several times the size of the bundled export.')
+	parser.add_argument('--scales', type=int, nargs='+', default=SCALES,
+		help='sizes of the synthetic exports, as multiples of the bundled export (default: %s)' % ' '.join(map(str, SCALES)))
+	parser.add_argument('--directory', default=BENCHMARK_DIR,
+		help='where the synthetic exports and their cleaned data are written (default: %s)' % BENCHMARK_DIR)
+	parser.add_argument('--output', default=BENCHMARK_OUTPUT,
+		help='json file the results are written to (default: %s)' % BENCHMARK_OUTPUT)
+	parser.add_argument('--repeat', type=int, default=3,
+		help='number of times each callback is run (default: 3)')
+	parser.add_argument('--chunksize', type=int,
+		help='clean the exports in chunks of this many rows, as the streaming run does')
+	parser.add_argument('--regenerate', action='store_true',
+		help='write the synthetic exports again even if they exist')
+	parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+		help='print the times of two result files side by side instead of benchmarking')
+	parser.add_argument('--run-scale', action='store_true', help=argparse.SUPPRESS)
+	args = parser.parse_args()
+	if args.compare:
+		print(compare(*args.compare))
+	elif args.run_scale:
+		run_scale(args.output, args.repeat, args.chunksize)
+	else:
+		run_benchmarks(args.scales, args.directory, args.output, args.repeat, args.chunksize, args.regenerate)
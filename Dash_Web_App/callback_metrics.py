@@ -0,0 +1,274 @@
+#import libraries
+import os
+import json
+import time
+import bisect
+import threading
+import flask
+from dash.exceptions import PreventUpdate
+
+#import supporting python scripts
+from figure_cache import cache_stats
+from table_query import sort_indexes
+from time_query import time_indexes
+
+#upper bounds of the histogram buckets of the callback latencies (seconds) and response sizes (bytes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1000, 10000, 100000, 1000000, 10000000)
+
+#directory where each worker process of the server writes its metrics (one json file per process), so that /metrics
+#answers with the totals of every worker whichever of them serves the scrape (set by gunicorn.conf.py; without it the
+#metrics are those of the process answering); the counts of a worker are written at most every METRICS_WRITE_INTERVAL
+#seconds
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_WRITE_INTERVAL = float(os.environ.get('METRICS_WRITE_INTERVAL', '1'))
+#suffix of the metrics files of the workers that exited: their counters still count, their gauges no longer do
+DEAD_SUFFIX = '.dead'
+
+#counts of the values observed in each bucket (and above the last), with their sum
+class Histogram:
+	def __init__(self, buckets):
+		self.buckets = buckets
+		self.counts = [0]*(len(buckets) + 1)
+		self.sum = 0
+
+	def observe(self, value):
+		self.counts[bisect.bisect_left(self.buckets, value)] += 1
+		self.sum += value
+
+	#add the counts and sum of another process
+	def add(self, counts, total):
+		self.counts = [count + other for count, other in zip(self.counts, counts)]
+		self.sum += total
+
+	def lines(self, name, labels):
+		lines = []
+		count = 0
+		for bound, bucket_count in zip(list(self.buckets) + ['+Inf'], self.counts):
+			count += bucket_count
+			lines.append('%s_bucket{%s,le="%s"} %d' % (name, labels, bound, count))
+		lines.append('%s_sum{%s} %s' % (name, labels, repr(float(self.sum))))
+		lines.append('%s_count{%s} %d' % (name, labels, count))
+		return lines
+
+#requests, latencies and response sizes of the callbacks, per callback (its output), with the lookups of the caches
+class CallbackMetrics:
+	def __init__(self, directory=METRICS_DIR, write_interval=METRICS_WRITE_INTERVAL):
+		self.directory = directory
+		self.write_interval = write_interval
+		self._lock = threading.Lock()
+		self._write_lock = threading.Lock()
+		self._reset()
+
+	#(a forked worker counts its own requests, in its own file)
+	def _reset(self):
+		self._pid = os.getpid()
+		self._path = os.path.join(self.directory, '%d-%d.json' % (self._pid, time.time_ns())) if self.directory else None
+		self._written = 0
+		self._timer = None
+		self._requests = {}
+		self._latencies = {}
+		self._sizes = {}
+
+	def _check_fork(self):
+		if os.getpid() != self._pid:
+			self._reset()
+
+	def record(self, callback, output, status, seconds, size):
+		key = (callback, output)
+		with self._lock:
+			self._check_fork()
+			self._requests[key + (status,)] = self._requests.get(key + (status,), 0) + 1
+			self._latencies.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+			if size is not None:
+				self._sizes.setdefault(key, Histogram(SIZE_BUCKETS)).observe(size)
+		if self._path is not None:
+			self._write_soon()
+
+	#counts of this process (json serializable): counters are added up over every process that wrote them, gauges
+	#only over the running ones
+	def snapshot(self):
+		with self._lock:
+			counters = {
+				'requests': [list(key) + [count] for key, count in self._requests.items()],
+				'latencies': [list(key) + [histogram.counts, histogram.sum] for key, histogram in self._latencies.items()],
+				'sizes': [list(key) + [histogram.counts, histogram.sum] for key, histogram in self._sizes.items()],
+			}
+		counters['figure_cache'] = [[callback, stats['hits'], stats['misses']] for callback, stats in list(cache_stats.items())]
+		gauges = {}
+		for name, cache in [('sort_index', sort_indexes), ('time_index', time_indexes)]:
+			stats = cache.stats()
+			counters[name] = [stats['hits'], stats['misses']]
+			gauges[name + '_bytes'] = stats['bytes']
+		return {'counters': counters, 'gauges': gauges}
+
+	#write the counts of this process to its file, or in a timer thread once write_interval has passed since the last write
+	def _write_soon(self):
+		with self._lock:
+			if self._timer is not None:
+				return
+			delay = self._written + self.write_interval - time.monotonic()
+			if delay > 0:
+				self._timer = threading.Timer(delay, self._write)
+				self._timer.daemon = True
+				self._timer.start()
+				return
+		self._write()
+
+	def _write(self):
+		#(one write at a time, so that an older snapshot never replaces a newer one)
+		with self._write_lock:
+			snapshot = self.snapshot()
+			with self._lock:
+				self._timer = None
+				self._written = time.monotonic()
+				path = self._path
+			try:
+				with open(path + '.tmp', 'w') as f:
+					json.dump(snapshot, f)
+				os.replace(path + '.tmp', path)
+			except OSError:
+				pass
+
+	#write the current counts of this process to its file (e.g. before the worker exits)
+	def flush(self):
+		with self._lock:
+			self._check_fork()
+		if self._path is not None:
+			self._write()
+
+	#counts of every process that wrote to directory (this one included, with its current counts)
+	def _collect(self):
+		snapshots = []
+		self.flush()
+		if self.directory is not None:
+			for file_name in sorted(os.listdir(self.directory)):
+				if file_name.endswith(('.json', DEAD_SUFFIX)):
+					try:
+						with open(os.path.join(self.directory, file_name)) as f:
+							snapshot = json.load(f)
+					except (OSError, ValueError):
+						continue
+					if file_name.endswith(DEAD_SUFFIX):
+						snapshot['gauges'] = {}
+					snapshots.append(snapshot)
+		return snapshots or [self.snapshot()]
+
+	#metrics in the prometheus text format (the totals of every process of the server)
+	def exposition(self):
+		requests = {}
+		latencies = {}
+		sizes = {}
+		figure_cache = {}
+		totals = {'sort_index': [0, 0], 'time_index': [0, 0], 'sort_index_bytes': 0, 'time_index_bytes': 0}
+		for snapshot in self._collect():
+			counters = snapshot['counters']
+			for callback, output, status, count in counters['requests']:
+				requests[(callback, output, status)] = requests.get((callback, output, status), 0) + count
+			for histograms, buckets, rows in [(latencies, LATENCY_BUCKETS, counters['latencies']), (sizes, SIZE_BUCKETS, counters['sizes'])]:
+				for callback, output, counts, total in rows:
+					histograms.setdefault((callback, output), Histogram(buckets)).add(counts, total)
+			for callback, hits, misses in counters['figure_cache']:
+				stats = figure_cache.setdefault(callback, [0, 0])
+				stats[0] += hits
+				stats[1] += misses
+			for name in ('sort_index', 'time_index'):
+				totals[name] = [total + count for total, count in zip(totals[name], counters[name])]
+			for name, value in snapshot['gauges'].items():
+				totals[name] += value
+		lines = [
+			'# HELP dash_callback_requests_total Callback requests answered, by status.',
+			'# TYPE dash_callback_requests_total counter',
+		]
+		for (callback, output, status), count in sorted(requests.items()):
+			lines.append('dash_callback_requests_total{%s,status="%s"} %d' % (_labels(callback, output), status, count))
+		lines += [
+			'# HELP dash_callback_latency_seconds Time taken to answer the callback requests.',
+			'# TYPE dash_callback_latency_seconds histogram',
+		]
+		for (callback, output), histogram in sorted(latencies.items()):
+			lines += histogram.lines('dash_callback_latency_seconds', _labels(callback, output))
+		lines += [
+			'# HELP dash_callback_response_bytes Size of the serialized callback responses.',
+			'# TYPE dash_callback_response_bytes histogram',
+		]
+		for (callback, output), histogram in sorted(sizes.items()):
+			lines += histogram.lines('dash_callback_response_bytes', _labels(callback, output))
+		lines += [
+			'# HELP dash_figure_cache_requests_total Figure cache lookups of the figure callbacks, by result.',
+			'# TYPE dash_figure_cache_requests_total counter',
+		]
+		for callback, (hits, misses) in sorted(figure_cache.items()):
+			for result, count in [('hit', hits), ('miss', misses)]:
+				lines.append('dash_figure_cache_requests_total{callback="%s",result="%s"} %d' % (_escape(callback), result, count))
+		lines += [
+			'# HELP dash_sort_index_cache_requests_total Sort order cache lookups of the data set tables, by result.',
+			'# TYPE dash_sort_index_cache_requests_total counter',
+			'dash_sort_index_cache_requests_total{result="hit"} %d' % totals['sort_index'][0],
+			'dash_sort_index_cache_requests_total{result="miss"} %d' % totals['sort_index'][1],
+			'# HELP dash_sort_index_cache_bytes Memory used by the cached sort orders.',
+			'# TYPE dash_sort_index_cache_bytes gauge',
+			'dash_sort_index_cache_bytes %d' % totals['sort_index_bytes'],
+			'# HELP dash_time_index_cache_requests_total Time index and rollup level cache lookups of the time plots, by result.',
+			'# TYPE dash_time_index_cache_requests_total counter',
+			'dash_time_index_cache_requests_total{result="hit"} %d' % totals['time_index'][0],
+			'dash_time_index_cache_requests_total{result="miss"} %d' % totals['time_index'][1],
+			'# HELP dash_time_index_cache_bytes Memory used by the cached time indexes and rollup levels.',
+			'# TYPE dash_time_index_cache_bytes gauge',
+			'dash_time_index_cache_bytes %d' % totals['time_index_bytes'],
+		]
+		return '\n'.join(lines) + '\n'
+
+#mark the metrics files of an exited worker process (called by the gunicorn master, see child_exit in gunicorn.conf.py)
+def mark_process_dead(pid, directory=METRICS_DIR):
+	if directory is None:
+		return
+	for file_name in os.listdir(directory):
+		if file_name.startswith('%d-' % pid) and file_name.endswith('.json'):
+			try:
+				os.rename(os.path.join(directory, file_name), os.path.join(directory, file_name + DEAD_SUFFIX))
+			except OSError:
+				pass
+
+def _escape(value):
+	return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(callback, output):
+	return 'callback="%s",output="%s"' % (_escape(callback), _escape(output))
+
+callback_metrics = CallbackMetrics()
+
+#record every callback request of the app (including the pages answered by PrerenderedPages, so this is installed after
+#it) and serve the metrics at /metrics, behind the login like every other view
+def instrument_callbacks(app, auth=None, metrics=callback_metrics, route='/metrics'):
+	endpoint = app.config['routes_pathname_prefix'] + '_dash-update-component'
+	dispatch = app.server.view_functions[endpoint]
+
+	def instrumented_dispatch(*args, **kwargs):
+		body = flask.request.get_json(silent=True) or {}
+		output = body.get('output')
+		if output in app.callback_map:
+			callback = app.callback_map[output]['callback'].__name__
+		else:
+			#(requests for outputs without a callback are counted together)
+			callback = output = 'unknown'
+		start = time.perf_counter()
+		try:
+			response = dispatch(*args, **kwargs)
+		except PreventUpdate:
+			metrics.record(callback, output, '204', time.perf_counter() - start, None)
+			raise
+		except Exception:
+			metrics.record(callback, output, 'error', time.perf_counter() - start, None)
+			raise
+		#(the size of a pre-compressed page is its compressed size, and responses without a body aren't counted)
+		size = response.calculate_content_length() if response.status_code == 200 else None
+		metrics.record(callback, output, str(response.status_code), time.perf_counter() - start, size)
+		return response
+
+	app.server.view_functions[endpoint] = instrumented_dispatch
+
+	def metrics_view():
+		return flask.Response(metrics.exposition(), mimetype='text/plain; version=0.0.4')
+
+	app.server.add_url_rule(route, 'metrics', auth.auth_wrapper(metrics_view) if auth is not None else metrics_view)
@@ -1,256 +1,568 @@
 #import libraries
+import os
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
 
-#import data files
-exercise_df = pd.read_csv("original_data/exercise.csv", sep=',', index_col=0)
-floors_df = pd.read_csv("original_data/floors_climbed.csv", sep=',', index_col=0)
-heart_rate_df = pd.read_csv("original_data/heart_rate.csv", sep=',', index_col=0)
-sleep_df = pd.read_csv("original_data/sleep.csv", sep=',', index_col=0)
-step_count_df = pd.read_csv("original_data/step_count.csv", sep=',', index_col=0)
-summary_df = pd.read_csv("original_data/summary.csv", sep=',', index_col=0)
+#import supporting python scripts
+from data_loader import CLEANED_DATA_DIR, write_columnar_store, csv_path, store_path, read_cleaned_csv, time_offset_minutes
+from rollups import ROLLUP_MEASURES, build_rollup, update_rollup, combine_rollups, rollup_name
+
+#location and file names of the Samsung Health exports (the export of one user is cleaned into their partition with e.g.
+#ORIGINAL_DATA_DIR=original_data/users/alice CLEANED_DATA_DIR=cleaned_data/users/alice python data_cleaning_script.py)
+ORIGINAL_DATA_DIR = os.environ.get('ORIGINAL_DATA_DIR', 'original_data')
+EXPORT_FILES = {
+    'exercise': 'exercise',
+    'floors': 'floors_climbed',
+    'heart_rate': 'heart_rate',
+    'sleep': 'sleep',
+    'step_count': 'step_count',
+    'summary': 'summary',
+}
+
+#last update_time of each export seen by the previous run (high-water marks of the incremental mode)
+ETL_STATE_FILE = os.path.join(CLEANED_DATA_DIR, 'etl_state.json')
+
+
+#import data file
+def read_export(name, **kwargs):
+    return pd.read_csv(os.path.join(ORIGINAL_DATA_DIR, EXPORT_FILES[name] + '.csv'), sep=',', index_col=0, **kwargs)
+
+#columns of the sleep export carry the com.samsung.health.sleep prefix
+def export_column(name, col):
+    if name == 'sleep':
+        return 'com.samsung.health.sleep.' + col
+    return col
+
+#update (or creation) time of each export row; sleep times are in ms
+def update_times(df, name):
+    times = df[export_column(name, 'update_time')]
+    if name == 'sleep':
+        return pd.to_datetime(times, unit='ms')
+    return pd.to_datetime(times)
+
+#remove empty columns (done on the whole export before cleaning it)
+def remove_empty_columns(df):
+    for col in df.columns:
+        description = df[col].isnull().describe()
+        if (description.top == True) and (description.freq == df[col].isnull().count()):
+            del df[col]
+    return df
+
+#store the time zone offset of each row as int16 minutes (offset_minutes) and return it as timedeltas for adjusting time
+#(each distinct offset is parsed once)
+def offset_timedeltas(df, col='time_offset'):
+    df['offset_minutes'] = time_offset_minutes(df[col])
+    return pd.to_timedelta(df['offset_minutes'].values, unit='m')
+
+#each cleaned row keeps the datauuid of its export row as index (used to upsert rows in the incremental mode)
+def index_by_datauuid(df, col='datauuid'):
+    df.index = df[col].values
+    return df
+
+
+#maximum interruption between two sleep entries for them to be combined into one
+SLEEP_INTERRUPTION_GAP = pd.Timedelta(1, unit='h')
+
+#combine sleep entries separated by less than max_gap (sweep over entries sorted by start time)
+def merge_sleep_interruptions(df, max_gap=SLEEP_INTERRUPTION_GAP):
+    n = len(df)
+    if n == 0:
+        return df
+
+    #sort once and find where a new sleep starts: gap to the latest end time seen so far is at least max_gap
+    order = np.argsort(df['local_start_time'].values, kind='mergesort')
+    start = df['local_start_time'].values[order]
+    end = df['local_end_time'].values[order]
+    running_end = np.maximum.accumulate(end)
+    new_group = np.ones(n, dtype=bool)
+    new_group[1:] = (start[1:] - running_end[:-1]) >= np.timedelta64(max_gap)
+    first = np.flatnonzero(new_group)
+    last = np.append(first[1:] - 1, n - 1)
+    merged = (last - first) > 0
+
+    #aggregate each group; efficiency is weighted by duration over the combined time in bed
+    group_start = start[first]
+    group_end = np.maximum.reduceat(end, first)
+    duration_hr = (end - start)/np.timedelta64(1, 'h')
+    efficiency = df['efficiency'].values[order]
+    asleep_hr = np.add.reduceat(duration_hr*efficiency/100, first)
+    group_efficiency = 100*asleep_hr/((group_end - group_start)/np.timedelta64(1, 'h'))
+    group_efficiency = np.where(merged, group_efficiency, efficiency[first])
+    group_quality = np.fmax.reduceat(df['quality'].values[order], first)
+
+    #each group is kept on the row of its latest entry, in the original row order
+    keep = order[last]
+    restore = np.argsort(keep, kind='mergesort')
+    grouped = df.iloc[keep[restore]].copy()
+    grouped['local_start_time'] = group_start[restore]
+    grouped['local_end_time'] = group_end[restore]
+    grouped['efficiency'] = group_efficiency[restore]
+    grouped['quality'] = group_quality[restore]
+    if 'has_sleep_data' in df.columns:
+        grouped['has_sleep_data'] = np.fmax.reduceat(df['has_sleep_data'].values[order], first)[restore]
+    return grouped
 
 
 #######SLEEP DATA
-#remove empty columns from SLEEP data
-for col in sleep_df.columns:
-    description = sleep_df[col].isnull().describe()
-    if (description.top == True) and (description.freq == sleep_df[col].isnull().count()):
-        del sleep_df[col]
-
-
-#function for adjusting time
-def to_float(x):
-    return float(x[1])/100
-
-#adjust time by offset for SLEEP data	
-hr_offset = sleep_df['com.samsung.health.sleep.time_offset'].str.split('UTC').apply(to_float)
-timeIndex_offset = pd.TimedeltaIndex(hr_offset, unit='h')
-sleep_df['local_start_time'] = pd.to_datetime(sleep_df['com.samsung.health.sleep.start_time'], origin='unix', unit='ms') + timeIndex_offset
-sleep_df['local_end_time'] = pd.to_datetime(sleep_df['com.samsung.health.sleep.end_time'], origin='unix', unit='ms') + timeIndex_offset
-
-
-#combine rows that have sleep interuption less than 1 hour
-combine = []
-combine_dict = {}
-
-def first_iteration(x):
-    i = sleep_df.apply(second_iteration, args=(x.name,x.local_start_time,), axis=1)
-    return
-	
-def second_iteration(x, y, start_time):
-    if (x.name != y) and (abs(x.local_end_time - start_time) < pd.Timedelta(1, unit='h')) and (y not in combine_dict):
-        combine.append((x.name, y))
-        combine_dict[x.name] = y
-    return
-	
-sleep_df.sort_values('local_start_time', axis=0, ascending=False).apply(first_iteration, axis=1)
-
-for j,i in combine:
-    total_time_1 = abs(sleep_df.loc[i].local_end_time - sleep_df.loc[i].local_start_time)
-    total_time_2 = abs(sleep_df.loc[j].local_end_time - sleep_df.loc[j].local_start_time)
-    sleep_df.at[i, 'efficiency'] = 100*(total_time_1*sleep_df.loc[i].efficiency/100 + total_time_2*sleep_df.loc[j].efficiency/100)/(total_time_1 + total_time_2 + min(abs(sleep_df.loc[i].local_start_time - sleep_df.loc[j].local_end_time),abs(sleep_df.loc[j].local_start_time - sleep_df.loc[i].local_end_time)))
-    sleep_df.at[i, 'local_start_time'] = min(sleep_df.loc[i].local_start_time, sleep_df.loc[j].local_start_time)
-    sleep_df.at[i, 'local_end_time'] = max(sleep_df.loc[i].local_end_time, sleep_df.loc[j].local_end_time)
-    sleep_df.at[i, 'has_sleep_data'] = max(sleep_df.loc[i].has_sleep_data, sleep_df.loc[j].has_sleep_data)
-    sleep_df.at[i, 'quality'] = max(sleep_df.loc[i].quality, sleep_df.loc[j].quality)
-    sleep_df.drop(j, axis=0, inplace=True)
-
-#rename columns to shorter names
-sleep_df.rename(index=str, columns={"com.samsung.health.sleep.time_offset":"time_offset", "com.samsung.health.sleep.deviceuuid":"deviceuuid"}, inplace=True)
-
-#remove unsed columns from SLEEP data
-sleep_df.drop(['com.samsung.health.sleep.datauuid','com.samsung.health.sleep.pkg_name','original_efficiency','original_bed_time','original_wake_up_time','com.samsung.health.sleep.start_time','com.samsung.health.sleep.end_time','com.samsung.health.sleep.update_time','com.samsung.health.sleep.create_time','has_sleep_data'], axis=1, inplace=True)
+#merge=False leaves the interruptions to the caller (the incremental mode merges them with the stored entries)
+def clean_sleep(sleep_df, merge=True):
+    sleep_df = index_by_datauuid(sleep_df, 'com.samsung.health.sleep.datauuid')
 
+    #adjust time by offset for SLEEP data
+    timeIndex_offset = offset_timedeltas(sleep_df, 'com.samsung.health.sleep.time_offset')
+    sleep_df['local_start_time'] = pd.to_datetime(sleep_df['com.samsung.health.sleep.start_time'], origin='unix', unit='ms') + timeIndex_offset
+    sleep_df['local_end_time'] = pd.to_datetime(sleep_df['com.samsung.health.sleep.end_time'], origin='unix', unit='ms') + timeIndex_offset
 
+    #combine rows that have sleep interuption less than 1 hour
+    if merge:
+        sleep_df = merge_sleep_interruptions(sleep_df, SLEEP_INTERRUPTION_GAP)
 
-#######FLOORS DATA
-#remove empty columns from FLOORS data
-for col in floors_df.columns:
-    description = floors_df[col].isnull().describe()
-    if (description.top == True) and (description.freq == floors_df[col].isnull().count()):
-        del floors_df[col]
+    #rename columns to shorter names
+    sleep_df.rename(index=str, columns={"com.samsung.health.sleep.time_offset":"time_offset", "com.samsung.health.sleep.deviceuuid":"deviceuuid"}, inplace=True)
 
+    #remove unsed columns from SLEEP data
+    sleep_df.drop(['com.samsung.health.sleep.datauuid','com.samsung.health.sleep.pkg_name','original_efficiency','original_bed_time','original_wake_up_time','com.samsung.health.sleep.start_time','com.samsung.health.sleep.end_time','com.samsung.health.sleep.update_time','com.samsung.health.sleep.create_time','has_sleep_data'], axis=1, inplace=True, errors='ignore')
+    return sleep_df
 
-#adjust time by offset for FLOORS data
-hr_offset = floors_df['time_offset'].str.split('UTC').apply(to_float)
-timeIndex_offset = pd.TimedeltaIndex(hr_offset, unit='h')
-floors_df['local_start_time'] = pd.to_datetime(floors_df['start_time']) + timeIndex_offset
-floors_df['local_end_time'] = pd.to_datetime(floors_df['end_time']) + timeIndex_offset
 
+#######FLOORS DATA
+def clean_floors(floors_df):
+    floors_df = index_by_datauuid(floors_df)
 
-#remove unsed columns from FLOORS data
-floors_df.drop(['pkg_name','datauuid','start_time','end_time','create_time','update_time'], axis=1, inplace=True)
+    #adjust time by offset for FLOORS data
+    timeIndex_offset = offset_timedeltas(floors_df)
+    floors_df['local_start_time'] = pd.to_datetime(floors_df['start_time']) + timeIndex_offset
+    floors_df['local_end_time'] = pd.to_datetime(floors_df['end_time']) + timeIndex_offset
 
+    #remove unsed columns from FLOORS data
+    floors_df.drop(['pkg_name','datauuid','start_time','end_time','create_time','update_time'], axis=1, inplace=True, errors='ignore')
+    return floors_df
 
 
 #######HEART_RATE DATA
-#remove empty columns from HEART_RATE data
-for col in heart_rate_df.columns:
-    description = heart_rate_df[col].isnull().describe()
-    if (description.top == True) and (description.freq == heart_rate_df[col].isnull().count()):
-        del heart_rate_df[col]
-
-		
-#adjust time by offset for HEART_RATE data
-hr_offset = heart_rate_df['time_offset'].str.split('UTC').apply(to_float)
-timeIndex_offset = pd.TimedeltaIndex(hr_offset, unit='h')
-heart_rate_df['local_start_time'] = pd.to_datetime(heart_rate_df['start_time']) + timeIndex_offset
-heart_rate_df['local_end_time'] = pd.to_datetime(heart_rate_df['end_time']) + timeIndex_offset
+def clean_heart_rate(heart_rate_df):
+    heart_rate_df = index_by_datauuid(heart_rate_df)
 
+    #adjust time by offset for HEART_RATE data
+    timeIndex_offset = offset_timedeltas(heart_rate_df)
+    heart_rate_df['local_start_time'] = pd.to_datetime(heart_rate_df['start_time']) + timeIndex_offset
+    heart_rate_df['local_end_time'] = pd.to_datetime(heart_rate_df['end_time']) + timeIndex_offset
 
-#remove unsed columns from HEART_RATE data
-heart_rate_df.drop(['pkg_name','datauuid','binning_data','heart_beat_count','create_time','update_time','end_time','start_time'], axis=1, inplace=True)
+    #remove unsed columns from HEART_RATE data
+    heart_rate_df.drop(['pkg_name','datauuid','binning_data','heart_beat_count','create_time','update_time','end_time','start_time'], axis=1, inplace=True, errors='ignore')
 
-#remove entries with incorrect timestamp
-heart_rate_df = heart_rate_df[heart_rate_df['local_start_time'].dt.year >= 2012]
+    #remove entries with incorrect timestamp
+    heart_rate_df = heart_rate_df[heart_rate_df['local_start_time'].dt.year >= 2012]
+    return heart_rate_df
 
 
 #######STEP_COUNT DATA
-#remove empty columns from STEP_COUNT data
-for col in step_count_df.columns:
-    description = step_count_df[col].isnull().describe()
-    if (description.top == True) and (description.freq == step_count_df[col].isnull().count()):
-        del step_count_df[col]
-
-		
-#adjust time by offset for STEP_COUNT data
-hr_offset = step_count_df['time_offset'].str.split('UTC').apply(to_float)
-timeIndex_offset = pd.TimedeltaIndex(hr_offset, unit='h')
-step_count_df['local_start_time'] = pd.to_datetime(step_count_df['start_time']) + timeIndex_offset
-step_count_df['local_end_time'] = pd.to_datetime(step_count_df['end_time']) + timeIndex_offset
-
+def clean_step_count(step_count_df):
+    step_count_df = index_by_datauuid(step_count_df)
 
-#remove unsed columns from STEP_COUNT data
-step_count_df.drop(['pkg_name','datauuid','create_time','update_time','end_time','start_time'], axis=1, inplace=True)
+    #adjust time by offset for STEP_COUNT data
+    timeIndex_offset = offset_timedeltas(step_count_df)
+    step_count_df['local_start_time'] = pd.to_datetime(step_count_df['start_time']) + timeIndex_offset
+    step_count_df['local_end_time'] = pd.to_datetime(step_count_df['end_time']) + timeIndex_offset
 
+    #remove unsed columns from STEP_COUNT data
+    step_count_df.drop(['pkg_name','datauuid','create_time','update_time','end_time','start_time'], axis=1, inplace=True, errors='ignore')
+    return step_count_df
 
 
 #######EXERCISE DATA
-#remove empty columns from EXERCISE data
-for col in exercise_df.columns:
-    description = exercise_df[col].isnull().describe()
-    if (description.top == True) and (description.freq == exercise_df[col].isnull().count()):
-        del exercise_df[col]
-	
-	
-#adjust time by offset for EXERCISE data
-hr_offset = exercise_df['time_offset'].str.split('UTC').apply(to_float)
-timeIndex_offset = pd.TimedeltaIndex(hr_offset, unit='h')
-exercise_df['local_start_time'] = pd.to_datetime(exercise_df['start_time']) + timeIndex_offset
-exercise_df['local_end_time'] = pd.to_datetime(exercise_df['end_time']) + timeIndex_offset
-
-
-#remove unsed columns from EXERCISE data
-exercise_df.drop(['pkg_name','datauuid','location_data','comment','live_data','create_time','update_time','start_time','end_time'], axis=1, inplace=True)
-
-#remove casual walk entries
-exercise_df = exercise_df[(exercise_df['exercise_type'] != 1001) | ((exercise_df['exercise_type'] == 1001) & (exercise_df['mean_speed'] > 1.5) & (exercise_df['distance'] > 900))]
-exercise_df['duration'] = exercise_df['duration']/60000
-
-#convert exercise type from int to str
-exercise_df['exercise_type'] = exercise_df['exercise_type'].astype(str)
-exercise_df['count_type'] = exercise_df['count_type'].astype(str)
-exercise_df = exercise_df.replace('0', 'custom')
-exercise_df = exercise_df.replace('1001', 'walking')
-exercise_df = exercise_df.replace('1002', 'running')
-exercise_df = exercise_df.replace('11007', 'cycling')
-exercise_df = exercise_df.replace('13001', 'hiking')
-exercise_df = exercise_df.replace('14001', 'swimming')
-exercise_df = exercise_df.replace('15006', 'elliptical')
-exercise_df = exercise_df.replace('30001.0', 'stride')
-exercise_df = exercise_df.replace('30004.0', 'repetition')
-
+def clean_exercise(exercise_df):
+    exercise_df = index_by_datauuid(exercise_df)
+
+    #adjust time by offset for EXERCISE data
+    timeIndex_offset = offset_timedeltas(exercise_df)
+    exercise_df['local_start_time'] = pd.to_datetime(exercise_df['start_time']) + timeIndex_offset
+    exercise_df['local_end_time'] = pd.to_datetime(exercise_df['end_time']) + timeIndex_offset
+
+    #remove unsed columns from EXERCISE data
+    exercise_df.drop(['pkg_name','datauuid','location_data','comment','live_data','create_time','update_time','start_time','end_time'], axis=1, inplace=True, errors='ignore')
+
+    #remove casual walk entries
+    exercise_df = exercise_df[(exercise_df['exercise_type'] != 1001) | ((exercise_df['exercise_type'] == 1001) & (exercise_df['mean_speed'] > 1.5) & (exercise_df['distance'] > 900))]
+    exercise_df['duration'] = exercise_df['duration']/60000
+
+    #convert exercise type from int to str
+    exercise_df['exercise_type'] = exercise_df['exercise_type'].astype(str)
+    exercise_df['count_type'] = exercise_df['count_type'].astype(str)
+    exercise_df = exercise_df.replace('0', 'custom')
+    exercise_df = exercise_df.replace('1001', 'walking')
+    exercise_df = exercise_df.replace('1002', 'running')
+    exercise_df = exercise_df.replace('11007', 'cycling')
+    exercise_df = exercise_df.replace('13001', 'hiking')
+    exercise_df = exercise_df.replace('14001', 'swimming')
+    exercise_df = exercise_df.replace('15006', 'elliptical')
+    exercise_df = exercise_df.replace('30001.0', 'stride')
+    exercise_df = exercise_df.replace('30004.0', 'repetition')
+    return exercise_df
 
 
 #######SUMMARY DATA
-#remove empty columns from SUMMARY data
-for col in summary_df.columns:
-    description = summary_df[col].isnull().describe()
-    if (description.top == True) and (description.freq == summary_df[col].isnull().count()):
-        del summary_df[col]
-
-		
-#adjust time by offset for SUMMARY data
-
-
-#remove unsed columns from SUMMARY data
-summary_df.drop(['pkg_name','datauuid','extra_data'], axis=1, inplace=True)
+def clean_summary(summary_df):
+    summary_df = index_by_datauuid(summary_df)
 
-#remove longest_idle_time==-1 rows (contain no useful data)
-summary_df.drop(summary_df[summary_df['longest_idle_time'] == -1].index, inplace=True)
+    #remove unsed columns from SUMMARY data
+    summary_df.drop(['pkg_name','datauuid','extra_data'], axis=1, inplace=True, errors='ignore')
 
+    #remove longest_idle_time==-1 rows (contain no useful data)
+    summary_df.drop(summary_df[summary_df['longest_idle_time'] == -1].index, inplace=True)
+    return summary_df
 
+CLEANING_FUNCTIONS = {
+    'exercise': clean_exercise,
+    'floors': clean_floors,
+    'heart_rate': clean_heart_rate,
+    'sleep': clean_sleep,
+    'step_count': clean_step_count,
+    'summary': clean_summary,
+}
 
 
 #######CREATE AGGRAGATED DAILY DF
-#SLEEP data
-sleep_agg = sleep_df.copy()
-sleep_agg['date'] = sleep_agg['local_end_time'].dt.date
-sleep_agg['duration_hr'] = (sleep_agg['local_end_time'] - sleep_agg['local_start_time'])/np.timedelta64(1, 'h')
-sleep_agg.drop(['time_offset', 'deviceuuid', 'local_start_time', 'local_end_time'], axis=1, inplace=True)
-sleep_agg2 = sleep_agg[['date', 'efficiency', 'quality']].groupby('date').mean()
-sleep_agg = sleep_agg[['date', 'duration_hr']].groupby('date').sum()
-sleep_agg = sleep_agg.join(sleep_agg2, on='date')
-sleep_agg.rename(index=str, inplace=True, columns={'efficiency':'mean_sleep_efficiency', 'duration_hr':'total_sleep_duration_hr', 'quality':'mean_sleep_quality'})
-
-
-#STEP_COUNT data
-step_agg = step_count_df.copy()
-step_agg['date'] = step_agg['local_start_time'].dt.date
-step_agg.drop(['time_offset', 'deviceuuid', 'local_start_time', 'local_end_time', 'sample_position_type'], axis=1, inplace=True)
-step_agg2 = step_agg[['date', 'speed']].groupby('date').mean()
-step_agg = step_agg[['date', 'count', 'distance', 'calorie']].groupby('date').sum()
-step_agg = step_agg.join(step_agg2, on='date')
-step_agg.rename(index=str, inplace=True, columns={'count':'total_step_count', 'calorie':'total_step_calorie', 'speed':'mean_step_speed', 'distance':'total_step_distance'})
-
-#FLOORS data
-floors_agg = floors_df.copy()
-floors_agg['date'] = floors_agg['local_end_time'].dt.date
-floors_agg.drop(['time_offset', 'deviceuuid', 'local_start_time', 'local_end_time'], axis=1, inplace=True)
-floors_agg = floors_agg.groupby('date').sum()
-floors_agg.rename(index=str, inplace=True, columns={'floor':'total_floors_climbed'})
-
-#HEART_RATE data
-heart_agg = heart_rate_df.copy()
-heart_agg['date'] = heart_agg['local_end_time'].dt.date
-heart_agg.drop(['time_offset', 'deviceuuid', 'local_start_time', 'local_end_time'], axis=1, inplace=True)
-heart_agg2 = heart_agg[['date','max']].groupby('date').max()
-heart_agg3 = heart_agg[['date','min']].groupby('date').min()
-heart_agg = heart_agg[['date','heart_rate']].groupby('date').mean()
-heart_agg = heart_agg.join(heart_agg2, on='date')
-heart_agg = heart_agg.join(heart_agg3, on='date')
-heart_agg.rename(index=str, inplace=True, columns={'heart_rate':'mean_heart_rate', 'max':'max_heart_rate', 'min':'min_heart_rate'})
-
-#EXERCISE data
-
-exercise_agg = exercise_df.copy()
-exercise_agg['date'] = exercise_agg['local_end_time'].dt.date
-exercise_agg.drop(['time_offset', 'deviceuuid', 'local_start_time', 'local_end_time', 'exercise_type', 'count_type'], axis=1, inplace=True)
-exercise_agg2 = exercise_agg[['date','max_altitude','max_heart_rate','max_cadence','max_speed']].groupby('date').max()
-exercise_agg3 = exercise_agg[['date','min_altitude','min_heart_rate']].groupby('date').min()
-exercise_agg4 = exercise_agg[['date','altitude_loss','count','altitude_gain','duration','incline_distance','decline_distance','calorie','distance']].groupby('date').sum()
-exercise_agg = exercise_agg[['date','mean_heart_rate','mean_cadence','mean_speed']].groupby('date').mean()
-exercise_agg = exercise_agg.join(exercise_agg2, on='date')
-exercise_agg = exercise_agg.join(exercise_agg3, on='date')
-exercise_agg = exercise_agg.join(exercise_agg4, on='date')
-exercise_agg.rename(index=str, inplace=True, columns={'max_heart_rate':'max_exercises_heart_rate', 'max_speed':'max_exercises_speed',
-                                                      'min_heart_rate':'min_exercises_heart_rate', 'count':'total_exercises_rep_count',
-                                                      'duration':'total_exercises_duration', 'calorie':'total_exercises_calorie', 'distance': 
-                                                      'total_exercises_distance', 'mean_heart_rate':'mean_exercises_heart_rate',
-                                                      'mean_speed':'mean_exercises_speed'})
-
-#combine to make DAILY AGGREGATED
-daily_agg_df = sleep_agg.join(step_agg, on='date')
-daily_agg_df = daily_agg_df.join(heart_agg, on='date')
-daily_agg_df = daily_agg_df.join(exercise_agg, on='date')
-daily_agg_df.reset_index(inplace=True)
-
-#######export to new csv files
-daily_agg_df.to_csv("cleaned_data/daily_aggregated.csv", sep=',', index=True)
-exercise_df.to_csv("cleaned_data/exercise_cleaned.csv", sep=',', index=True)
-floors_df.to_csv("cleaned_data/floors_climbed_cleaned.csv", sep=',', index=True)
-heart_rate_df.to_csv("cleaned_data/heart_rate_cleaned.csv", sep=',', index=True)
-sleep_df.to_csv("cleaned_data/sleep_cleaned.csv", sep=',', index=True)
-step_count_df.to_csv("cleaned_data/step_count_cleaned.csv", sep=',', index=True)
-summary_df.to_csv("cleaned_data/summary_cleaned.csv", sep=',', index=True)
\ No newline at end of file
+#time giving the date each data set of daily_aggregated is aggregated on
+DAILY_DATE_COLUMNS = {
+    'exercise': 'local_end_time',
+    'heart_rate': 'local_end_time',
+    'sleep': 'local_end_time',
+    'step_count': 'local_start_time',
+}
+
+def sleep_duration_hr(df):
+    return (df['local_end_time'] - df['local_start_time'])/np.timedelta64(1, 'h')
+
+#columns of daily_aggregated per data set, in order: column name -> (cleaned column or function of the data set, aggregation)
+DAILY_AGGREGATES = {
+    'sleep': {
+        'total_sleep_duration_hr': (sleep_duration_hr, 'sum'),
+        'mean_sleep_efficiency': ('efficiency', 'mean'),
+        'mean_sleep_quality': ('quality', 'mean'),
+    },
+    'step_count': {
+        'total_step_count': ('count', 'sum'),
+        'total_step_distance': ('distance', 'sum'),
+        'total_step_calorie': ('calorie', 'sum'),
+        'mean_step_speed': ('speed', 'mean'),
+    },
+    'heart_rate': {
+        'mean_heart_rate': ('heart_rate', 'mean'),
+        'max_heart_rate': ('max', 'max'),
+        'min_heart_rate': ('min', 'min'),
+    },
+    'exercise': {
+        'mean_exercises_heart_rate': ('mean_heart_rate', 'mean'),
+        'mean_cadence': ('mean_cadence', 'mean'),
+        'mean_exercises_speed': ('mean_speed', 'mean'),
+        'max_altitude': ('max_altitude', 'max'),
+        'max_exercises_heart_rate': ('max_heart_rate', 'max'),
+        'max_cadence': ('max_cadence', 'max'),
+        'max_exercises_speed': ('max_speed', 'max'),
+        'min_altitude': ('min_altitude', 'min'),
+        'min_exercises_heart_rate': ('min_heart_rate', 'min'),
+        'altitude_loss': ('altitude_loss', 'sum'),
+        'total_exercises_rep_count': ('count', 'sum'),
+        'altitude_gain': ('altitude_gain', 'sum'),
+        'total_exercises_duration': ('duration', 'sum'),
+        'incline_distance': ('incline_distance', 'sum'),
+        'decline_distance': ('decline_distance', 'sum'),
+        'total_exercises_calorie': ('calorie', 'sum'),
+        'total_exercises_distance': ('distance', 'sum'),
+    },
+}
+
+#values of the columns of daily_aggregated from a data set, with the date of each row
+def daily_values(df, name):
+    dates = df[DAILY_DATE_COLUMNS[name]].dt.normalize().rename('date')
+    values = pd.DataFrame({col: source(df) if callable(source) else df[source]
+                           for col, (source, how) in DAILY_AGGREGATES[name].items()}, index=df.index)
+    return values, dates
+
+#daily aggregates of a data set, every column in a single groupby pass
+def daily_aggregates(df, name):
+    values, dates = daily_values(df, name)
+    return values.groupby(dates).agg({col: how for col, (source, how) in DAILY_AGGREGATES[name].items()})
+
+#daily_aggregated of the cleaned data sets: the daily aggregates of each data set side by side, on every date with a sleep
+def aggregate_daily(cleaned):
+    aggregates = {name: daily_aggregates(cleaned[name], name) for name in DAILY_AGGREGATES}
+    daily_agg_df = pd.concat(list(aggregates.values()), axis=1).reindex(aggregates['sleep'].index)
+    return daily_agg_df.rename_axis('date').reset_index()
+
+#partial daily aggregates of (a chunk of) a data set that can be folded with those of other chunks:
+#sums, counts, mins and maxes per date (a mean is kept as its sum and count)
+def daily_partial(df, name):
+    values, dates = daily_values(df, name)
+    return values.groupby(dates).agg({col: ['sum', 'count'] if how == 'mean' else [how]
+                                      for col, (source, how) in DAILY_AGGREGATES[name].items()})
+
+#fold the partial daily aggregates of two chunks (counts are summed as well)
+def fold_daily(partial, chunk_partial):
+    if partial is None:
+        return chunk_partial
+    folded = pd.concat([partial, chunk_partial]).groupby(level=0)
+    return folded.agg({key: 'sum' if key[1] == 'count' else key[1] for key in chunk_partial.columns})
+
+#daily_aggregated from the folded partial aggregates of each data set
+def daily_from_partials(partials):
+    daily = {}
+    for name, columns in DAILY_AGGREGATES.items():
+        partial = partials.get(name)
+        for col, (values, how) in columns.items():
+            if partial is None:
+                daily[col] = pd.Series(dtype=np.float64)
+            elif how == 'mean':
+                daily[col] = partial[(col, 'sum')]/partial[(col, 'count')]
+            else:
+                daily[col] = partial[(col, how)]
+    #every date with a sleep, as in aggregate_daily
+    daily_agg_df = pd.DataFrame(daily).reindex(daily['total_sleep_duration_hr'].index).rename_axis('date')
+    return daily_agg_df.reset_index()
+
+
+#######FULL RUN
+#cleaning stage of one data set (run in a worker process): clean the export and write the cleaned data set and its rollup;
+#returns the high-water mark of the export and the cleaned data set if the join stage aggregates it into daily_aggregated
+def clean_stage(name):
+    export_df = read_export(name)
+    mark = str(update_times(export_df, name).max()) if len(export_df) else None
+    cleaned_df = CLEANING_FUNCTIONS[name](remove_empty_columns(export_df))
+
+    #######export to new csv files and to the typed columnar store (read by data_loader; skipped if pyarrow is not installed)
+    write_cleaned(cleaned_df, name)
+    if name in ROLLUP_MEASURES:
+        #count/sum/min/max/mean/sum of squares per hour, day, iso week, month and time zone (see rollups.py)
+        write_cleaned(build_rollup(cleaned_df, name), rollup_name(name))
+    return mark, cleaned_df if name in DAILY_DATE_COLUMNS else None
+
+#run the stage of every data set, concurrently on jobs worker processes (in this process if jobs is 1)
+def run_stages(stage, jobs, *args):
+    if jobs == 1:
+        return {name: stage(name, *args) for name in EXPORT_FILES}
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {name: executor.submit(stage, name, *args) for name in EXPORT_FILES}
+        return {name: future.result() for name, future in futures.items()}
+
+def default_jobs():
+    return min(len(EXPORT_FILES), os.cpu_count() or 1)
+
+#clean every export row and rewrite all of cleaned_data; the data sets are cleaned concurrently, then joined into daily_aggregated
+def run_full(jobs=1):
+    results = run_stages(clean_stage, jobs)
+    write_cleaned(aggregate_daily({name: df for name, (mark, df) in results.items()}), 'daily_aggregated')
+    write_state({name: mark for name, (mark, df) in results.items() if mark is not None})
+
+def write_cleaned(df, name):
+    df.to_csv(csv_path(name), sep=',', index=True)
+    write_columnar_store(df, name)
+
+def read_state():
+    with open(ETL_STATE_FILE) as f:
+        return json.load(f)
+
+def write_state(state):
+    with open(ETL_STATE_FILE, 'w') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+
+
+#######INCREMENTAL RUN
+#incremental stage of one data set (run in a worker process): clean the export rows created or updated after its
+#high-water mark in state, upsert them into the cleaned data set and update its rollup; returns the new high-water mark
+#with the cleaned data set and the changed (replaced and new) rows if the join stage aggregates them into daily_aggregated,
+#or None if the export has no new rows
+def upsert_stage(name, state):
+    full_export_df = read_export(name)
+    times = update_times(full_export_df, name)
+    export_df = full_export_df
+    if name in state:
+        export_df = full_export_df[times > pd.Timestamp(state[name])].copy()
+    if len(export_df) == 0:
+        return None
+    mark = str(times.max())
+
+    #stored rows replaced by the export rows (updated rows are removed even if the cleaning now filters them out)
+    stored_df = read_cleaned_csv(name, CLEANED_DATA_DIR)
+    if len(stored_df) == 0:
+        #the columns of an empty data set are those of the export it was cleaned from, not of the cleaned data
+        stored_df = stored_df[[]]
+    keys = export_df[export_column(name, 'datauuid')].values
+    replaced = stored_df.index.isin(keys)
+    if name == 'sleep':
+        window_start = sleep_window_start(stored_df, clean_sleep(export_df.copy(), merge=False), keys)
+        if len(stored_df):
+            replaced |= (stored_df['local_start_time'] >= window_start).values
+        new_df = clean_sleep_window(full_export_df, window_start)
+    else:
+        new_df = CLEANING_FUNCTIONS[name](export_df)
+    replaced_df = stored_df[replaced]
+
+    #columns empty in the new rows are only kept if the stored data set has them
+    new_df = new_df[[col for col in new_df.columns if col in stored_df.columns or new_df[col].notnull().any()]]
+    cleaned_df = upsert_cleaned(stored_df, replaced_df, new_df, name)
+    changed_df = pd.concat([replaced_df, new_df], sort=False)
+    print('%s: %d rows cleaned, %d stored rows replaced' % (name, len(new_df), len(replaced_df)))
+
+    if name in ROLLUP_MEASURES:
+        rollup_df = read_cleaned_csv(rollup_name(name), CLEANED_DATA_DIR)
+        write_cleaned(update_rollup(rollup_df, cleaned_df, changed_df, name), rollup_name(name))
+    if name in DAILY_DATE_COLUMNS:
+        return mark, cleaned_df, changed_df
+    return mark, None, None
+
+#clean only the export rows created or updated after the high-water mark of the last run and upsert them into cleaned_data;
+#only the dates of daily_aggregated and the rollup buckets touched by new, updated or replaced rows are recomputed. The data
+#sets are upserted concurrently, then the changed dates are joined into daily_aggregated
+def run_incremental(jobs=1):
+    try:
+        state = read_state()
+    except (OSError, ValueError):
+        print('no state of a previous run in %s, running a full clean' % ETL_STATE_FILE)
+        return run_full(jobs)
+
+    results = {name: result for name, result in run_stages(upsert_stage, jobs, state).items() if result is not None}
+    cleaned = {name: cleaned_df for name, (mark, cleaned_df, changed_df) in results.items() if cleaned_df is not None}
+    changed = {name: changed_df for name, (mark, cleaned_df, changed_df) in results.items() if changed_df is not None}
+    if changed:
+        update_daily(cleaned, changed)
+    state.update({name: mark for name, (mark, cleaned_df, changed_df) in results.items()})
+    write_state(state)
+
+#merged sleeps don't keep the entries they were combined from, so new or updated entries are merged again with the export rows
+#of every stored sleep they can be combined with: the boundary window starts at the earliest sleep ending within the
+#interruption gap of a new entry (or replaced by one) and runs to the end of the data
+def sleep_window_start(stored_df, new_df, keys):
+    start = new_df['local_start_time'].min()
+    if len(stored_df) == 0:
+        return start
+    near = (stored_df['local_end_time'] >= start - SLEEP_INTERRUPTION_GAP) | stored_df.index.isin(keys)
+    return min(start, stored_df.loc[near, 'local_start_time'].min()) if near.any() else start
+
+#largest time zone offset, used to find the export rows of a window from their utc times
+MAX_TIME_OFFSET = pd.Timedelta(14, unit='h')
+
+def clean_sleep_window(export_df, window_start):
+    utc_start = pd.to_datetime(export_df[export_column('sleep', 'start_time')], unit='ms')
+    window_df = clean_sleep(export_df[utc_start >= window_start - MAX_TIME_OFFSET].copy(), merge=False)
+    return merge_sleep_interruptions(window_df[window_df['local_start_time'] >= window_start], SLEEP_INTERRUPTION_GAP)
+
+#append the new rows to the cleaned csv file (or rewrite it if stored rows are replaced or the columns changed)
+def upsert_cleaned(stored_df, replaced_df, new_df, name):
+    df = pd.concat([stored_df.drop(replaced_df.index), new_df], sort=False)
+    if len(replaced_df) == 0 and list(new_df.columns) == list(stored_df.columns):
+        new_df.to_csv(csv_path(name), sep=',', index=True, header=False, mode='a')
+        write_columnar_store(df, name)
+    else:
+        write_cleaned(df, name)
+    return df
+
+#recompute the dates of daily_aggregated touched by the changed rows
+def update_daily(cleaned, changed):
+    dates = pd.concat([df[DAILY_DATE_COLUMNS[name]].dt.normalize() for name, df in changed.items() if name in DAILY_DATE_COLUMNS]).unique()
+    affected = {}
+    for name, col in DAILY_DATE_COLUMNS.items():
+        df = cleaned[name] if name in cleaned else read_cleaned_csv(name, CLEANED_DATA_DIR)
+        affected[name] = df[df[col].dt.normalize().isin(dates)]
+    new_daily_df = aggregate_daily(affected)
+    new_daily_df['date'] = pd.to_datetime(new_daily_df['date'])
+
+    daily_agg_df = read_cleaned_csv('daily_aggregated', CLEANED_DATA_DIR)
+    daily_agg_df = pd.concat([new_daily_df, daily_agg_df[~daily_agg_df['date'].isin(dates)]], sort=False)
+    write_cleaned(daily_agg_df.sort_values('date').reset_index(drop=True), 'daily_aggregated')
+
+
+#######STREAMING RUN
+#memory used while cleaning a chunk, relative to the memory of the chunk as read (copies made by the cleaning functions)
+CHUNK_MEMORY_FACTOR = 8
+MIN_CHUNKSIZE = 1000
+
+#rows per chunk keeping the cleaning of a chunk of an export within memory_limit (in bytes), estimated from its first rows
+def chunksize_for(name, memory_limit):
+    sample_df = read_export(name, nrows=MIN_CHUNKSIZE)
+    row_bytes = sample_df.memory_usage(index=True, deep=True).sum()/max(len(sample_df), 1)
+    return max(MIN_CHUNKSIZE, int(memory_limit/(CHUNK_MEMORY_FACTOR*row_bytes)))
+
+#first pass over an export: the columns that are empty in every chunk (removed as remove_empty_columns does for the whole
+#export) and the dtype of the columns whose dtype differs between chunks (e.g. ints in one chunk and floats in another)
+def scan_export(name, chunksize):
+    non_empty = None
+    dtypes = {}
+    for chunk in read_export(name, chunksize=chunksize):
+        non_empty = chunk.notnull().any() if non_empty is None else non_empty | chunk.notnull().any()
+        for col, dtype in chunk.dtypes.items():
+            dtypes.setdefault(col, set()).add(dtype)
+    if non_empty is None:
+        return [], {}
+    mixed = {col: np.float64 if all(pd.api.types.is_numeric_dtype(dtype) for dtype in found) else object
+             for col, found in dtypes.items() if len(found) > 1}
+    return list(non_empty.index[~non_empty]), mixed
+
+#streaming stage of one data set (run in a worker process): clean the export chunk by chunk, appending each cleaned chunk to
+#the cleaned csv file and folding it into running daily aggregates and rollups, so only one chunk is held in memory at a time;
+#sleep entries are merged across the whole export, so the sleep export (a few rows per night) is cleaned at once.
+#the columnar store of the cleaned data set is not written, data_loader rebuilds it from the csv file on first load
+def stream_stage(name, chunksize=None, memory_limit=None):
+    size = chunksize or chunksize_for(name, memory_limit)
+    if name == 'sleep':
+        chunks = [remove_empty_columns(read_export(name))]
+    else:
+        empty_cols, dtypes = scan_export(name, size)
+        chunks = (chunk.drop(empty_cols, axis=1) for chunk in read_export(name, chunksize=size, dtype=dtypes))
+
+    remove_columnar_store(name)
+    mark = partial = rollup_df = None
+    n_rows = n_chunks = 0
+    for i, export_df in enumerate(chunks):
+        if len(export_df):
+            times = update_times(export_df, name)
+            mark = str(max(times.max(), pd.Timestamp(mark)) if mark is not None else times.max())
+        cleaned_df = CLEANING_FUNCTIONS[name](export_df)
+        cleaned_df.to_csv(csv_path(name), sep=',', index=True, header=(i == 0), mode='w' if i == 0 else 'a')
+        if name in DAILY_AGGREGATES:
+            partial = fold_daily(partial, daily_partial(cleaned_df, name))
+        if name in ROLLUP_MEASURES:
+            chunk_rollup_df = build_rollup(cleaned_df, name)
+            rollup_df = combine_rollups([rollup_df, chunk_rollup_df], name) if rollup_df is not None else chunk_rollup_df
+        n_rows += len(cleaned_df)
+        n_chunks += 1
+
+    if rollup_df is not None:
+        write_cleaned(rollup_df, rollup_name(name))
+    print('%s: %d rows cleaned in %d chunks' % (name, n_rows, n_chunks))
+    return mark, partial
+
+#clean the exports chunk by chunk, for exports larger than memory (memory_limit is shared by the jobs)
+def run_streaming(chunksize=None, memory_limit=None, jobs=1):
+    results = run_stages(stream_stage, jobs, chunksize, memory_limit and memory_limit/jobs)
+    write_cleaned(daily_from_partials({name: partial for name, (mark, partial) in results.items() if partial is not None}), 'daily_aggregated')
+    write_state({name: mark for name, (mark, partial) in results.items() if mark is not None})
+
+def remove_columnar_store(name):
+    if os.path.exists(store_path(name)):
+        os.remove(store_path(name))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Clean the Samsung Health exports in original_data into cleaned_data.')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only clean rows created or updated since the last run and upsert them into cleaned_data')
+    parser.add_argument('--chunksize', type=int,
+                        help='clean the exports in chunks of this many rows (for exports larger than memory)')
+    parser.add_argument('--memory-limit', type=float, metavar='MB',
+                        help='clean the exports in chunks sized to use about this much memory')
+    parser.add_argument('--jobs', type=int, default=default_jobs(),
+                        help='number of worker processes cleaning the data sets concurrently (default: %(default)s)')
+    args = parser.parse_args()
+    if args.incremental and (args.chunksize or args.memory_limit):
+        parser.error('--incremental cannot be combined with --chunksize or --memory-limit')
+    os.makedirs(CLEANED_DATA_DIR, exist_ok=True)
+    if args.chunksize or args.memory_limit:
+        run_streaming(args.chunksize, args.memory_limit and args.memory_limit*2**20, args.jobs)
+    elif args.incremental:
+        run_incremental(args.jobs)
+    else:
+        run_full(args.jobs)
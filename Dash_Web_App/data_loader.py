@@ -0,0 +1,397 @@
+#import libraries
+import os
+import json
+import shutil
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+import flask
+import pandas as pd
+import numpy as np
+
+#import supporting python scripts
+from profiling import timed
+
+#pyarrow is optional; without it the cleaned csv files are parsed instead of the columnar store
+try:
+	import pyarrow.feather as feather
+except ImportError:
+	feather = None
+
+#location and file names of the cleaned data sets (override with e.g. CLEANED_DATA_DIR=cleaned_data/users/alice to
+#clean the export of one user into their partition)
+CLEANED_DATA_DIR = os.environ.get('CLEANED_DATA_DIR', 'cleaned_data')
+DATASET_FILES = {
+	'daily_aggregated': 'daily_aggregated',
+	'exercise': 'exercise_cleaned',
+	'floors': 'floors_climbed_cleaned',
+	'heart_rate': 'heart_rate_cleaned',
+	'sleep': 'sleep_cleaned',
+	'step_count': 'step_count_cleaned',
+	'summary': 'summary_cleaned',
+	#time-bucket rollups (see rollups.py)
+	'exercise_rollup': 'exercise_rollup',
+	'floors_rollup': 'floors_climbed_rollup',
+	'heart_rate_rollup': 'heart_rate_rollup',
+	'sleep_rollup': 'sleep_rollup',
+	'step_count_rollup': 'step_count_rollup',
+}
+
+#per-user partitions: the data sets of a user are in their own directory of cleaned data, cleaned_data/users/<username>
+#(users without one are refused their data, or see the data sets in cleaned_data in single-user mode, SINGLE_USER=1);
+#a partition is loaded on the first request of its user and only the USER_PARTITIONS most recently used partitions are
+#kept loaded by a process
+USER_DATA_DIR = os.path.join(CLEANED_DATA_DIR, 'users')
+USER_PARTITIONS = int(os.environ.get('USER_PARTITIONS', '16'))
+SINGLE_USER = os.environ.get('SINGLE_USER', '').lower() in ('1', 'true')
+
+#shared mode (SHARED_DATASETS=1): every process memory-maps the data sets from .npy files instead of reading its own
+#copy, so server workers (and restarted or separate servers) share one copy of the data in the page cache
+SHARED_DATASETS = os.environ.get('SHARED_DATASETS', '').lower() in ('1', 'true')
+SHARED_DATA_DIR = 'shared'
+
+#column types used in the columnar store
+DATETIME_COLUMNS = ['local_start_time', 'local_end_time', 'date', 'bucket']
+CATEGORY_COLUMNS = ['time_offset', 'deviceuuid', 'exercise_type', 'count_type', 'level', 'measure']
+INT16_COLUMNS = ['offset_minutes']
+#float columns kept in double precision (rollup sums of squares lose too many digits in float32)
+DOUBLE_COLUMNS = ['sum', 'sumsq']
+
+#time zone offsets ('UTC-0500', 'UTC+0430') in minutes east of utc as int16; a data set only has a few distinct offsets,
+#so each is parsed once and mapped back to the rows through its factorized code
+TIME_OFFSET_PATTERN = r'^UTC([+-])(\d\d)(\d\d)$'
+
+def time_offset_minutes(offsets):
+	offsets = pd.Series(offsets)
+	codes, zones = pd.factorize(offsets)
+	parts = pd.Series(np.asarray(zones, dtype=object)).str.extract(TIME_OFFSET_PATTERN)
+	if (codes < 0).any():
+		raise ValueError('missing time offset')
+	invalid = parts.isnull().any(axis=1).values
+	if invalid.any():
+		raise ValueError('invalid time offsets: %s' % list(zones[invalid]))
+	zone_minutes = (np.where(parts[0] == '-', -1, 1)*(parts[1].astype(int)*60 + parts[2].astype(int))).astype(np.int16)
+	return pd.Series(zone_minutes.values[codes], index=offsets.index)
+
+#time zone offset in hours (e.g. 'UTC-0500' -> -5.0, 'UTC+0430' -> 4.5), from the offset_minutes stored by the cleaning
+#script (parsed from time_offset for data sets cleaned before it was stored)
+def time_offset_hours(df):
+	minutes = df['offset_minutes'] if 'offset_minutes' in df.columns else time_offset_minutes(df['time_offset'])
+	return (minutes/60).astype(np.float32)
+
+def ms_to_time(col):
+	return lambda df: pd.to_datetime(df[col], unit='ms').dt.time
+
+#columns added to (or replacing stored columns of) each data set for the pages, computed once per process
+DERIVED_COLUMNS = {
+	'exercise': {
+		'hr_offset': time_offset_hours,
+	},
+	'heart_rate': {
+		'hr_offset': time_offset_hours,
+	},
+	'sleep': {
+		'duration_hr': lambda df: (df['local_end_time'] - df['local_start_time'])/np.timedelta64(1, 'h'),
+		'bedtime_hr': lambda df: df['local_start_time'].dt.hour,
+		'date': lambda df: df['local_start_time'].dt.date,
+		'hr_offset': time_offset_hours,
+	},
+	'summary': {
+		'day_time': lambda df: pd.to_datetime(df['day_time'], unit='ms'),
+		'run_time': ms_to_time('run_time'),
+		'longest_idle_time': ms_to_time('longest_idle_time'),
+		'longest_active_time': ms_to_time('longest_active_time'),
+		'walk_time': ms_to_time('walk_time'),
+		'others_time': ms_to_time('others_time'),
+		'active_time': ms_to_time('active_time'),
+	},
+}
+
+#data sets already loaded by this process, shared by every page: (name, directory) -> stored / with derived columns / version
+_datasets = {}
+_derived_datasets = {}
+_versions = {}
+#user partitions loaded by this process, least recently used first
+_partitions = OrderedDict()
+_partitions_lock = threading.Lock()
+
+
+def csv_path(name, directory=CLEANED_DATA_DIR):
+	return os.path.join(directory, DATASET_FILES[name] + '.csv')
+
+def store_path(name, directory=CLEANED_DATA_DIR):
+	return os.path.join(directory, DATASET_FILES[name] + '.feather')
+
+#cast a cleaned data frame to the types of the columnar store
+def to_columnar(df):
+	df = df.copy()
+	for col in df.columns:
+		if col in DATETIME_COLUMNS:
+			df[col] = pd.to_datetime(df[col])
+		elif col in CATEGORY_COLUMNS:
+			df[col] = df[col].astype('category')
+		elif col in INT16_COLUMNS:
+			df[col] = df[col].astype(np.int16)
+		elif df[col].dtype == np.float64 and col not in DOUBLE_COLUMNS:
+			df[col] = df[col].astype(np.float32)
+	return df
+
+#write a cleaned data frame to the columnar store (feather files are written whole, then swapped in)
+def write_columnar_store(df, name, directory=CLEANED_DATA_DIR):
+	if feather is None:
+		return False
+	path = store_path(name, directory)
+	tmp_path = path + '.tmp'
+	feather.write_feather(to_columnar(df).reset_index(), tmp_path)
+	os.replace(tmp_path, path)
+	return True
+
+def _read_store(name, directory):
+	#zero-copy columns of a memory-mapped table are read-only, which pandas can't always work with, so convert to regular blocks
+	table = feather.read_table(store_path(name, directory), memory_map=True)
+	df = table.to_pandas()
+	df = df.set_index(df.columns[0])
+	df.index.name = None
+	return df
+
+#shared store of a data set: a directory with one 2-D .npy file per column type holding the columns of that type (the
+#layout pandas keeps them in, so that filtering a mapped frame never merges its columns into a private copy), and one
+#.npy file per categorical or text column and for the index, saved as codes with their categories; store.json lists
+#the files and the order of the columns in the cleaned csv file
+def shared_path(name, directory=CLEANED_DATA_DIR):
+	return os.path.join(directory, SHARED_DATA_DIR, DATASET_FILES[name])
+
+def write_shared_store(df, name, directory=CLEANED_DATA_DIR):
+	path = shared_path(name, directory)
+	tmp_path = '%s.%d.tmp' % (path, os.getpid())
+	shutil.rmtree(tmp_path, ignore_errors=True)
+	os.makedirs(tmp_path)
+	df = to_columnar(df)
+	entries = []
+	def save(values, **entry):
+		entry['file'] = '%d.npy' % len(entries)
+		np.save(os.path.join(tmp_path, entry['file']), values)
+		entries.append(entry)
+	blocks = OrderedDict()
+	for col, values in [(None, df.index.to_series())] + list(df.items()):
+		if values.dtype == object or isinstance(values.dtype, pd.CategoricalDtype):
+			text = values.dtype == object
+			values = values.astype('category')
+			save(values.cat.codes.values, name=col, categories=values.cat.categories.tolist(), object=text)
+		elif col is None:
+			save(values.values, name=col)
+		else:
+			blocks.setdefault(values.dtype.str, []).append(col)
+	for cols in blocks.values():
+		save(np.stack([df[col].values for col in cols]), columns=cols)
+	with open(os.path.join(tmp_path, 'store.json'), 'w') as f:
+		json.dump({'columns': list(df.columns), 'entries': entries}, f)
+	#swap the new directory in (processes that mapped the old files keep them until they reload)
+	old_path = '%s.%d.old' % (path, os.getpid())
+	try:
+		if os.path.exists(path):
+			os.rename(path, old_path)
+		os.rename(tmp_path, path)
+	except OSError:
+		#another process swapped in its copy first
+		shutil.rmtree(tmp_path, ignore_errors=True)
+	shutil.rmtree(old_path, ignore_errors=True)
+
+def _read_shared(name, directory):
+	path = shared_path(name, directory)
+	with open(os.path.join(path, 'store.json')) as f:
+		store = json.load(f)
+	#(the index is saved first)
+	index = None
+	frames = []
+	for entry in store['entries']:
+		#copy-on-write mapping: the pages of a column are shared until a process writes to them
+		values = np.load(os.path.join(path, entry['file']), mmap_mode='c')
+		if 'columns' in entry:
+			frames.append(pd.DataFrame(values.T, index=index, columns=entry['columns'], copy=False))
+			continue
+		if 'categories' in entry:
+			values = pd.Categorical.from_codes(values, entry['categories'])
+			if entry['object']:
+				values = np.asarray(values, dtype=object)
+		if entry['name'] is None:
+			index = pd.Index(values)
+		else:
+			frames.append(pd.DataFrame({entry['name']: values}, index=index, copy=False))
+	df = pd.concat(frames, axis=1, copy=False) if frames else pd.DataFrame(index=index)
+	df.attrs['columns'] = store['columns']
+	return df
+
+def _shared_is_current(name, directory):
+	path = os.path.join(shared_path(name, directory), 'store.json')
+	return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(csv_path(name, directory))
+
+#columns of a loaded data set in the order of its cleaned csv file (the shared store keeps the columns of a type
+#together), followed by the columns added to it
+def dataset_columns(df):
+	order = [col for col in df.attrs.get('columns', []) if col in df.columns]
+	return order + [col for col in df.columns if col not in order]
+
+def _is_mapped(values):
+	#categorical columns are mapped through their codes
+	values = getattr(values, 'codes', values)
+	while values is not None:
+		if isinstance(values, np.memmap):
+			return True
+		values = getattr(values, 'base', None)
+	return False
+
+#memory of some columns of a frame, in bytes (read column by column, which doesn't merge the columns of the frame)
+def _columns_bytes(df, columns):
+	return sum(df[col].memory_usage(deep=True, index=False) for col in columns)
+
+#cleaned csv file with its times parsed, but otherwise as written by the cleaning script
+def read_cleaned_csv(name, directory=CLEANED_DATA_DIR):
+	with timed('parse %s csv' % name):
+		df = pd.read_csv(csv_path(name, directory), sep=',', index_col=0)
+	with timed('convert %s times' % name):
+		for col in DATETIME_COLUMNS:
+			if col in df.columns:
+				df[col] = pd.to_datetime(df[col])
+	return df
+
+def _read_csv(name, directory):
+	df = read_cleaned_csv(name, directory)
+	with timed('cast %s columns' % name):
+		return to_columnar(df)
+
+#version of a cleaned data file (changes whenever the cleaning script rewrites it)
+def _file_version(path):
+	stat = os.stat(path)
+	return '%d-%d' % (stat.st_mtime_ns, stat.st_size)
+
+#the store is only used if it is at least as new as the csv written with it
+def _store_is_current(name, directory):
+	if feather is None or not os.path.exists(store_path(name, directory)):
+		return False
+	return os.path.getmtime(store_path(name, directory)) >= os.path.getmtime(csv_path(name, directory))
+
+def _load_stored(name, directory):
+	key = (name, directory)
+	if key not in _datasets:
+		_versions[key] = _file_version(csv_path(name, directory))
+		if SHARED_DATASETS and _shared_is_current(name, directory):
+			with timed('map %s shared store' % name):
+				df = _read_shared(name, directory)
+		elif _store_is_current(name, directory):
+			with timed('read %s store' % name):
+				df = _read_store(name, directory)
+		else:
+			df = _read_csv(name, directory)
+			#cache the parsed csv in the columnar store for the next start
+			try:
+				with timed('write %s store' % name):
+					write_columnar_store(df, name, directory)
+			except (OSError, ValueError, TypeError):
+				pass
+		if SHARED_DATASETS and not _shared_is_current(name, directory):
+			#write the shared store once, then map it like every other process
+			write_shared_store(df, name, directory)
+			df = _read_shared(name, directory)
+		_datasets[key] = df
+	return _datasets[key]
+
+def _load_derived(name, directory):
+	key = (name, directory)
+	if key not in _derived_datasets:
+		stored = _load_stored(name, directory)
+		df = stored.copy(deep=False)
+		with timed('derive %s columns' % name):
+			for col, func in DERIVED_COLUMNS.get(name, {}).items():
+				df[col] = func(stored)
+		_derived_datasets[key] = df
+	return _derived_datasets[key]
+
+#directory of the data sets of a user (None if they have no partition, outside of single-user mode)
+def user_directory(username):
+	partition = quote(username, safe='')
+	directory = os.path.join(USER_DATA_DIR, partition)
+	if partition in ('', '.', '..') or not os.path.isdir(directory):
+		return CLEANED_DATA_DIR if SINGLE_USER else None
+	return directory
+
+#directory of the data sets of the user logged in to the current request (cleaned_data outside of requests); the
+#request is refused (403) if the user has no data sets
+def current_directory():
+	if not flask.has_request_context() or flask.request.authorization is None:
+		return CLEANED_DATA_DIR
+	directory = user_directory(flask.request.authorization.username)
+	if directory is None:
+		flask.abort(403)
+	return directory
+
+#mark a user partition as used, unloading the least recently used ones beyond USER_PARTITIONS
+def _use_partition(directory):
+	if directory == CLEANED_DATA_DIR:
+		return
+	with _partitions_lock:
+		_partitions[directory] = True
+		_partitions.move_to_end(directory)
+		while len(_partitions) > USER_PARTITIONS:
+			old_directory, _ = _partitions.popitem(last=False)
+			for loaded in (_datasets, _derived_datasets, _versions):
+				for key in [key for key in list(loaded) if key[1] == old_directory]:
+					loaded.pop(key, None)
+
+#return a view of a cleaned data set (with the derived columns used by the pages if derived=True);
+#the data is loaded once per process and shared by every view, so views must be treated as read-only:
+#adding or replacing a column of a view is only seen by that view, but changing values in place is seen by every page;
+#by default the data set of the user logged in to the current request
+def load_dataset(name, derived=False, directory=None):
+	if directory is None:
+		directory = current_directory()
+	_use_partition(directory)
+	if derived:
+		df = _load_derived(name, directory)
+	else:
+		df = _load_stored(name, directory)
+	return df.copy(deep=False)
+
+#version of the data set loaded by this process (or of the file on disk if it is not loaded yet), which includes its
+#partition so that data sets of different users never share cached results
+def dataset_version(name, directory=None):
+	if directory is None:
+		directory = current_directory()
+	key = (name, directory)
+	version = _versions[key] if key in _versions else _file_version(csv_path(name, directory))
+	return '%s:%s' % (directory, version)
+
+#memory held by each loaded data set, in bytes (derived counts only the columns not shared with the stored data,
+#mapped the columns memory-mapped from the shared store)
+def dataset_memory_usage():
+	rows = []
+	for (name, directory), stored in list(_datasets.items()):
+		stored_bytes = stored.index.memory_usage(deep=True) + _columns_bytes(stored, stored.columns)
+		mapped_bytes = _columns_bytes(stored, [col for col in stored.columns if _is_mapped(stored[col].values)])
+		derived_bytes = 0
+		if (name, directory) in _derived_datasets:
+			derived = _derived_datasets[(name, directory)]
+			derived_bytes = _columns_bytes(derived, DERIVED_COLUMNS.get(name, {}))
+		rows.append({'dataset': name, 'directory': directory, 'rows': len(stored), 'stored_bytes': stored_bytes, 'mapped_bytes': mapped_bytes,
+			'derived_bytes': derived_bytes, 'total_bytes': stored_bytes + derived_bytes})
+	return pd.DataFrame(rows, columns=['dataset', 'directory', 'rows', 'stored_bytes', 'mapped_bytes', 'derived_bytes', 'total_bytes']).set_index('dataset')
+
+if __name__ == '__main__':
+	for name in DATASET_FILES:
+		load_dataset(name, derived=True)
+	print(dataset_memory_usage())
+	#with SHARED_DATASETS=1, check that filtering the views of the loaded data sets (which merges the columns of a frame
+	#with more than one block of a type) leaves the data sets on the maps of the shared store
+	if SHARED_DATASETS:
+		def mapped_columns(name, derived):
+			view = load_dataset(name, derived)
+			return [col for col in view.columns if _is_mapped(view[col].values)]
+		mapped = {(name, derived): mapped_columns(name, derived) for name in DATASET_FILES for derived in (False, True)}
+		for name, derived in mapped:
+			view = load_dataset(name, derived)
+			view[list(view.columns)][view.index.notna()]
+		for (name, derived), columns in mapped.items():
+			unmapped = [col for col in columns if col not in mapped_columns(name, derived)]
+			if unmapped or not columns:
+				raise SystemExit('%s columns copied out of the shared store: %s' % (name, unmapped))
+		print('shared data sets still mapped')
@@ -0,0 +1,145 @@
+#import libraries
+import os
+import json
+import hashlib
+import threading
+import functools
+from collections import OrderedDict
+import plotly
+import numpy as np
+
+#import supporting python scripts
+from data_loader import dataset_version
+
+#figure cache settings: backend is 'memory', 'filesystem' or 'none'
+FIGURE_CACHE_BACKEND = os.environ.get('FIGURE_CACHE_BACKEND', 'memory')
+FIGURE_CACHE_DIR = os.environ.get('FIGURE_CACHE_DIR', os.path.join('cleaned_data', 'figure_cache'))
+FIGURE_CACHE_SIZE = int(os.environ.get('FIGURE_CACHE_SIZE', '256'))
+
+
+#least recently used figures of this process
+class MemoryBackend:
+	def __init__(self, max_entries=FIGURE_CACHE_SIZE):
+		self.max_entries = max_entries
+		self._figures = OrderedDict()
+		self._lock = threading.Lock()
+
+	def get(self, key):
+		with self._lock:
+			if key not in self._figures:
+				return None
+			self._figures.move_to_end(key)
+			return self._figures[key]
+
+	def set(self, key, figure):
+		with self._lock:
+			self._figures[key] = figure
+			self._figures.move_to_end(key)
+			while len(self._figures) > self.max_entries:
+				self._figures.popitem(last=False)
+
+	def clear(self):
+		with self._lock:
+			self._figures.clear()
+
+#least recently used figures as json files (shared by every process using the same directory and kept across restarts)
+class FileSystemBackend:
+	def __init__(self, directory=FIGURE_CACHE_DIR, max_entries=FIGURE_CACHE_SIZE):
+		self.directory = directory
+		self.max_entries = max_entries
+		os.makedirs(directory, exist_ok=True)
+
+	def _path(self, key):
+		return os.path.join(self.directory, hashlib.sha1(repr(key).encode()).hexdigest() + '.json')
+
+	def get(self, key):
+		path = self._path(key)
+		try:
+			with open(path) as f:
+				figure = json.load(f)
+			#the modification time marks the last use
+			os.utime(path)
+		except (OSError, ValueError):
+			return None
+		return figure
+
+	def set(self, key, figure):
+		path = self._path(key)
+		tmp_path = '%s.%d.tmp' % (path, os.getpid())
+		with open(tmp_path, 'w') as f:
+			json.dump(figure, f)
+		os.replace(tmp_path, path)
+		self._evict()
+
+	def _evict(self):
+		paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.json')]
+		if len(paths) <= self.max_entries:
+			return
+		paths.sort(key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0)
+		for path in paths[:len(paths) - self.max_entries]:
+			try:
+				os.remove(path)
+			except OSError:
+				pass
+
+	def clear(self):
+		for name in os.listdir(self.directory):
+			if name.endswith('.json'):
+				os.remove(os.path.join(self.directory, name))
+
+def make_backend(name=FIGURE_CACHE_BACKEND):
+	if name == 'memory':
+		return MemoryBackend()
+	elif name == 'filesystem':
+		return FileSystemBackend()
+	elif name == 'none':
+		return None
+	raise ValueError("unknown figure cache backend '%s'" % name)
+
+backend = make_backend()
+
+#float32 columns are written with their shortest digits (60.88 instead of 60.880001068115234)
+class FigureJSONEncoder(plotly.utils.PlotlyJSONEncoder):
+	def default(self, obj):
+		if getattr(obj, 'dtype', None) == np.float32:
+			obj = np.asarray(obj).astype(str).astype(float)
+		return super().default(obj)
+
+#figure as plain dicts/lists/numbers, which is much faster for dash to serialize again than plotly objects and pandas data
+def to_json_native(figure):
+	return json.loads(json.dumps(figure, cls=FigureJSONEncoder))
+
+#hit and miss counts per callback
+cache_stats = {}
+_stats_lock = threading.Lock()
+
+def _count(callback, result):
+	with _stats_lock:
+		stats = cache_stats.setdefault(callback, {'hits': 0, 'misses': 0})
+		stats[result] += 1
+
+#memoize a figure callback on (callback, inputs, versions of the data sets it plots, variant);
+#the figure must only depend on the inputs, the data sets and the variant (e.g. the page's plot mode). The figures of a
+#zoomed window (func(plot, window) called by zoomable_figure with a window) are built for one pan or zoom and not cached,
+#so that they don't evict the figures of the whole range
+def cached_figure(*datasets, variant=None):
+	def decorator(func):
+		name = func.__module__ + '.' + func.__name__
+
+		@functools.wraps(func)
+		def wrapper(*args):
+			if backend is None or (len(args) > 1 and args[1] is not None):
+				return func(*args)
+			key = (name, args, tuple(dataset_version(dataset) for dataset in datasets), variant)
+			figure = backend.get(key)
+			if figure is not None:
+				_count(name, 'hits')
+				return figure
+			_count(name, 'misses')
+			figure = func(*args)
+			if figure is not None:
+				figure = to_json_native(figure)
+				backend.set(key, figure)
+			return figure
+		return wrapper
+	return decorator
@@ -0,0 +1,47 @@
+#gunicorn settings of the production server (gunicorn -c gunicorn.conf.py wsgi:application), set through environment variables
+import os
+import gc
+import shutil
+import tempfile
+import multiprocessing
+
+#address and port the app is served on (the open port of the vm)
+bind = '%s:%s' % (os.environ.get('HOST', '0.0.0.0'), os.environ.get('PORT', '5000'))
+
+#one worker process per core, each answering requests on a few threads (so that slow clients don't hold up a worker)
+workers = int(os.environ.get('WORKERS', multiprocessing.cpu_count()))
+threads = int(os.environ.get('THREADS', '4'))
+timeout = int(os.environ.get('TIMEOUT', '120'))
+#time given to the workers to finish their requests on a reload (kill -HUP) or shutdown before they are killed
+graceful_timeout = int(os.environ.get('GRACEFUL_TIMEOUT', '30'))
+
+#load the app and its data sets once in the master process; the forked workers share the loaded data copy-on-write
+preload_app = True
+#(warm up the data sets before the workers are forked rather than in a background thread, see startup.py)
+os.environ.setdefault('WARM_UP', 'sync')
+
+#each worker writes its callback metrics to a directory of this master, so that /metrics reports the totals of every
+#worker (see callback_metrics.py); a new master (kill -USR2) starts its own, a reload (kill -HUP) keeps it
+if os.environ.get('METRICS_MASTER_PID') != str(os.getpid()):
+	os.environ['METRICS_DIR'] = tempfile.mkdtemp(prefix='dash_metrics_')
+	os.environ['METRICS_MASTER_PID'] = str(os.getpid())
+
+accesslog = os.environ.get('ACCESS_LOG', '-')
+errorlog = os.environ.get('ERROR_LOG', '-')
+
+#keep the objects loaded by the master out of the garbage collection of the workers, which would otherwise write to
+#(and so copy) every page holding them
+def pre_fork(server, worker):
+	gc.freeze()
+
+#write the last metrics of a worker before it exits, and keep only its counters once it has (its gauges no longer count)
+def worker_exit(server, worker):
+	from callback_metrics import callback_metrics
+	callback_metrics.flush()
+
+def child_exit(server, worker):
+	from callback_metrics import mark_process_dead
+	mark_process_dead(worker.pid)
+
+def on_exit(server):
+	shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
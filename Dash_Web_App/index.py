@@ -1,4 +1,6 @@
 #import libraries
+import os
+import importlib
 import dash_table
 import dash_core_components as dcc
 import dash_html_components as html
@@ -8,18 +10,17 @@ import pandas as pd
 import numpy as np
 
 #import supporting python scripts
-from app import app
-from apps.aggregated_app import *
-from apps.data_app import *
-from apps.exercise_app import *
-from apps.floors_app import *
-from apps.heart_app import *
-from apps.sleep_app import *
-from apps.step_app import *
-from apps.summary_app import *
+from startup import timed, time_callbacks, start_warm_up, serve_startup_report
+with timed('import app'):
+	from app import app, auth
+from page_layouts import PrerenderedPages, cache_static_routes
+from callback_metrics import instrument_callbacks
+time_callbacks(app)
 
-#server
-server_system = False
+#address of the development server (production runs through wsgi.py, see launching_on_GCP_vm.txt)
+HOST = os.environ.get('HOST', '127.0.0.1')
+PORT = int(os.environ.get('PORT', '8050'))
+DEBUG = os.environ.get('DASH_DEBUG', 'true').lower() == 'true'
 
 app.layout = html.Div([
 	dcc.Location(id='url', refresh=False),
@@ -43,33 +44,41 @@ index_page = html.Div([
 ])
 
 
+#module and layout of the page shown for each url (the index page for any other url); importing a page registers its
+#callbacks, while its data sets are only loaded by them (or by the warm up)
+PAGE_MODULES = {
+	'/summary': ('apps.summary_app', 'summary_page'),
+	'/sleep': ('apps.sleep_app', 'sleep_page'),
+	'/step': ('apps.step_app', 'step_page'),
+	'/floors': ('apps.floors_app', 'floors_page'),
+	'/heart': ('apps.heart_app', 'heart_page'),
+	'/exercise': ('apps.exercise_app', 'exercise_page'),
+	'/daily_aggregated': ('apps.aggregated_app', 'aggregated_page'),
+	'/data': ('apps.data_app', 'data_page'),
+}
+pages = {}
+for pathname, (module, layout) in PAGE_MODULES.items():
+	with timed('import ' + module):
+		pages[pathname] = getattr(importlib.import_module(module), layout)
+
 #Update the displayed page
 @app.callback(
 	Output('page-content', 'children'),
 	[Input('url', 'pathname')]
 )
 def display_page(pathname):
-	if pathname == '/summary':
-		return summary_page
-	elif pathname == '/sleep':
-		return sleep_page
-	elif pathname == '/step':
-		return step_page
-	elif pathname == '/floors':
-		return floors_page
-	elif pathname == '/heart':
-		return heart_page
-	elif pathname == '/exercise':
-		return exercise_page
-	elif pathname == '/daily_aggregated':
-		return aggregated_page
-	elif pathname == '/data':
-		return data_page
-	else:
-		return index_page
+	return pages.get(pathname, index_page)
+
+#the pages are static, so their layouts are serialized once and sent pre-compressed with an etag instead of calling
+#display_page on every url change; the html, layout and callbacks of the app are revalidated with etags by the browser
+prerendered_pages = PrerenderedPages(app, 'page-content.children', pages, index_page, auth)
+cache_static_routes(app)
+serve_startup_report(app, auth)
+#latency, size and status of every callback request, served at /metrics
+instrument_callbacks(app, auth)
 
 if __name__ == '__main__':
-	if server_system:
-		app.run_server(debug=True, port=5000, host='10.162.0.2')
-	else:
-		app.run_server(debug=True)
\ No newline at end of file
+	#(the debug server reloader runs the app in a child process, which is the one worth warming up)
+	if not DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+		start_warm_up(prerendered_pages)
+	app.run_server(debug=DEBUG, port=PORT, host=HOST)
\ No newline at end of file
@@ -0,0 +1,115 @@
+#import libraries
+import json
+import gzip
+import hashlib
+import threading
+import flask
+import plotly
+import dash_core_components as dcc
+import dash_html_components as html
+
+#pages linked in the navigation bar at the top and bottom of every page
+NAV_LINKS = [
+	('Home', '/'),
+	('Summary', '/summary'),
+	('Sleep', '/sleep'),
+	('Step Count', '/step'),
+	('Floors Climbed', '/floors'),
+	('Heart Rate', '/heart'),
+	('Exercise', '/exercise'),
+	('Daily Aggregated', '/daily_aggregated'),
+	('Data Sets', '/data'),
+]
+
+def nav_links():
+	links = [' | ']
+	for label, href in NAV_LINKS:
+		links += [dcc.Link(label, href=href), ' | ']
+	return links
+
+#navigation bar at the top of a page (target of its 'Go to top' link)
+def nav_header():
+	return html.Header(nav_links(), id='top', style={'textAlign':'center'})
+
+def nav_footer():
+	return html.Footer(nav_links(), style={'textAlign':'center'})
+
+
+#send data gzip-compressed if the client accepts it, with an etag of each encoding (no body and status 304 if a GET
+#request already has it); flask-compress leaves responses that are already encoded alone
+def send_cacheable(response, data, compressed, etag):
+	response.headers['Cache-Control'] = 'no-cache'
+	response.vary.add('Accept-Encoding')
+	if 'gzip' in flask.request.accept_encodings:
+		response.set_data(compressed)
+		response.headers['Content-Encoding'] = 'gzip'
+		response.set_etag(etag + '-gzip')
+	else:
+		response.set_data(data)
+		response.set_etag(etag)
+	return response.make_conditional(flask.request)
+
+def _render(data):
+	return {'data': data, 'compressed': gzip.compress(data), 'etag': hashlib.sha1(data).hexdigest()}
+
+
+#dash routes whose responses only change when the app is restarted (index html, layout and callback graph):
+#served with an etag so that browsers and proxies revalidate them instead of downloading them again
+STATIC_ROUTES = ['', '<path:path>', '_dash-layout', '_dash-dependencies']
+
+#(the last response of each route is kept rendered, and rendered again if the response changes)
+def cache_static_routes(app):
+	endpoints = [app.config['routes_pathname_prefix'] + route for route in STATIC_ROUTES]
+	rendered = {}
+
+	@app.server.after_request
+	def add_etag(response):
+		if flask.request.method == 'GET' and flask.request.endpoint in endpoints and response.status_code == 200 \
+				and 'Content-Encoding' not in response.headers:
+			data = response.get_data()
+			cached = rendered.get(flask.request.endpoint)
+			if cached is None or cached['data'] != data:
+				cached = rendered[flask.request.endpoint] = _render(data)
+			send_cacheable(response, **cached)
+		return response
+
+#static page layouts rendered once: the json response of the callback choosing the page (output) for each pathname is
+#serialized, compressed and hashed on the first request of the page, and sent as is instead of calling the callback on
+#every page change
+class PrerenderedPages:
+	def __init__(self, app, output, pages, default, auth=None):
+		self.output = output
+		self.pages = pages
+		self.default = default
+		self._component_property = output.split('.')[-1]
+		self._responses = {}
+		self._lock = threading.Lock()
+
+		#the callback dispatcher of dash, wrapped in the login check like every other view
+		endpoint = app.config['routes_pathname_prefix'] + '_dash-update-component'
+		self._dispatch = app.dispatch
+		view = auth.auth_wrapper(self.dispatch) if auth is not None else self.dispatch
+		app.server.view_functions[endpoint] = view
+
+	def dispatch(self):
+		body = flask.request.get_json(silent=True) or {}
+		if body.get('output') != self.output:
+			return self._dispatch()
+		pathname = next((x.get('value') for x in body.get('inputs', []) if x.get('property') == 'pathname'), None)
+		return send_cacheable(flask.Response(mimetype='application/json'), **self.response(pathname))
+
+	#rendered response of a pathname (the default page for any other pathname)
+	def response(self, pathname):
+		if pathname not in self.pages:
+			pathname = None
+		if pathname not in self._responses:
+			layout = self.pages[pathname] if pathname is not None else self.default
+			rendered = _render(json.dumps({'response': {'props': {self._component_property: layout}}},
+				cls=plotly.utils.PlotlyJSONEncoder).encode())
+			with self._lock:
+				self._responses.setdefault(pathname, rendered)
+		return self._responses[pathname]
+
+	def render_all(self):
+		for pathname in list(self.pages) + [None]:
+			self.response(pathname)
@@ -0,0 +1,293 @@
+#import libraries
+import os
+import functools
+import flask
+import dash
+from dash.exceptions import PreventUpdate
+import plotly.graph_objs as go
+import pandas as pd
+import numpy as np
+
+#import supporting python scripts
+from data_loader import time_offset_minutes
+
+#plot mode of the histograms and boxplots per page (override with e.g. HEART_PLOT_MODE=raw):
+#'raw' sends every value to the browser, 'aggregated' sends binned counts and box statistics computed on the server
+PLOT_MODES = {
+	'exercise': 'raw',
+	'floors': 'raw',
+	'heart': 'aggregated',
+	'sleep': 'raw',
+	'step': 'aggregated',
+	'summary': 'aggregated',
+}
+
+#size limits of the aggregated traces
+MAX_HISTOGRAM_BINS = 100
+MAX_BOX_OUTLIERS = 50
+
+#largest number of points sent per scatter/line trace, about two per pixel of the width of a plot (0 sends every point),
+#and the number of points sent above which a trace is drawn with webgl instead of svg
+MAX_SERIES_POINTS = int(os.environ.get('MAX_SERIES_POINTS', '2000'))
+WEBGL_THRESHOLD = int(os.environ.get('WEBGL_THRESHOLD', '1000'))
+
+#group names of dt.dayofweek (0-6)
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+def plot_mode(page):
+	return os.environ.get(page.upper() + '_PLOT_MODE', PLOT_MODES.get(page, 'raw'))
+
+#time zones found in a data set, from west to east
+def time_zones(df):
+	zones = pd.Series(pd.unique(df['time_offset'].dropna()), dtype=object)
+	return list(zones[np.argsort(time_offset_minutes(zones).values, kind='mergesort')])
+
+#groups found in a column of a data set, sorted as split_groups finds them (so that a window of the data set is split
+#into the same traces)
+def group_keys(df, column):
+	return sorted(pd.unique(df[column].dropna()))
+
+#split a series or frame into (name, part) groups with a single groupby pass instead of one boolean mask per group;
+#by is a column name or values aligned with obj, keys the groups to return in order (by default every group found, sorted)
+#and names their trace names (by default the keys)
+def split_groups(obj, by, keys=None, names=None):
+	parts = dict(iter(obj.groupby(by, sort=True, observed=True)))
+	if keys is None:
+		keys = list(parts)
+	if names is None:
+		names = [str(key) for key in keys]
+	return [(name, parts[key] if key in parts else obj.iloc[:0]) for name, key in zip(names, keys)]
+
+#one scatter trace per (name, frame) group; x and y are column names or functions of the frame
+def scatter_traces(groups, x, y, window=None, **kwargs):
+	column = lambda frame, col: col(frame) if callable(col) else frame[col]
+	return [series_trace(window, x=column(frame, x), y=column(frame, y), name=name, **kwargs) for name, frame in groups]
+
+
+#positions of n points of a series (sorted by x) keeping its shape: the point of each bucket forming the largest
+#triangle with the point kept in the previous bucket and the mean of the next one (largest triangle three buckets)
+def lttb(x, y, n):
+	length = len(x)
+	if n >= length or n < 3:
+		return np.arange(length)
+	#the first and last points are kept, the others split into n - 2 buckets
+	edges = np.linspace(1, length - 1, n - 1).astype(np.int64)
+	edges = np.append(edges, length)
+	positions = np.empty(n, dtype=np.int64)
+	positions[0] = kept = 0
+	positions[-1] = length - 1
+	for i in range(n - 2):
+		start, end = edges[i], edges[i + 1]
+		next_x = x[edges[i + 1]:edges[i + 2]].mean()
+		next_y = y[edges[i + 1]:edges[i + 2]].mean()
+		areas = np.abs((x[kept] - next_x)*(y[start:end] - y[kept]) - (x[kept] - x[start:end])*(next_y - y[kept]))
+		kept = start + np.argmax(areas)
+		positions[i + 1] = kept
+	return positions
+
+#positions of at most n points of a series (sorted by x): the lowest and highest point of each of n/2 buckets, so that
+#no extreme value of a scatter disappears
+def min_max(y, n):
+	length = len(y)
+	if n >= length or n < 2:
+		return np.arange(length)
+	size = -(-length//(n//2))
+	buckets = -(-length//size)
+	#buckets of the same size as the rows of a matrix (the last padded with nan)
+	rows = np.full(buckets*size, np.nan)
+	rows[:length] = y
+	rows = rows.reshape(buckets, size)
+	starts = np.arange(buckets)*size
+	return np.unique(np.concatenate([starts + np.nanargmin(rows, axis=1), starts + np.nanargmax(rows, axis=1)]))
+
+#positions of at most n points of a series: lttb for lines, min-max for markers
+def _decimate(x, y, positions, n, lines):
+	if len(positions) <= n:
+		return positions
+	if n <= 0:
+		return positions[:0]
+	if lines:
+		return positions[lttb(x[positions], y[positions], n)]
+	return positions[min_max(y[positions], n)]
+
+def _window_bound(value, datetimes):
+	return pd.Timestamp(value).value if datetimes else float(value)
+
+#scatter/line trace of a series (same arguments as go.Scatter) sending at most MAX_SERIES_POINTS points: the series is
+#decimated on the server, with a coarser outline (up to an eighth of the points on each side) outside of the visible x
+#range (window) and the rest of the points in it; traces with many points are drawn with webgl
+def series_trace(window=None, x=None, y=None, max_points=MAX_SERIES_POINTS, **kwargs):
+	x = pd.Series(x).reset_index(drop=True)
+	y = pd.Series(y).reset_index(drop=True)
+	if max_points and len(x) > max_points:
+		datetimes = pd.api.types.is_datetime64_any_dtype(x)
+		x_values = x.values.view(np.int64).astype(float) if datetimes else x.values.astype(float)
+		y_values = y.values.astype(float)
+		present = np.flatnonzero(x.notnull().values & y.notnull().values)
+		order = present[np.argsort(x_values[present], kind='mergesort')]
+		lines = 'lines' in kwargs.get('mode', 'lines')
+		if window is not None:
+			start, end = np.searchsorted(x_values[order], [_window_bound(window[0], datetimes), _window_bound(window[1], datetimes)], side='left')
+			before = _decimate(x_values, y_values, order[:start], max_points//8, lines)
+			after = _decimate(x_values, y_values, order[end:], max_points//8, lines)
+			inside = _decimate(x_values, y_values, order[start:end], max_points - len(before) - len(after), lines)
+			positions = np.concatenate([before, inside, after])
+		else:
+			positions = _decimate(x_values, y_values, order, max_points, lines)
+		x = x.iloc[positions]
+		y = y.iloc[positions]
+	trace = go.Scattergl if len(x) > WEBGL_THRESHOLD else go.Scatter
+	return trace(x=x, y=y, **kwargs)
+
+#visible x range of a graph from its relayoutData: (start, end) when zoomed in, None when autoscaled, and False when the
+#x axis didn't change
+def zoom_window(relayout_data):
+	if not relayout_data:
+		return False
+	if relayout_data.get('xaxis.autorange'):
+		return None
+	if 'xaxis.range[0]' in relayout_data and 'xaxis.range[1]' in relayout_data:
+		return (relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]'])
+	if isinstance(relayout_data.get('xaxis.range'), list) and len(relayout_data['xaxis.range']) == 2:
+		return tuple(relayout_data['xaxis.range'])
+	return False
+
+#figure callback of a plot selector and the relayoutData of its graph: a zoom or pan of the plots listed in series_plots
+#calls func(plot, window) with the visible x range, so that the points in it are sent at full resolution; zooming any
+#other plot (which sends all its data already) doesn't call func. The figure keeps the zoom of the user until another
+#plot is selected (uirevision)
+def zoomable_figure(series_plots):
+	def decorator(func):
+		@functools.wraps(func)
+		def wrapper(plot, relayout_data=None):
+			window = None
+			triggered = [x['prop_id'] for x in dash.callback_context.triggered] if flask.has_request_context() else []
+			if triggered and all(prop_id.endswith('.relayoutData') for prop_id in triggered):
+				window = zoom_window(relayout_data)
+				if plot not in series_plots or window is False:
+					raise PreventUpdate
+			figure = func(plot, window)
+			#(no figure without a selected plot)
+			if figure is None:
+				return figure
+			if isinstance(figure['layout'], dict):
+				return dict(figure, layout=dict(figure['layout'], uirevision=plot))
+			figure['layout']['uirevision'] = plot
+			return figure
+		return wrapper
+	return decorator
+
+
+#shared bin edges of all groups (stacked bars need the same bins)
+def _bin_edges(values, bins):
+	if len(values) == 0:
+		return np.array([0.0, 1.0])
+	if bins is None:
+		edges = np.histogram_bin_edges(values, bins='auto')
+		if len(edges) - 1 > MAX_HISTOGRAM_BINS:
+			edges = np.histogram_bin_edges(values, bins=MAX_HISTOGRAM_BINS)
+		return edges
+	return np.histogram_bin_edges(values, bins=bins)
+
+#one histogram trace per (name, values) group; bins is a bin count or edges for the aggregated mode
+def histogram_traces(groups, mode='raw', bins=None, **kwargs):
+	if mode == 'raw':
+		return [go.Histogram(x=values, name=name, **kwargs) for name, values in groups]
+
+	groups = [(name, pd.Series(values).dropna()) for name, values in groups]
+	#categories (e.g. exercise types) are counted, in order of appearance
+	if any(not pd.api.types.is_numeric_dtype(values) for name, values in groups):
+		categories = pd.unique(pd.concat([values.astype(str) for name, values in groups]))
+		return [go.Bar(
+				x = list(categories),
+				y = values.astype(str).value_counts().reindex(categories, fill_value=0).tolist(),
+				name = name,
+			) for name, values in groups]
+
+	edges = _bin_edges(np.concatenate([values.values.astype(float) for name, values in groups]), bins)
+	centers = (edges[:-1] + edges[1:])/2
+	widths = np.diff(edges)
+	return [go.Bar(
+			x = centers.tolist(),
+			y = np.histogram(values.values.astype(float), bins=edges)[0].tolist(),
+			width = widths.tolist(),
+			name = name,
+		) for name, values in groups]
+
+#quartiles, tukey whiskers (most extreme values within 1.5 IQR of the box), mean, sd and the most extreme outliers
+def box_stats(values):
+	values = np.sort(pd.Series(values).dropna().values.astype(float))
+	if len(values) == 0:
+		return None
+	q1, median, q3 = np.percentile(values, [25, 50, 75])
+	iqr = q3 - q1
+	inside = values[(values >= q1 - 1.5*iqr) & (values <= q3 + 1.5*iqr)]
+	outliers = values[(values < q1 - 1.5*iqr) | (values > q3 + 1.5*iqr)]
+	if len(outliers) > MAX_BOX_OUTLIERS:
+		outliers = outliers[np.argsort(-np.abs(outliers - median), kind='mergesort')[:MAX_BOX_OUTLIERS]]
+	return {
+		'n': len(values),
+		'q1': q1,
+		'median': median,
+		'q3': q3,
+		'lower': inside[0],
+		'upper': inside[-1],
+		'mean': values.mean(),
+		'sd': values.std(),
+		'outliers': outliers,
+	}
+
+#one boxplot per (name, values) group; the aggregated mode draws all groups with four fixed-size traces
+#(box from Q1 to Q3, median with whiskers, mean with sd, outliers)
+def box_traces(groups, mode='raw', **kwargs):
+	if mode == 'raw':
+		return [go.Box(y=values, name=name, **kwargs) for name, values in groups]
+
+	names, stats = [], []
+	for name, values in groups:
+		group_stats = box_stats(values)
+		if group_stats is not None:
+			names.append(name)
+			stats.append(group_stats)
+	col = lambda key: [s[key] for s in stats]
+	hover = ['n: %d<br>upper: %.4g<br>Q3: %.4g<br>median: %.4g<br>Q1: %.4g<br>lower: %.4g<br>mean: %.4g<br>sd: %.4g'
+		% (s['n'], s['upper'], s['q3'], s['median'], s['q1'], s['lower'], s['mean'], s['sd']) for s in stats]
+	return [go.Bar(
+			x = names,
+			y = (np.array(col('q3')) - np.array(col('q1'))).tolist(),
+			base = col('q1'),
+			name = 'Q1 - Q3',
+			text = hover,
+			hoverinfo = 'x+text',
+			opacity = 0.6,
+		),
+		go.Scatter(
+			x = names,
+			y = col('median'),
+			name = 'median & whiskers',
+			mode = 'markers',
+			marker = {'symbol': 'line-ew-open', 'size': 30},
+			error_y = {
+				'type': 'data',
+				'symmetric': False,
+				'array': (np.array(col('upper')) - np.array(col('median'))).tolist(),
+				'arrayminus': (np.array(col('median')) - np.array(col('lower'))).tolist(),
+				'width': 10,
+			},
+		),
+		go.Scatter(
+			x = names,
+			y = col('mean'),
+			name = 'mean ± sd',
+			mode = 'markers',
+			marker = {'symbol': 'diamond-open', 'size': 8},
+			error_y = {'type': 'data', 'array': col('sd'), 'width': 4},
+		),
+		go.Scatter(
+			x = [name for name, s in zip(names, stats) for i in range(len(s['outliers']))],
+			y = np.concatenate([s['outliers'] for s in stats] or [[]]).tolist(),
+			name = 'outliers',
+			mode = 'markers',
+			marker = {'size': 4},
+		),
+	]
@@ -0,0 +1,105 @@
+#import libraries
+import os
+import sys
+import time
+import json
+import resource
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+#startup profiling mode (STARTUP_PROFILE=1, or the path of the json report): also traces the memory allocated by python
+#and numpy in each step (which slows the startup down) and writes the report as json
+STARTUP_PROFILE = os.environ.get('STARTUP_PROFILE', '')
+PROFILE_MEMORY = STARTUP_PROFILE.lower() not in ('', '0', 'false')
+STARTUP_PROFILE_FILE = STARTUP_PROFILE if STARTUP_PROFILE.lower() not in ('1', 'true') else 'startup_profile.json'
+
+#steps timed while recording (the startup of the app), in the order they started:
+#{'step', 'depth' (of nested steps), 'seconds', 'rss_bytes' (change of the resident memory), 'traced_bytes'}
+profile_steps = []
+recording = False
+_start = None
+_stop = None
+_local = threading.local()
+
+if PROFILE_MEMORY:
+	tracemalloc.start()
+
+#resident memory of this process (the peak where /proc isn't available)
+def rss_bytes():
+	try:
+		with open('/proc/self/statm') as f:
+			return int(f.read().split()[1])*resource.getpagesize()
+	except (OSError, ValueError, IndexError):
+		return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*1024
+
+def start_recording():
+	global recording, _start, _stop
+	recording = True
+	_start = time.perf_counter()
+	_stop = None
+
+#(the memory tracing of the profiling mode is stopped with the recording, so that the server doesn't keep paying for it)
+def stop_recording():
+	global recording, _stop
+	recording = False
+	_stop = time.perf_counter()
+	if tracemalloc.is_tracing():
+		tracemalloc.stop()
+
+#record the time and memory taken by a step (nothing outside of the recording)
+@contextmanager
+def timed(step):
+	if not recording:
+		yield
+		return
+	record = {'step': step, 'depth': getattr(_local, 'depth', 0), 'seconds': None, 'rss_bytes': None, 'traced_bytes': None}
+	profile_steps.append(record)
+	_local.depth = record['depth'] + 1
+	rss = rss_bytes()
+	traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+	start = time.perf_counter()
+	try:
+		yield
+	finally:
+		record['seconds'] = time.perf_counter() - start
+		record['rss_bytes'] = rss_bytes() - rss
+		if traced is not None:
+			record['traced_bytes'] = tracemalloc.get_traced_memory()[0] - traced
+		_local.depth = record['depth']
+
+#report of the recorded steps, as a dict that can be written as json
+def startup_profile():
+	return {
+		'pid': os.getpid(),
+		'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+		'argv': sys.argv,
+		'total_seconds': (_stop or time.perf_counter()) - _start if _start is not None else None,
+		'rss_bytes': rss_bytes(),
+		'steps': [dict(record) for record in list(profile_steps)],
+	}
+
+def _megabytes(value):
+	return '%9.1f' % (value/2**20) if value is not None else '%9s' % '-'
+
+#report of the recorded steps as a table (nested steps indented under the step they are part of)
+def startup_report(profile=None):
+	profile = profile or startup_profile()
+	steps = [('  '*record['depth'] + record['step'], record) for record in profile['steps']]
+	width = max([len(step) for step, record in steps] + [len('total (resident memory)')])
+	lines = ['%-*s %9s %9s %9s' % (width, 'step', 'seconds', 'rss MB', 'traced MB')]
+	for step, record in steps:
+		seconds = '%9.3f' % record['seconds'] if record['seconds'] is not None else '%9s' % '...'
+		lines.append('%-*s %s %s %s' % (width, step, seconds, _megabytes(record['rss_bytes']), _megabytes(record['traced_bytes'])))
+	if profile['total_seconds'] is not None:
+		lines.append('%-*s %9.3f %s' % (width, 'total (resident memory)', profile['total_seconds'], _megabytes(profile['rss_bytes'])))
+	return '\n'.join(lines)
+
+#print the table (and write the json report in profiling mode)
+def report_startup():
+	profile = startup_profile()
+	print('startup times (pid %d):\n%s' % (profile['pid'], startup_report(profile)), file=sys.stderr, flush=True)
+	if PROFILE_MEMORY:
+		with open(STARTUP_PROFILE_FILE, 'w') as f:
+			json.dump(profile, f, indent=1)
+	return profile
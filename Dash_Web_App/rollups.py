@@ -0,0 +1,150 @@
+#import libraries
+import pandas as pd
+import numpy as np
+
+#import supporting python scripts
+from data_loader import CLEANED_DATA_DIR, csv_path, read_cleaned_csv, write_columnar_store
+
+#measures summarized in the rollup of each data set (column name or function of the cleaned data set)
+ROLLUP_MEASURES = {
+	'exercise': {
+		'duration': 'duration',
+		'calorie': 'calorie',
+		'distance': 'distance',
+		'mean_heart_rate': 'mean_heart_rate',
+	},
+	'floors': {
+		'floor': 'floor',
+	},
+	'heart_rate': {
+		'heart_rate': 'heart_rate',
+	},
+	'sleep': {
+		'duration_hr': lambda df: (df['local_end_time'] - df['local_start_time'])/np.timedelta64(1, 'h'),
+		'efficiency': 'efficiency',
+		'quality': 'quality',
+	},
+	'step_count': {
+		'count': 'count',
+		'distance': 'distance',
+		'calorie': 'calorie',
+		'speed': 'speed',
+	},
+}
+
+#time used to bucket the entries of each data set (sleep counts on the day it ends, as in daily_aggregated)
+ROLLUP_TIME_COLUMNS = {
+	'sleep': 'local_end_time',
+}
+
+#start of the hour, day, iso week (monday) and month of each time
+ROLLUP_LEVELS = {
+	'hour': lambda t: t.dt.floor('H'),
+	'day': lambda t: t.dt.normalize(),
+	'week': lambda t: t.dt.normalize() - pd.to_timedelta(t.dt.dayofweek, unit='D'),
+	'month': lambda t: t.dt.to_period('M').dt.to_timestamp(),
+}
+
+#longest duration of a bucket of each level
+ROLLUP_LEVEL_DURATIONS = {
+	'hour': pd.Timedelta(hours=1),
+	'day': pd.Timedelta(days=1),
+	'week': pd.Timedelta(weeks=1),
+	'month': pd.Timedelta(days=31),
+}
+
+ROLLUP_COLUMNS = ['level', 'bucket', 'time_offset', 'measure', 'count', 'sum', 'min', 'max', 'mean', 'sumsq']
+
+
+#name of the rollup data set of a cleaned data set
+def rollup_name(name):
+	return name + '_rollup'
+
+def _rollup_times(df, name):
+	return pd.to_datetime(df[ROLLUP_TIME_COLUMNS.get(name, 'local_start_time')])
+
+#count, sum, min, max, mean and sum of squares of each measure per time bucket and time zone, for every level
+#(one row per level, bucket, time zone and measure)
+def build_rollup(df, name, levels=None):
+	values = pd.DataFrame({measure: col(df) if callable(col) else df[col]
+		for measure, col in ROLLUP_MEASURES[name].items()}, index=df.index).astype(np.float64)
+	times = _rollup_times(df, name)
+	time_offset = df['time_offset'].astype(str)
+	tables = []
+	for level in levels or ROLLUP_LEVELS:
+		keys = [ROLLUP_LEVELS[level](times).rename('bucket'), time_offset.rename('time_offset')]
+		grouped = values.groupby(keys)
+		stats = pd.concat({
+			'count': grouped.count(),
+			'sum': grouped.sum(),
+			'min': grouped.min(),
+			'max': grouped.max(),
+			'mean': grouped.mean(),
+			'sumsq': (values**2).groupby(keys).sum(),
+		}, axis=1)
+		stats = stats.stack(level=1).rename_axis(['bucket', 'time_offset', 'measure']).reset_index()
+		stats.insert(0, 'level', level)
+		tables.append(stats)
+	rollup = pd.concat(tables, ignore_index=True).reindex(columns=ROLLUP_COLUMNS)
+	rollup['count'] = rollup['count'].astype(np.int64)
+	return rollup
+
+#recompute the buckets of a rollup that contain any of the changed rows (new rows and the stored rows they replaced)
+def update_rollup(rollup, df, changed_df, name):
+	times = _rollup_times(df, name)
+	changed_times = _rollup_times(changed_df, name)
+	stale = pd.Series(False, index=rollup.index)
+	tables = []
+	for level, bucket in ROLLUP_LEVELS.items():
+		buckets = bucket(changed_times).unique()
+		stale |= (rollup['level'] == level) & rollup['bucket'].isin(buckets)
+		rows = df[bucket(times).isin(buckets)]
+		if len(rows):
+			tables.append(build_rollup(rows, name, [level]))
+	return _sort_rollup(pd.concat([rollup[~stale]] + tables, ignore_index=True), name)
+
+#rollup of a data set from the rollups of disjoint parts of it (e.g. the chunks of a streamed export)
+def combine_rollups(rollups, name):
+	rollup = pd.concat(rollups, ignore_index=True)
+	combined = rollup.groupby(['level', 'bucket', 'time_offset', 'measure'], sort=False, observed=True).agg(
+		{'count': 'sum', 'sum': 'sum', 'min': 'min', 'max': 'max', 'sumsq': 'sum'}).reset_index()
+	combined['mean'] = combined['sum']/combined['count']
+	return _sort_rollup(combined.reindex(columns=ROLLUP_COLUMNS), name)
+
+#same row order as build_rollup
+def _sort_rollup(rollup, name):
+	order = pd.DataFrame({
+		'level': pd.Categorical(rollup['level'], categories=list(ROLLUP_LEVELS)),
+		'bucket': rollup['bucket'],
+		'time_offset': rollup['time_offset'],
+		'measure': pd.Categorical(rollup['measure'], categories=list(ROLLUP_MEASURES[name])),
+	}).sort_values(['level', 'bucket', 'time_offset', 'measure']).index
+	return rollup.loc[order].reset_index(drop=True)
+
+#one measure of a rollup at one level, per bucket (and time zone if by_time_zone), with the mean and sd recomputed
+#from the sums so that time zones can be combined
+def query_rollup(rollup, level, measure, by_time_zone=False):
+	rows = rollup[(rollup['level'] == level) & (rollup['measure'] == measure)]
+	keys = ['bucket', 'time_offset'] if by_time_zone else ['bucket']
+	result = rows.groupby(keys, observed=True).agg({'count': 'sum', 'sum': 'sum', 'min': 'min', 'max': 'max', 'sumsq': 'sum'})
+	result['mean'] = result['sum']/result['count']
+	variance = (result['sumsq'] - result['count']*result['mean']**2)/(result['count'] - 1)
+	result['sd'] = np.sqrt(variance.clip(lower=0)).where(result['count'] > 1)
+	return result
+
+#finest level with at most max_buckets buckets between start and end (None if even the months are too many)
+def rollup_level(start, end, max_buckets):
+	for level, duration in ROLLUP_LEVEL_DURATIONS.items():
+		if (end - start)/duration + 1 <= max_buckets:
+			return level
+	return None
+
+#rebuild the rollups from the cleaned csv files (the cleaning script writes them along with the cleaned data)
+def write_rollups(directory=CLEANED_DATA_DIR):
+	for name in ROLLUP_MEASURES:
+		rollup = build_rollup(read_cleaned_csv(name, directory), name)
+		rollup.to_csv(csv_path(rollup_name(name), directory), sep=',', index=True)
+		write_columnar_store(rollup, rollup_name(name), directory)
+
+if __name__ == '__main__':
+	write_rollups()
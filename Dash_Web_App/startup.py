@@ -0,0 +1,73 @@
+#import libraries
+import os
+import json
+import threading
+import flask
+
+#import supporting python scripts (the startup steps are recorded from here until the warm up is done)
+from profiling import timed, start_recording, stop_recording, startup_profile, startup_report, report_startup
+start_recording()
+with timed('import data_loader'):
+	from data_loader import CLEANED_DATA_DIR, DATASET_FILES, DERIVED_COLUMNS, load_dataset
+
+#when the shared data sets are loaded and the page layouts rendered: 'background' (in a thread while the server starts
+#accepting connections), 'sync' (before serving, e.g. in the gunicorn master so that the forked workers share them) or
+#'none' (on the first request that needs them)
+WARM_UP = os.environ.get('WARM_UP', 'background')
+
+#users allowed to see the startup report at /_admin/startup (comma separated usernames; no route if there are none)
+ADMIN_USERS = [user for user in os.environ.get('ADMIN_USERS', '').split(',') if user]
+
+#time the registration of each callback of the app (the rest of the import of a page is mostly its layout)
+def time_callbacks(app):
+	callback = app.callback
+	def timed_callback(output, *args, **kwargs):
+		with timed('register callback %s.%s' % (output.component_id, output.component_property)):
+			return callback(output, *args, **kwargs)
+	app.callback = timed_callback
+
+#load the data sets in cleaned_data (seen by every user in single-user mode, with the derived columns the pages use) and
+#render the page layouts
+def warm_up(prerendered_pages=None):
+	for name in DATASET_FILES:
+		with timed('load ' + name):
+			load_dataset(name, derived=name in DERIVED_COLUMNS, directory=CLEANED_DATA_DIR)
+	if prerendered_pages is not None:
+		with timed('render page layouts'):
+			prerendered_pages.render_all()
+
+def _finish_startup(prerendered_pages, warm):
+	if warm:
+		warm_up(prerendered_pages)
+	stop_recording()
+	report_startup()
+
+#warm up in the given mode (the background thread is returned, so that it can be waited for)
+def start_warm_up(prerendered_pages=None, mode=WARM_UP):
+	if mode == 'sync':
+		_finish_startup(prerendered_pages, True)
+	elif mode == 'background':
+		thread = threading.Thread(target=_finish_startup, args=(prerendered_pages, True), name='warm-up', daemon=True)
+		thread.start()
+		return thread
+	elif mode == 'none':
+		_finish_startup(prerendered_pages, False)
+	else:
+		raise ValueError("unknown warm up mode '%s'" % mode)
+
+#serve the startup report of the process answering the request to the admin users, as json (or as the text table with
+#?format=text)
+def serve_startup_report(app, auth, users=ADMIN_USERS, route='/_admin/startup'):
+	if not users:
+		return
+
+	def startup_report_view():
+		if flask.request.authorization is None or flask.request.authorization.username not in users:
+			return flask.Response(status=403)
+		profile = startup_profile()
+		if flask.request.args.get('format') == 'text':
+			return flask.Response(startup_report(profile), mimetype='text/plain')
+		return flask.Response(json.dumps(profile), mimetype='application/json')
+
+	view = auth.auth_wrapper(startup_report_view) if auth is not None else startup_report_view
+	app.server.add_url_rule(route, 'startup_report', view)
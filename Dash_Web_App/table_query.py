@@ -0,0 +1,148 @@
+#import libraries
+import os
+import re
+import operator
+import threading
+from collections import OrderedDict
+import pandas as pd
+import numpy as np
+
+#import supporting python scripts
+from data_loader import dataset_version
+
+#memory used by the cached sort orders of the tables, in bytes (override with e.g. SORT_INDEX_MEMORY=16777216)
+SORT_INDEX_MEMORY = int(os.environ.get('SORT_INDEX_MEMORY', str(64*2**20)))
+
+#operators of the DataTable filter expressions (e.g. '"heart_rate" > 100 && "time_offset" eq UTC-0400')
+FILTER_OPERATORS = {
+	'=': operator.eq, 'eq': operator.eq,
+	'!=': operator.ne, 'ne': operator.ne,
+	'>': operator.gt, 'gt': operator.gt,
+	'>=': operator.ge, 'ge': operator.ge,
+	'<': operator.lt, 'lt': operator.lt,
+	'<=': operator.le, 'le': operator.le,
+}
+
+#one filter of a column: "column" operator value, where the value is num(...), str(...), quoted or a bare word
+FILTER_FRAGMENT = re.compile(r'^\s*"(?P<column>(?:[^"\\]|\\.)+)"\s*(?P<operator>>=|<=|!=|>|<|=|ge|le|gt|lt|eq|ne)\s*(?P<value>.+?)\s*$', re.I)
+FILTER_VALUE = re.compile(r'''^(?:num\((?P<num>[^()]*)\)|str\((?P<str>[^()]*)\)|'(?P<single>(?:[^'\\]|\\.)+)'|"(?P<double>(?:[^"\\]|\\.)+)"|`(?P<back>(?:[^`\\]|\\.)+)`|(?P<bare>(?:\w|[:.\-+])+))$''')
+
+#value of a filter as text and as a number (None if it isn't one)
+def _filter_value(text):
+	match = FILTER_VALUE.match(text)
+	if match is None:
+		return None
+	if match.group('str') is not None:
+		return match.group('str'), None
+	for group in ['single', 'double', 'back']:
+		if match.group(group) is not None:
+			value = re.sub(r'\\(.)', r'\1', match.group(group))
+			return value, None
+	value = match.group('num') if match.group('num') is not None else match.group('bare')
+	try:
+		return value, float(value)
+	except ValueError:
+		return value, None
+
+#rows of a column matching one filter; numbers and times are compared as such, everything else as text
+def _filter_mask(column, compare, text, number):
+	if pd.api.types.is_datetime64_any_dtype(column):
+		try:
+			return compare(column, pd.Timestamp(text)).values
+		except ValueError:
+			return np.zeros(len(column), dtype=bool)
+	if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+		if number is None:
+			return np.zeros(len(column), dtype=bool)
+		return compare(column, number).values
+	values = column.astype(object)
+	present = values.notnull().values
+	mask = np.zeros(len(column), dtype=bool)
+	mask[present] = compare(values[present].astype(str), text).values
+	return mask
+
+#rows of a data set matching the filtering_settings of a DataTable (the filters of each column joined by &&);
+#filters of unknown columns or that can't be parsed are ignored, as the table does with invalid filters
+def filter_mask(df, filtering_settings):
+	mask = np.ones(len(df), dtype=bool)
+	for fragment in filtering_settings.split('&&'):
+		match = FILTER_FRAGMENT.match(fragment)
+		if match is None or match.group('column') not in df.columns:
+			continue
+		value = _filter_value(match.group('value'))
+		if value is None:
+			continue
+		mask &= _filter_mask(df[match.group('column')], FILTER_OPERATORS[match.group('operator').lower()], *value)
+	return mask
+
+def filter_rows(df, filtering_settings):
+	return df[filter_mask(df, filtering_settings)]
+
+#row positions of a data set sorted by (column, 'asc' or 'desc') keys; missing values last, ties kept in data set order
+def sort_positions(df, keys):
+	if not keys:
+		return np.arange(len(df))
+	columns = df[[column for column, direction in keys]].reset_index(drop=True)
+	order = columns.sort_values(list(columns.columns), ascending=[direction == 'asc' for column, direction in keys],
+		kind='mergesort', na_position='last').index.values
+	#int32 positions take half the memory
+	return order.astype(np.int32) if len(df) < 2**31 else order
+
+#least recently used sort orders of the data sets (data set, version, keys) -> row positions, built on the first
+#sort of a table by those columns and evicted once the orders take more than max_bytes
+class SortIndexCache:
+	def __init__(self, max_bytes=SORT_INDEX_MEMORY):
+		self.max_bytes = max_bytes
+		self.nbytes = 0
+		self.hits = 0
+		self.misses = 0
+		self._orders = OrderedDict()
+		self._lock = threading.Lock()
+
+	def positions(self, df, keys, dataset):
+		key = (dataset, dataset_version(dataset), keys)
+		with self._lock:
+			if key in self._orders:
+				self.hits += 1
+				self._orders.move_to_end(key)
+				return self._orders[key]
+			self.misses += 1
+		order = sort_positions(df, keys)
+		order.flags.writeable = False
+		with self._lock:
+			if key not in self._orders and order.nbytes <= self.max_bytes:
+				self._orders[key] = order
+				self.nbytes += order.nbytes
+				while self.nbytes > self.max_bytes:
+					old_key, old_order = self._orders.popitem(last=False)
+					self.nbytes -= old_order.nbytes
+		return order
+
+	def stats(self):
+		with self._lock:
+			return {'entries': len(self._orders), 'bytes': self.nbytes, 'max_bytes': self.max_bytes,
+				'hits': self.hits, 'misses': self.misses}
+
+	def clear(self):
+		with self._lock:
+			self._orders.clear()
+			self.nbytes = 0
+
+sort_indexes = SortIndexCache()
+
+#rows of one page of a DataTable, filtered and sorted on the server (pagination_mode, sorting and filtering set to 'be');
+#the sort orders of a loaded data set (dataset is its name) are cached, so a page is a slice of the cached order of
+#the whole data set, restricted to the rows matching the filters (a page past the end of the matching rows, e.g. after
+#narrowing the filters, shows the last page)
+def table_page(df, pagination_settings, sorting_settings=None, filtering_settings=None, dataset=None):
+	keys = tuple((s['column_id'], s['direction']) for s in sorting_settings or [] if s['column_id'] in df.columns)
+	if dataset is not None and keys:
+		positions = sort_indexes.positions(df, keys, dataset)
+	else:
+		positions = sort_positions(df, keys)
+	if filtering_settings:
+		positions = positions[filter_mask(df, filtering_settings)[positions]]
+	page_size = pagination_settings['page_size']
+	last_page = max(len(positions) - 1, 0)//page_size
+	start = min(pagination_settings['current_page'], last_page)*page_size
+	return df.take(positions[start:start + page_size])
@@ -0,0 +1,165 @@
+#import libraries
+import os
+import threading
+from collections import OrderedDict
+import pandas as pd
+import numpy as np
+
+#import supporting python scripts
+from data_loader import dataset_version, load_dataset
+from rollups import ROLLUP_MEASURES, ROLLUP_TIME_COLUMNS, ROLLUP_LEVEL_DURATIONS, rollup_name, rollup_level, query_rollup
+from plot_stats import split_groups, scatter_traces, series_trace, MAX_SERIES_POINTS
+
+#rows kept on each side of the visible window of a plot as a coarse outline of the rest of the series (the outline
+#budget of series_trace)
+OUTLINE_ROWS = MAX_SERIES_POINTS//8
+
+#memory used by the cached time indexes and rollup levels of the plots, in bytes (override with e.g. TIME_INDEX_MEMORY=16777216)
+TIME_INDEX_MEMORY = int(os.environ.get('TIME_INDEX_MEMORY', str(64*2**20)))
+
+#at most n of the positions start to stop (excluded), spread evenly over them
+def _spread(start, stop, n):
+	return np.linspace(start, stop - 1, max(min(n, stop - start), 0)).astype(np.int64)
+
+#times of the rows of a data set sorted in a DatetimeIndex (missing times left out), with the row position of each
+class TimeIndex:
+	def __init__(self, times):
+		times = pd.DatetimeIndex(times)
+		present = np.flatnonzero(~times.isna())
+		order = present[np.argsort(times.asi8[present], kind='mergesort')]
+		#int32 positions take half the memory
+		self.positions = order.astype(np.int32) if len(times) < 2**31 else order
+		self.times = times[order]
+		self.nbytes = self.positions.nbytes + self.times.nbytes
+
+	#row positions of the times in [start, end] (either can be None for an open end), by binary search
+	def range(self, start=None, end=None):
+		first = self.times.searchsorted(start, side='left') if start is not None else 0
+		last = self.times.searchsorted(end, side='right') if end is not None else len(self.times)
+		return self.positions[first:last]
+
+	#row positions of the times in [start, end], with at most outline positions spread over the times on each side
+	def window(self, start, end, outline=0):
+		first = self.times.searchsorted(start, side='left')
+		last = self.times.searchsorted(end, side='right')
+		return np.concatenate([self.positions[_spread(0, first, outline)], self.positions[first:last],
+			self.positions[_spread(last, len(self.times), outline)]])
+
+	#first and last time (None without any)
+	def span(self):
+		return (self.times[0], self.times[-1]) if len(self.times) else None
+
+#least recently used time indexes (data set, version, column) and rollup levels (rollup data set, version, level,
+#measure, by time zone) of the data sets, built on their first query and evicted once they take more than max_bytes
+class TimeIndexCache:
+	def __init__(self, max_bytes=TIME_INDEX_MEMORY):
+		self.max_bytes = max_bytes
+		self.nbytes = 0
+		self.hits = 0
+		self.misses = 0
+		self._entries = OrderedDict()
+		self._lock = threading.Lock()
+
+	def _get(self, key, build):
+		with self._lock:
+			if key in self._entries:
+				self.hits += 1
+				self._entries.move_to_end(key)
+				return self._entries[key][0]
+			self.misses += 1
+		value, nbytes = build()
+		with self._lock:
+			if key not in self._entries and nbytes <= self.max_bytes:
+				self._entries[key] = (value, nbytes)
+				self.nbytes += nbytes
+				while self.nbytes > self.max_bytes:
+					old_key, (old_value, old_nbytes) = self._entries.popitem(last=False)
+					self.nbytes -= old_nbytes
+		return value
+
+	#time index of a column of a loaded data set (dataset is its name)
+	def index(self, df, column, dataset):
+		def build():
+			index = TimeIndex(df[column])
+			return index, index.nbytes
+		return self._get((dataset, dataset_version(dataset), column, len(df)), build)
+
+	#one measure of the rollup of a data set at one level, per bucket (and time zone), sorted by bucket
+	def rollup(self, dataset, level, measure, by_time_zone=False):
+		name = rollup_name(dataset)
+		def build():
+			table = query_rollup(load_dataset(name), level, measure, by_time_zone).reset_index()
+			table = table.sort_values('bucket', kind='mergesort').reset_index(drop=True)
+			return table, table.memory_usage(deep=True).sum()
+		return self._get((name, dataset_version(name), level, measure, by_time_zone), build)
+
+	def stats(self):
+		with self._lock:
+			return {'entries': len(self._entries), 'bytes': self.nbytes, 'max_bytes': self.max_bytes,
+				'hits': self.hits, 'misses': self.misses}
+
+	def clear(self):
+		with self._lock:
+			self._entries.clear()
+			self.nbytes = 0
+
+time_indexes = TimeIndexCache()
+
+#bounds of a visible x range (start, end), in order
+def _window_bounds(window):
+	start, end = pd.Timestamp(window[0]), pd.Timestamp(window[1])
+	return (start, end) if start <= end else (end, start)
+
+#rows of a data set in the visible time window of a plot (every row when window is None), sorted by time, with a coarse
+#outline of at most outline rows on each side of the window, so that zooming out or panning shows the rest of the series
+#until the plot is refetched; the rows are found by binary search in the cached time index of the data set (dataset is
+#its name), so the time taken depends on the size of the window rather than on the length of the history (every row
+#is read when every point is plotted, MAX_SERIES_POINTS=0)
+def time_window(df, column, window=None, dataset=None, outline=OUTLINE_ROWS):
+	index = time_indexes.index(df, column, dataset) if dataset is not None else TimeIndex(df[column])
+	if window is None or not MAX_SERIES_POINTS:
+		return df.take(index.range())
+	return df.take(index.window(*_window_bounds(window), outline=outline))
+
+#whether the plotted measure is in the rollup of the data set, bucketed by the plotted time
+def _has_rollup(dataset, column, measure):
+	return (dataset in ROLLUP_MEASURES and isinstance(measure, str) and measure in ROLLUP_MEASURES[dataset]
+		and ROLLUP_TIME_COLUMNS.get(dataset, 'local_start_time') == column)
+
+#one trace of the rollup buckets of each (name, key) group in the window (with a coarse outline of outline buckets on each
+#side): the mean of each bucket with its min and max as error bars; the key None plots every bucket in one trace
+def _rollup_traces(table, names, keys, start, end, level, outline=OUTLINE_ROWS, **kwargs):
+	#(buckets starting before the window that reach into it are included)
+	first, last = table['bucket'].searchsorted([start - ROLLUP_LEVEL_DURATIONS[level], end], side='right')
+	table = table.take(np.concatenate([_spread(0, first, outline), np.arange(first, last), _spread(last, len(table), outline)]))
+	groups = split_groups(table, 'time_offset', keys, names) if keys != [None] else [(names[0], table)]
+	return [series_trace((start, end),
+			x = rows['bucket'],
+			y = rows['mean'],
+			name = name,
+			text = ['%s mean of %d' % (level, count) for count in rows['count']],
+			error_y = dict(type='data', symmetric=False, array=rows['max'] - rows['mean'], arrayminus=rows['mean'] - rows['min'],
+				thickness=1, width=0),
+			**kwargs
+		) for name, rows in groups]
+
+#traces of a measure over time in the visible window of a plot (one per group of the by column, as with split_groups,
+#or a single trace named name): every row in the window while no trace has more than max_points of them, otherwise the
+#buckets of the finest rollup level with at most max_points buckets in the window where the data set has a rollup of
+#the measure (per time zone or in total), and a decimated selection of the rows where it hasn't
+def time_traces(df, dataset, column, measure, window=None, by=None, keys=None, names=None, name=None,
+		max_points=MAX_SERIES_POINTS, **kwargs):
+	window_df = time_window(df, column, window, dataset)
+	groups = split_groups(window_df, by, keys, names) if by is not None else [(name, window_df)]
+	if (max_points and max([len(frame) for group, frame in groups] + [0]) > max_points and _has_rollup(dataset, column, measure)
+			and by in (None, 'time_offset')):
+		start, end = _window_bounds(window) if window is not None else time_indexes.index(df, column, dataset).span()
+		level = rollup_level(start, end, max_points)
+		if level is not None:
+			table = time_indexes.rollup(dataset, level, measure, by_time_zone=by is not None)
+			if by is None:
+				keys = [None]
+			elif keys is None:
+				keys = [group for group, frame in groups]
+			return _rollup_traces(table, [group for group, frame in groups], keys, start, end, level, **kwargs)
+	return scatter_traces(groups, column, measure, window=window, max_points=max_points, **kwargs)
@@ -0,0 +1,119 @@
+#import libraries
+import os
+import sys
+import time
+import hmac
+import base64
+import hashlib
+import sqlite3
+import threading
+import flask
+import dash_auth
+from werkzeug.security import generate_password_hash, check_password_hash
+
+#database of the users allowed to log in (table user with username and password columns)
+USER_DATABASE = os.path.join('database', 'usernames.db')
+
+#seconds between checks of the database file for changes (override with e.g. USER_RELOAD_INTERVAL=10)
+USER_RELOAD_INTERVAL = float(os.environ.get('USER_RELOAD_INTERVAL', '1'))
+
+#number of verified logins kept, so that a hashed password is only checked once per user and password
+VERIFIED_CACHE_SIZE = 1024
+
+#prefixes of the password hashes written by werkzeug (generate_password_hash); other passwords are stored as plain text
+PASSWORD_HASH_METHODS = ('pbkdf2:', 'scrypt:', 'sha256$', 'sha1$', 'md5$')
+
+def is_password_hash(password):
+	return password.startswith(PASSWORD_HASH_METHODS)
+
+def check_password(stored, password):
+	if is_password_hash(stored):
+		return check_password_hash(stored, password)
+	return hmac.compare_digest(stored.encode(), password.encode())
+
+#basic auth checked against the user table of a sqlite database: the users are kept in a dict (username -> stored
+#password) reloaded whenever the database file changes, read through one read-only connection per thread
+class UserAuth(dash_auth.BasicAuth):
+	def __init__(self, app, database=USER_DATABASE, reload_interval=USER_RELOAD_INTERVAL):
+		self.database = database
+		self.reload_interval = reload_interval
+		self._connections = threading.local()
+		self._lock = threading.Lock()
+		self._version = None
+		self._checked = None
+		self._error = None
+		self._verified = {}
+		dash_auth.BasicAuth.__init__(self, app, {})
+		self.reload()
+
+	#connection of the current thread, opened again if the database file was replaced since
+	def _connection(self, version):
+		if getattr(self._connections, 'version', None) != version:
+			self._connections.connection = sqlite3.connect('file:%s?mode=ro' % self.database, uri=True)
+			self._connections.version = version
+		return self._connections.connection
+
+	def _file_version(self):
+		stat = os.stat(self.database)
+		return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+	#read the user table again if the database file changed (checked at most once per reload_interval); while the
+	#database can't be read the users read last are kept, and the failure is logged once
+	def reload(self, force=False):
+		now = time.monotonic()
+		if not force and self._checked is not None and now - self._checked < self.reload_interval:
+			return
+		with self._lock:
+			self._checked = now
+			try:
+				version = self._file_version()
+				if version == self._version and not force:
+					self._error = None
+					return
+				users = dict(self._connection(version[0]).execute('SELECT username, password FROM user').fetchall())
+			except (OSError, sqlite3.Error) as error:
+				if str(error) != self._error:
+					print('users not reloaded from %s (%d kept): %s' % (self.database, len(self._users), error), file=sys.stderr, flush=True)
+				self._error = str(error)
+				return
+			self._users = users
+			self._verified = {}
+			self._version = version
+			self._error = None
+
+	def is_authorized(self):
+		header = flask.request.headers.get('Authorization', None)
+		if not header or not header.startswith('Basic '):
+			return False
+		try:
+			username, _, password = base64.b64decode(header[6:]).decode('utf-8').partition(':')
+		except (ValueError, UnicodeDecodeError):
+			return False
+		self.reload()
+		stored = self._users.get(username)
+		if stored is None:
+			return False
+		#logins verified before are looked up by a digest of the username and password, and stay valid until the
+		#stored password of the user changes
+		key = hashlib.sha256(('%s:%s' % (username, password)).encode()).digest()
+		if self._verified.get(key) == stored:
+			return True
+		if not check_password(stored, password):
+			return False
+		if len(self._verified) >= VERIFIED_CACHE_SIZE:
+			self._verified = {}
+		self._verified[key] = stored
+		return True
+
+#replace the plain text passwords of the database by their hashes ($python user_auth.py [database])
+def hash_passwords(database=USER_DATABASE):
+	connection = sqlite3.connect(database)
+	with connection:
+		users = connection.execute('SELECT userID, password FROM user').fetchall()
+		for user_id, password in users:
+			if not is_password_hash(password):
+				connection.execute('UPDATE user SET password = ? WHERE userID = ?', (generate_password_hash(password), user_id))
+	connection.close()
+
+if __name__ == '__main__':
+	hash_passwords(*sys.argv[1:])
@@ -0,0 +1,9 @@
+#WSGI entry point of the app for a production server (e.g. gunicorn -c gunicorn.conf.py wsgi:application);
+#importing index registers every page and callback, and the data sets are loaded here before the server forks its
+#workers (WARM_UP=sync, set in gunicorn.conf.py) so that they share them
+from index import app, prerendered_pages
+from startup import start_warm_up
+
+start_warm_up(prerendered_pages)
+
+application = server = app.server